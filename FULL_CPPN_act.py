@@ -1,8 +1,13 @@
 import numpy as np
+import matplotlib.patches as mpatches
+
+from FULL_CPPN_constants import NODE_TO_COLOR, PATCH_LIST
+
 '''
 This file contains various activation functions, stored within CPPN nodes
 All activations have a chance to be stored within a node
 Output is always step function - all other nodes can have any activation function
+New activations are added with register_activation at the bottom of this file
 '''
 
 #step function activation
@@ -52,3 +57,147 @@ def absAct(x):
 
 
 
+
+
+# the following are array versions of the activations above, they take an entire
+# numpy array of node values and activate every value at once
+def stepArray(x):
+	return np.where(x > .5, 1.0, 0.0)
+
+def sigArray(x):
+	steepnessCoefficient = 4.9
+	# large negative values overflow exp, result correctly goes to 0
+	with np.errstate(over='ignore'):
+		return 1.0/(1 + np.exp(-steepnessCoefficient*x))
+
+def reluArray(x):
+	return np.maximum(x, 0)
+
+def gaussArray(x):
+	variance = 1.0
+	return np.random.normal(x, variance)
+
+# log only defined for x > 0, all other values map to 0
+def logArray(x):
+	result = np.zeros(x.shape)
+	positive = x > 0
+	result[positive] = np.log(x[positive])
+	return result
+
+
+# registry of all activation functions, the position of an activation
+# in these lists is the actKey that is stored inside of a node
+SCALAR_ACTIVATIONS = []
+ARRAY_ACTIVATIONS = []
+ACTIVATION_NAMES = []
+
+# numpy expression of each activation used by the code generator ({x} is the
+# node value) and the array functions the expressions call, None if there are none
+ACTIVATION_SOURCES = []
+ACTIVATION_HELPERS = []
+
+# keys of activations the plan optimizer must not treat as constant
+RANDOM_ACTIVATIONS = set()
+
+def register_activation(name, scalar_func, array_func, color, random=False, source=None, helper=None):
+	"""Adds a new activation function into the registry so that it can
+	be used by CPPN nodes - the activation is given the next available key
+
+	Parameters:
+	name -- label for the activation used in the genotype graph legend
+	scalar_func -- function that activates a single node value
+	array_func -- function that activates a whole numpy array of values
+	color -- matplotlib color of nodes with this activation when graphed
+	random -- True if the activation does not always give the same output for an input
+	source -- numpy expression of the activation for generated code, {x} is replaced by the
+			node value - generated code calls array_func through the registry if None
+	helper -- array function called by source, its source is copied into generated code
+
+	Returns:
+	the actKey of the newly registered activation
+	"""
+
+	actKey = len(ARRAY_ACTIVATIONS)
+	SCALAR_ACTIVATIONS.append(scalar_func)
+	ARRAY_ACTIVATIONS.append(array_func)
+	ACTIVATION_NAMES.append(name)
+	ACTIVATION_SOURCES.append(source)
+	ACTIVATION_HELPERS.append(helper)
+	if(actKey not in NODE_TO_COLOR):
+		NODE_TO_COLOR[actKey] = color
+		PATCH_LIST.append(mpatches.Patch(color=color, label=name))
+	if(random):
+		RANDOM_ACTIVATIONS.add(actKey)
+
+	return actKey
+
+def num_activations():
+	return len(ARRAY_ACTIVATIONS)
+
+def is_random_activation(actKey):
+	return actKey in RANDOM_ACTIVATIONS
+
+def activation_source(actKey, x):
+	"""returns the numpy expression that activates the variable named x for
+	generated code, or None if the activation has no source
+	"""
+
+	if(0 <= actKey < len(ACTIVATION_SOURCES) and ACTIVATION_SOURCES[actKey] is not None):
+		return ACTIVATION_SOURCES[actKey].format(x=x)
+	# unknown keys leave values unchanged
+	if(not(0 <= actKey < len(ARRAY_ACTIVATIONS))):
+		return x
+	return None
+
+def activation_helper(actKey):
+	"""returns the array function the source of an activation calls or None"""
+
+	if(0 <= actKey < len(ACTIVATION_HELPERS)):
+		return ACTIVATION_HELPERS[actKey]
+	return None
+
+def activate_scalar(actKey, x):
+	"""activates a single node value, values of nodes with an unknown key are unchanged"""
+
+	if(0 <= actKey < len(SCALAR_ACTIVATIONS)):
+		return SCALAR_ACTIVATIONS[actKey](x)
+	return x
+
+def activate_array(actKey, x):
+	"""activates every value in the numpy array x with the activation for actKey"""
+
+	if(0 <= actKey < len(ARRAY_ACTIVATIONS)):
+		return ARRAY_ACTIVATIONS[actKey](x)
+	return x
+
+def activate_group(actKeys, values):
+	"""activates several nodes at once, each row of values belongs to the node
+	whose key is in the same position of actKeys - all rows that share an 
+	activation key are passed to that activation in a single call
+
+	Parameters:
+	actKeys -- numpy array of activation keys, one per row
+	values -- 2D numpy array of node values with one row per node
+
+	Returns:
+	2D numpy array of activated values with the same shape as values
+	"""
+
+	result = np.empty(values.shape)
+	for actKey in np.unique(actKeys):
+		rows = (actKeys == actKey)
+		result[rows] = activate_array(actKey, values[rows])
+
+	return result
+
+
+# keys 0-8 must stay in this order, they are stored in all saved genotypes
+register_activation("Step", stepAct, stepArray, 'r', source="np.where({x} > .5, 1.0, 0.0)")
+register_activation("Sig", sigAct, sigArray, 'b', source="1.0/(1 + np.exp(-4.9*{x}))")
+register_activation("Relu", reluAct, reluArray, 'g', source="np.maximum({x}, 0)")
+register_activation("Sin", sinAct, np.sin, 'c', source="np.sin({x})")
+register_activation("Gauss", gaussAct, gaussArray, 'm', random=True, source="np.random.normal({x}, 1.0)")
+register_activation("Log", logAct, logArray, 'y', source="logArray({x})", helper=logArray)
+register_activation("Tanh", tanhAct, np.tanh, 'k', source="np.tanh({x})")
+register_activation("Square", squareAct, np.square, 'orange', source="np.square({x})")
+register_activation("Abs", absAct, np.fabs, 'darkgreen', source="np.fabs({x})")
@@ -0,0 +1,83 @@
+"""Tests for the activation function registry - every registered activation
+must give the values of the if/elif chain Node.activate used to have, for
+single values, whole arrays and the numpy sources used by generated code.
+Can be run with pytest or directly from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_act import stepAct, sigAct, reluAct, sinAct, gaussAct, logAct, tanhAct, squareAct, absAct
+from FULL_CPPN_act import num_activations, activate_scalar, activate_array, activate_group, activation_source, activation_helper
+from FULL_CPPN_node import Node
+
+# position in the list is the actKey the old if/elif chain in Node.activate checked
+BASELINE_CHAIN = [stepAct, sigAct, reluAct, sinAct, gaussAct, logAct, tanhAct, squareAct, absAct]
+
+# values on both sides of every threshold/kink the activations have
+VALUES = np.array([-3.0, -1.0, -.2, 0.0, .2, .5, .7, 1.0, 2.5, -200.0, 200.0])
+
+
+def test_scalar_matches_chain():
+	assert num_activations() == len(BASELINE_CHAIN)
+	for actKey in range(num_activations()):
+		for val in VALUES:
+			# large negative sigmoid inputs overflow exp, the result correctly goes to 0
+			with np.errstate(over="ignore"):
+				np.random.seed(1)
+				expected = BASELINE_CHAIN[actKey](val)
+				np.random.seed(1)
+				assert np.isclose(Node(0, val, 1, actKey).activate(), expected), (actKey, val)
+				np.random.seed(1)
+				assert np.isclose(activate_scalar(actKey, val), expected), (actKey, val)
+
+
+def test_array_matches_scalar():
+	for actKey in range(num_activations()):
+		with np.errstate(over="ignore"):
+			np.random.seed(2)
+			expected = [BASELINE_CHAIN[actKey](val) for val in VALUES]
+			np.random.seed(2)
+			assert np.allclose(activate_array(actKey, VALUES), expected), actKey
+
+
+def test_source_matches_array():
+	for actKey in range(num_activations()):
+		namespace = {"np": np, "x": VALUES}
+		helper = activation_helper(actKey)
+		if(helper is not None):
+			namespace[helper.__name__] = helper
+		with np.errstate(over="ignore"):
+			np.random.seed(3)
+			result = eval(activation_source(actKey, "x"), namespace)
+			np.random.seed(3)
+			assert np.allclose(result, activate_array(actKey, VALUES)), actKey
+
+
+def test_group_matches_rows():
+	np.random.seed(4)
+	actKeys = np.array([k for k in range(num_activations()) if k != 4]*3)
+	np.random.shuffle(actKeys)
+	values = np.random.uniform(-2, 2, size=(len(actKeys), 5))
+	result = activate_group(actKeys, values)
+	for row in range(len(actKeys)):
+		assert np.allclose(result[row], activate_array(actKeys[row], values[row])), actKeys[row]
+
+
+def test_unknown_keys_unchanged():
+	for actKey in (-1, num_activations()):
+		assert activate_scalar(actKey, .7) == .7
+		assert np.array_equal(activate_array(actKey, VALUES), VALUES)
+		assert activation_source(actKey, "x") == "x"
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_scalar_matches_chain, test_array_matches_scalar, test_source_matches_array,
+			test_group_matches_rows, test_unknown_keys_unchanged):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
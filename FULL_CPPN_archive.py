@@ -0,0 +1,318 @@
+"""This file contains the novelty archive used by novelty search with CPPNs.
+The archive keeps a bounded number of packed phenotypes, decides which
+individuals are added (by a novelty threshold or at random) and which entries
+are replaced once it is full (the oldest or the least novel ones).
+
+Nearest neighbours are found with a bit sampling index - each entry keeps a
+short sketch of randomly chosen pixels, the Hamming distance between sketches
+estimates the full distance, so only a few candidates per query are compared
+exactly. All queries of a generation are answered together and the k nearest
+distances are taken with np.argpartition instead of sorting every distance.
+
+If a descriptor extractor is given, novelty is measured between the short
+descriptors of the phenotypes instead (see FULL_CPPN_descriptors)
+"""
+
+import numpy as np
+
+from FULL_CPPN_phenotype import PackedImages, popcount
+from FULL_CPPN_descriptors import euclid_matrix
+
+# default maximum number of entries in the archive
+DEFAULT_CAPACITY = 10000
+
+# default number of nearest neighbours averaged for the novelty of an individual
+DEFAULT_K = 15
+
+# default number of pixels sampled into the sketch of every entry
+DEFAULT_SKETCH_BITS = 256
+
+# default number of candidates per query that are compared exactly
+DEFAULT_CANDIDATES = 64
+
+# number of queries compared against the whole archive at once
+QUERY_CHUNK = 16
+
+
+def _as_words(bits):
+	"""pads rows of packed bits to a multiple of 8 bytes and views them as uint64
+	words, so popcounts work on 64 pixels at a time
+	"""
+
+	bits = np.asarray(bits, dtype=np.uint8)
+	padding = (-bits.shape[1]) % 8
+	if(padding > 0):
+		bits = np.hstack((bits, np.zeros((len(bits), padding), dtype=np.uint8)))
+
+	return np.ascontiguousarray(bits).view(np.uint64)
+
+
+def hamming_words(words1, words2):
+	"""returns the (len(words1) x len(words2)) Hamming distances of two sets of uint64 rows"""
+
+	result = np.empty((len(words1), len(words2)), dtype=np.int64)
+	for start in range(0, len(words1), QUERY_CHUNK):
+		block = words1[start:start + QUERY_CHUNK]
+		result[start:start + len(block)] = popcount(block[:, None, :] ^ words2[None, :, :])
+
+	return result
+
+
+def k_smallest(distances, k):
+	"""returns the k smallest values of every row (in no particular order) without sorting"""
+
+	if(distances.shape[1] <= k):
+		return distances
+
+	return np.partition(distances, k - 1, axis=1)[:, :k]
+
+
+class NoveltyArchive():
+	"""Bounded archive of packed phenotypes with batched approximate kNN queries"""
+
+	def __init__(self, numPix, capacity=DEFAULT_CAPACITY, k=DEFAULT_K, insertion="threshold",
+			threshold=0.0, insert_prob=.05, eviction="oldest", index="sketch",
+			sketch_bits=DEFAULT_SKETCH_BITS, candidates=DEFAULT_CANDIDATES, seed=None, extractor=None):
+		"""Constructor for the novelty archive
+
+		Parameters:
+		numPix -- number of pixels in every phenotype
+		capacity -- maximum number of entries
+		k -- number of nearest neighbours averaged for the novelty of an individual
+		insertion -- "threshold" adds individuals at least threshold novel, "random" adds with insert_prob
+		threshold -- minimum novelty for the threshold insertion policy
+		insert_prob -- probability of adding an individual for the random insertion policy
+		eviction -- "oldest" or "least_novel", the entry replaced when the archive is full
+		index -- "sketch" for approximate queries or "exact" to compare against every entry
+		sketch_bits -- number of sampled pixels in every sketch, a multiple of 64
+		candidates -- number of entries per query compared exactly after the sketch search
+		seed -- seed of the archive's own random numbers, so evolution's random numbers are not changed
+		extractor -- optional DescriptorExtractor, novelty is then measured between descriptors
+		"""
+
+		self.numPix = numPix
+		self.capacity = capacity
+		self.k = k
+		self.insertion = insertion
+		self.threshold = threshold
+		self.insert_prob = insert_prob
+		self.eviction = eviction
+		self.index = index
+		self.candidates = max(candidates, k)
+		self.rng = np.random.RandomState(seed)
+
+		# pixels sampled into the sketches, fixed for the life of the archive
+		self.sample = np.sort(self.rng.choice(numPix, size=min(sketch_bits, numPix), replace=False))
+
+		# entries are kept in preallocated arrays, only the first size rows are used
+		numWords = ((numPix + 7)//8 + 7)//8
+		self.words = np.zeros((capacity, numWords), dtype=np.uint64)
+		self.sketches = np.zeros((capacity, (len(self.sample) + 63)//64), dtype=np.uint64)
+		self.novelty = np.zeros(capacity)
+		self.added = np.zeros(capacity, dtype=np.int64)
+		self.size = 0
+		self.numAdded = 0
+		self.numEvicted = 0
+
+		# descriptors of the entries, extracted again whenever fitting changes the extractor
+		self.extractor = extractor
+		if(extractor is not None):
+			self.descriptors = np.zeros((capacity, extractor.dims), dtype=np.float32)
+			self.descVersion = extractor.version
+			self.numFitted = 0
+
+	def _sketch(self, images):
+		"""returns the sketches (sampled pixels packed into uint64 words) of packed images"""
+
+		sampled = (images.bits[:, self.sample >> 3] >> (7 - (self.sample & 7)).astype(np.uint8)) & 1
+		return _as_words(np.packbits(sampled, axis=1))
+
+	def query(self, images):
+		"""Finds the Hamming distances to the k nearest archive entries of every image
+
+		Parameters:
+		images -- PackedImages being queried
+
+		Returns:
+		(len(images) x min(k, size)) numpy array of Hamming distances, in no particular order
+		"""
+
+		if(self.size == 0):
+			return np.zeros((len(images), 0), dtype=np.int64)
+
+		words = _as_words(images.bits)
+		if(self.index == "exact" or self.size <= self.candidates):
+			return k_smallest(hamming_words(words, self.words[:self.size]), self.k)
+
+		# sketch distances pick the candidates, which are then compared exactly
+		estimates = hamming_words(self._sketch(images), self.sketches[:self.size])
+		cands = np.argpartition(estimates, self.candidates - 1, axis=1)[:, :self.candidates]
+		exact = popcount(words[:, None, :] ^ self.words[cands])
+
+		return k_smallest(exact, self.k)
+
+	def score(self, images):
+		"""Novelty of every image - the average distance to its k nearest neighbours
+		among the other images and the archive entries. Distances are the square root
+		of the number of differing pixels, the same as get_euclid_dist on binary outputs
+
+		Parameters:
+		images -- PackedImages of the whole population
+
+		Returns:
+		numpy array with the novelty of every image
+		"""
+
+		if(len(images) == 0):
+			return np.zeros(0)
+
+		if(self.extractor is not None):
+			return self._score_descriptors(images)
+
+		# every image is compared against the rest of the population exactly
+		words = _as_words(images.bits)
+		popDist = hamming_words(words, words).astype(float)
+		np.fill_diagonal(popDist, np.inf)
+
+		nearest = k_smallest(np.hstack((popDist, self.query(images).astype(float))), self.k)
+		nearest = np.sqrt(nearest)
+
+		return self._mean_nearest(nearest)
+
+	def _score_descriptors(self, images):
+		"""novelty as the average euclidian distance between descriptors, descriptors
+		are short enough that every entry is compared with one matrix product
+		"""
+
+		self._refresh_descriptors()
+		desc = self.extractor.transform(images)
+		popDist = euclid_matrix(desc, desc)
+		np.fill_diagonal(popDist, np.inf)
+		archiveDist = k_smallest(euclid_matrix(desc, self.descriptors[:self.size]), self.k)
+
+		return self._mean_nearest(k_smallest(np.hstack((popDist, archiveDist)), self.k))
+
+	def _mean_nearest(self, nearest):
+		"""averages the finite distances of every row"""
+
+		# individuals without enough neighbours only average the ones they have
+		finite = np.isfinite(nearest)
+		counts = np.maximum(np.sum(finite, axis=1), 1)
+
+		return np.sum(np.where(finite, nearest, 0.0), axis=1)/counts
+
+	def _refresh_descriptors(self):
+		"""extracts the descriptors of all entries again if the extractor was fitted since"""
+
+		if(self.extractor.version != self.descVersion and self.size > 0):
+			self.descriptors[:self.size] = self.extractor.transform(self.images())
+		self.descVersion = self.extractor.version
+
+	def fit_extractor(self):
+		"""fits the extractor with the entries added since it was last fitted, the
+		descriptors of all entries are extracted again before the next query
+
+		Returns:
+		number of entries the extractor was fitted with
+		"""
+
+		if(self.extractor is None):
+			return 0
+
+		newEntries = np.flatnonzero(self.added[:self.size] >= self.numFitted)
+		if(len(newEntries) > 0):
+			self.extractor.partial_fit(self.images()[newEntries])
+		self.numFitted = self.numAdded
+
+		return len(newEntries)
+
+	def mark_fitted(self):
+		"""records that the extractor was already fitted with every entry added so
+		far (for example with the whole initial population), so fit_extractor
+		does not fit it with them again
+		"""
+
+		if(self.extractor is not None):
+			self.numFitted = self.numAdded
+
+	def _insert(self, words, sketch, novelty, desc=None):
+		"""stores one entry, replacing another one by the eviction policy if the archive is full
+
+		Returns:
+		True if the entry was stored
+		"""
+
+		if(self.size < self.capacity):
+			pos = self.size
+			self.size += 1
+		elif(self.eviction == "oldest"):
+			pos = np.argmin(self.added)
+			self.numEvicted += 1
+		else:
+			pos = np.argmin(self.novelty)
+			# an entry is only replaced by a more novel one
+			if(self.novelty[pos] >= novelty):
+				return False
+			self.numEvicted += 1
+
+		self.words[pos] = words
+		self.sketches[pos] = sketch
+		if(desc is not None):
+			self.descriptors[pos] = desc
+		self.novelty[pos] = novelty
+		self.added[pos] = self.numAdded
+		self.numAdded += 1
+
+		return True
+
+	def update(self, images, novelty):
+		"""Adds images to the archive by the insertion policy
+
+		Parameters:
+		images -- PackedImages that may be added
+		novelty -- novelty of every image, as returned by score
+
+		Returns:
+		number of images added to the archive
+		"""
+
+		novelty = np.asarray(novelty, dtype=float)
+		if(self.insertion == "threshold"):
+			chosen = np.flatnonzero(novelty >= self.threshold)
+		else:
+			chosen = np.flatnonzero(self.rng.uniform(size=len(novelty)) <= self.insert_prob)
+
+		if(len(chosen) == 0):
+			return 0
+
+		chosenImages = images[chosen]
+		words = _as_words(chosenImages.bits)
+		sketches = self._sketch(chosenImages)
+		descs = [None]*len(chosen)
+		if(self.extractor is not None):
+			self._refresh_descriptors()
+			descs = self.extractor.transform(chosenImages)
+		added = 0
+		for (i, ind) in enumerate(chosen):
+			added += self._insert(words[i], sketches[i], novelty[ind], descs[i])
+
+		return added
+
+	def images(self):
+		"""returns the entries of the archive as PackedImages"""
+
+		numBytes = (self.numPix + 7)//8
+		return PackedImages(self.words[:self.size].view(np.uint8)[:, :numBytes], self.numPix)
+
+	def __len__(self):
+		return self.size
+
+	def __str__(self):
+		result = ""
+		result += ("ARCHIVE SIZE: " + str(self.size) + " OF " + str(self.capacity) + "\n")
+		result += ("ADDED: " + str(self.numAdded) + " EVICTED: " + str(self.numEvicted) + "\n")
+		memory = self.words.nbytes + self.sketches.nbytes
+		if(self.extractor is not None):
+			memory += self.descriptors.nbytes
+		result += ("ARCHIVE MB: " + str(memory/(1024.0*1024.0)) + "\n")
+		return result
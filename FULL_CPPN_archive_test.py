@@ -0,0 +1,88 @@
+"""Tests for the novelty archive - kNN queries must give the distances a brute
+force search over the unpacked images gives, exactly for the exact index and
+for the sketch index when every entry is a candidate, and novelty scores must
+match the average of the brute force nearest distances. Can be run with
+pytest or directly from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_archive import NoveltyArchive
+from FULL_CPPN_phenotype import pack_images
+
+# not a multiple of 8, so the padding bits of the packed rows are used
+NUM_PIX = 30*30
+NUM_ENTRIES = 300
+NUM_QUERIES = 40
+K = 5
+
+
+def make_images(rng, prototypes, num, flipProb):
+	"""returns num dense binary images made by flipping pixels of random prototypes"""
+
+	images = prototypes[rng.randint(len(prototypes), size=num)].copy()
+	flips = rng.uniform(size=images.shape) < flipProb
+	images[flips] = 1 - images[flips]
+	return images
+
+
+def brute_force(queries, entries, k):
+	"""returns the sorted k smallest Hamming distances of every query to the entries"""
+
+	distances = np.sum(queries[:, None, :] != entries[None, :, :], axis=2)
+	return np.sort(distances, axis=1)[:, :k]
+
+
+def make_archive(entries, **kwargs):
+	archive = NoveltyArchive(NUM_PIX, capacity=NUM_ENTRIES, k=K, threshold=0.0, seed=1, **kwargs)
+	archive.update(pack_images(entries), np.zeros(len(entries)))
+	assert len(archive) == len(entries)
+	return archive
+
+
+def test_query_matches_brute_force():
+	rng = np.random.RandomState(4)
+	prototypes = (rng.uniform(size=(20, NUM_PIX)) < .5).astype(np.uint8)
+	entries = make_images(rng, prototypes, NUM_ENTRIES, .1)
+	queries = make_images(rng, prototypes, NUM_QUERIES, .1)
+	expected = brute_force(queries, entries, K)
+	packed = pack_images(queries)
+
+	for kwargs in ({"index": "exact"}, {"index": "sketch", "candidates": NUM_ENTRIES}):
+		result = np.sort(make_archive(entries, **kwargs).query(packed), axis=1)
+		assert np.array_equal(result, expected), kwargs
+
+	# approximate queries only return real distances, so they are never below the exact ones,
+	# and the sketches should still find the nearest entry for nearly every query
+	result = np.sort(make_archive(entries, index="sketch", candidates=64).query(packed), axis=1)
+	assert np.all(result >= expected)
+	assert np.mean(result[:, 0] == expected[:, 0]) >= .9
+
+
+def test_score_matches_brute_force():
+	rng = np.random.RandomState(5)
+	prototypes = (rng.uniform(size=(10, NUM_PIX)) < .5).astype(np.uint8)
+	entries = make_images(rng, prototypes, NUM_ENTRIES, .2)
+	pop = make_images(rng, prototypes, NUM_QUERIES, .2)
+	archive = make_archive(entries, index="exact")
+
+	# each individual is compared to the rest of the population and every entry
+	popDist = np.sum(pop[:, None, :] != pop[None, :, :], axis=2).astype(float)
+	np.fill_diagonal(popDist, np.inf)
+	entryDist = np.sum(pop[:, None, :] != entries[None, :, :], axis=2)
+	nearest = np.sort(np.hstack((popDist, entryDist)), axis=1)[:, :K]
+	expected = np.mean(np.sqrt(nearest), axis=1)
+
+	assert np.allclose(archive.score(pack_images(pop)), expected)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_query_matches_brute_force, test_score_matches_brute_force):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
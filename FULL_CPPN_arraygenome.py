@@ -0,0 +1,462 @@
+"""This file contains an array backed version of the CPPN genotype. Instead of
+lists of Node and Connection objects that reference each other, the genome
+is stored as a struct of numpy arrays - one entry per node for activation
+key and level, and one entry per connection for innovation number, in/out
+node, weight and status. Node numbers are the same as node rows, just like
+in Genotype, so connections refer to nodes by their position.
+
+ArrayGenotype has the same mutation, crossover and distance API as
+Genotype, and copying it only copies a few arrays instead of deep copying
+a whole object graph. It can be converted to and from a Genotype for
+graphing or for code that works on node/connection objects directly
+"""
+
+import sys
+import copy
+
+import numpy as np
+
+from FULL_CPPN_struct import Genotype
+from FULL_CPPN_genedist import align_genes, gene_distance
+from FULL_CPPN_node import Node
+from FULL_CPPN_con import Connection
+from FULL_CPPN_act import num_activations
+from FULL_CPPN_plan import build_plan_arrays, PLAN_TOPOLOGY, PLAN_WEIGHTS, PLAN_ACTIVATIONS, PLAN_ALL
+
+# level given to output nodes, same as the layer of outputs in Genotype
+OUTPUT_LEVEL = sys.maxsize
+
+
+class ArrayGenotype(Genotype):
+	"""Genotype stored as flat numpy arrays, drop in replacement for Genotype
+	in the evolution loops and evaluation functions
+	"""
+
+	def __init__(self, numIn=Genotype.DEF_NUMIN, numOut=Genotype.DEF_NUMOUT):
+		"""Constructor for the array genotype, builds the same initial fully
+		connected network as Genotype (using the same random numbers)
+
+		Parameters:
+		numIn -- the number of inputs into the network (excluding bias)
+		numOut -- the number of outputs out of the network
+		"""
+
+		# add one to numIn to account for bias
+		self.numIn = numIn + 1
+		self.numOut = numOut
+		self.gSize = self.numIn + self.numOut
+		self.fit_obj = 0
+		self.species = sys.maxsize
+
+		self.activation_plan = None
+		self.plan_dirty = set(PLAN_ALL)
+		self.changed_nodes = None
+		self.fingerprint = None
+
+		# node arrays - inputs have level 0 and outputs always have the step function
+		self.actKeys = np.zeros(self.gSize, dtype=int)
+		for i in range(self.numIn):
+			self.actKeys[i] = np.random.choice(num_activations())
+		self.levels = np.zeros(self.gSize, dtype=np.int64)
+		self.levels[self.numIn:] = OUTPUT_LEVEL
+
+		# connection arrays, inputs are fully connected to outputs
+		weightRange = 1/float(self.numIn)
+		numCons = self.numIn*self.numOut
+		self.innovations = np.arange(numCons)
+		self.srcs = np.repeat(np.arange(self.numIn), self.numOut)
+		self.dsts = np.tile(np.arange(self.numIn, self.gSize), self.numIn)
+		self.weights = np.array([np.random.normal(0, weightRange) for c in range(numCons)])
+		self.enabled = np.ones(numCons, dtype=bool)
+
+	def getNodeNumbers(self):
+		return np.arange(self.gSize)
+
+	def getActivationPlan(self):
+		"""returns the activation plan for the current state of the genotype,
+		only the parts of the plan that were invalidated are rebuilt
+		"""
+
+		plan = getattr(self, "activation_plan", None)
+		dirty = getattr(self, "plan_dirty", PLAN_ALL)
+		if(plan is None or PLAN_TOPOLOGY in dirty or plan.numNodes != self.gSize or plan.numCons != len(self.weights)):
+			plan = build_plan_arrays(self.numIn, self.numOut, self.actKeys, self.levels, self.srcs,
+								self.dsts, self.weights, self.enabled)
+		else:
+			if(PLAN_WEIGHTS in dirty):
+				plan = plan.withWeightValues(self.weights[plan.conIndices])
+			if(PLAN_ACTIVATIONS in dirty):
+				plan = plan.withNodeKeyValues(self.actKeys)
+		self.activation_plan = plan
+		self.plan_dirty = set()
+		return plan
+
+	def getOutput(self, inputs):
+		"""runs the network for a single set of inputs, returns a list of outputs"""
+
+		if(not(len(inputs) == (self.numIn - 1))):
+			print("The length of the list of inputs does not match the number of desired inputs.")
+		else:
+			return self.getOutputBatch(np.array([inputs], dtype=float))[0].tolist()
+
+	def _appendNode(self, actKey, level):
+		self.actKeys = np.append(self.actKeys, actKey)
+		self.levels = np.append(self.levels, np.int64(level))
+		self.gSize += 1
+		return self.gSize - 1
+
+	def _appendConnection(self, src, dst, weight, innovation):
+		self.srcs = np.append(self.srcs, src)
+		self.dsts = np.append(self.dsts, dst)
+		self.weights = np.append(self.weights, weight)
+		self.innovations = np.append(self.innovations, innovation)
+		self.enabled = np.append(self.enabled, True)
+		pairs = self.getConnectionPairs()
+		if(self.connection_pairs[0] == len(self.weights) - 1):
+			pairs.add((src, dst))
+			self.connection_pairs = (len(self.weights), pairs)
+
+	def nodeMutate(self, innovationMap, globalInnovation):
+		"""splits a random enabled connection with a new node, same as Genotype.nodeMutate
+
+		Returns:
+		new state of innovationMap and globalInnovation
+		"""
+
+		# pick a random location in the connections, find the next enabled connection to split
+		numCons = len(self.weights)
+		conInd = np.random.randint(0, numCons - 1)
+		candidates = (np.arange(numCons) + conInd) % numCons
+		candidates = candidates[self.enabled[candidates]]
+		if(len(candidates) == 0):
+			# all connections are disabled, there is nothing to split
+			return (innovationMap, globalInnovation)
+		conInd = candidates[0]
+
+		# deactivate old connection and insert new node one level below its in node
+		self.enabled[conInd] = False
+		oldInnov = self.innovations[conInd]
+		oldIn = self.srcs[conInd]
+		oldOut = self.dsts[conInd]
+		newNode = self._appendNode(np.random.choice(num_activations()), self.levels[oldIn] + 1)
+
+		# check innovation map to see if this structural mutation has occurred in this generation already
+		if(oldInnov in innovationMap.keys()):
+			(innovation1, innovation2) = innovationMap[oldInnov]
+		else:
+			innovation1 = globalInnovation
+			innovation2 = globalInnovation + 1
+			globalInnovation += 2
+			innovationMap[oldInnov] = (innovation1, innovation2)
+
+		# first new connection has weight of 1 and second has the original weight
+		self._appendConnection(oldIn, newNode, 1, innovation1)
+		self._appendConnection(newNode, oldOut, self.weights[conInd], innovation2)
+		self.raiseLevels(newNode)
+
+		# a node and new cons were added, plan topology must be rebuilt
+		self.invalidatePlan(PLAN_TOPOLOGY)
+
+		return (innovationMap, globalInnovation)
+
+	def raiseLevels(self, node):
+		"""pushes every hidden node below node (a node row) down to a level past its in nodes"""
+
+		changed = [node]
+		while(len(changed) > 0):
+			inNode = changed.pop()
+			for outNode in self.dsts[self.srcs == inNode]:
+				# output nodes are always on the last level, no level can be deeper
+				# than the number of nodes unless connections form a cycle
+				if(self.levels[outNode] != OUTPUT_LEVEL and self.levels[outNode] <= self.levels[inNode]
+						and self.levels[inNode] < self.gSize):
+					self.levels[outNode] = self.levels[inNode] + 1
+					changed.append(outNode)
+
+	def relevel(self):
+		"""recomputes the level of every hidden node as the longest path from the inputs"""
+
+		self.levels[self.numIn + self.numOut:] = 1
+		for node in range(self.gSize):
+			if(self.levels[node] != OUTPUT_LEVEL):
+				self.raiseLevels(node)
+		self.invalidatePlan(PLAN_TOPOLOGY)
+
+	def hasFloatLayers(self):
+		# levels are always stored in an integer array
+		return False
+
+	def getHiddenNodes(self):
+		return self.size() - self.numIn - self.numOut
+
+	def weightMutate(self):
+		"""mutates about a quarter of the weights, all with the same type of
+		change as Genotype.weightMutate
+		"""
+
+		variance = 1.0
+		normal_change = .25
+		mult_change = .9
+		mut_prob = .25
+		rand = np.random.uniform()
+
+		mask = np.random.uniform(size=len(self.weights)) <= mut_prob
+		count = np.count_nonzero(mask)
+		if(rand <= normal_change):
+			# mutate weights based on a normal distribution around old weight
+			self.weights[mask] = np.random.normal(self.weights[mask], variance)
+		elif(rand <= mult_change):
+			# set weight equal to its value multiplied by a random factor [.5, 1.5]
+			self.weights[mask] *= np.random.uniform(.5, 1.5, size=count)
+		else:
+			# set weight equal to something completely new
+			self.weights[mask] = np.random.uniform(-1, 1, size=count)
+		self.invalidatePlan(PLAN_WEIGHTS, self.dsts[mask].tolist())
+
+	def activationMutate(self):
+		"""changes the activation of a random node that is not an output"""
+
+		index = np.random.randint(0, self.gSize - 1)
+		# act function of output nodes should never be changed
+		while(self.levels[index] == OUTPUT_LEVEL):
+			index = np.random.randint(0, self.gSize - 1)
+		self.actKeys[index] = np.random.choice(num_activations())
+		self.invalidatePlan(PLAN_ACTIVATIONS, [index])
+
+	def connectionMutate(self, globalInnovation):
+		"""adds a new connection between two random nodes if a valid one is found
+
+		Returns:
+		updated globalInnovation
+		"""
+
+		tryCount = 0
+		maxTries = 20
+		newWeight = np.random.uniform(-0.5,0.5)
+		changed = []
+		# only allow network to attempt to form connections a certain number of times - prevents infinite loop
+		while(len(changed) == 0 and tryCount < maxTries):
+			inInd = np.random.randint(0, self.gSize - 1)
+			outInd = np.random.randint(0, self.gSize - 1)
+			if(self.validEdge(inInd, outInd)):
+				self._appendConnection(inInd, outInd, newWeight, globalInnovation)
+				globalInnovation += 1
+				changed.append(outInd)
+			tryCount += 1
+
+		self.invalidatePlan(PLAN_TOPOLOGY, changed)
+
+		return globalInnovation
+
+	def connection_status_mutate(self):
+		"""toggles the status of a random connection"""
+
+		index = np.random.randint(0, len(self.weights))
+		self.enabled[index] = not self.enabled[index]
+		self.invalidatePlan(PLAN_TOPOLOGY, [self.dsts[index]])
+
+	def validEdge(self, src, dst):
+		"""a connection is valid if it goes upwards in level and is not already present"""
+
+		return self.levels[src] < self.levels[dst] and (src, dst) not in self.getConnectionPairs()
+
+	def validConnection(self, otherCon):
+		return self.validEdge(otherCon.getNodeIn().getNodeNum(), otherCon.getNodeOut().getNodeNum())
+
+	def getConnectionPairs(self):
+		"""returns the set of (in node, out node) pairs of all connections"""
+
+		pairs = getattr(self, "connection_pairs", None)
+		if(pairs is None or pairs[0] != len(self.weights)):
+			pairs = (len(self.weights), set(zip(self.srcs.tolist(), self.dsts.tolist())))
+			self.connection_pairs = pairs
+		return pairs[1]
+
+	def _sortedParents(self, other):
+		"""returns copies of (fitter, other) genotype"""
+
+		if(self.getFitness() > other.getFitness()):
+			return (self.getCopy(), other.getCopy())
+		return (other.getCopy(), self.getCopy())
+
+	def getInnovationArrays(self):
+		"""returns (sorted innovation numbers, connection indices in that order)"""
+
+		order = np.argsort(self.innovations, kind="stable")
+		return (self.innovations[order], order)
+
+	def _matchingGenes(self, other):
+		"""finds connections of both genotypes with the same innovation number
+
+		Returns:
+		(selfIndices, otherIndices) numpy arrays of matching connection positions
+		"""
+
+		(selfInnovs, selfOrder) = self.getInnovationArrays()
+		(otherInnovs, otherOrder) = other.getInnovationArrays()
+		(selfPos, otherPos, selfOnly, otherOnly) = align_genes(selfInnovs, otherInnovs)
+		return (selfOrder[selfPos], otherOrder[otherPos])
+
+	def crossover(self, other, draws=None):
+		"""takes all genes from the fitter parent and swaps matching genes with
+		the other parent with a probability of .5
+
+		Returns:
+		the new child genotype
+		"""
+
+		(child, parent) = self._sortedParents(other)
+		(childInds, parInds) = child._matchingGenes(parent)
+		if(draws is None):
+			draws = np.random.uniform(size=len(childInds))
+		swap = draws[:len(childInds)] <= .5
+		child.weights[childInds[swap]] = parent.weights[parInds[swap]]
+		child.enabled[childInds[swap]] = parent.enabled[parInds[swap]]
+
+		# status of connections may have changed, child topology must be rebuilt
+		child.invalidatePlan(PLAN_TOPOLOGY)
+
+		return child
+
+	def crossoverReturnBoth(self, other, draws=None):
+		"""swaps the weights of matching genes between copies of both parents
+
+		Returns:
+		(child, betterInd) tuple of the crossed over child and the original fitter individual
+		"""
+
+		SWAP_PB = .5
+		(child, parent) = self._sortedParents(other)
+		betterInd = child.getCopy()
+		(childInds, parInds) = child._matchingGenes(parent)
+		if(draws is None):
+			draws = np.random.uniform(size=len(childInds))
+		swap = draws[:len(childInds)] <= SWAP_PB
+		tmp = child.weights[childInds[swap]]
+		child.weights[childInds[swap]] = parent.weights[parInds[swap]]
+		parent.weights[parInds[swap]] = tmp
+
+		child.invalidatePlan(PLAN_WEIGHTS)
+		parent.invalidatePlan(PLAN_WEIGHTS)
+
+		return (child, betterInd)
+
+	def crossoverAvg(self, other, draws=None):
+		"""averages the weights of matching genes into a copy of the fitter parent
+
+		Returns:
+		(child, betterInd) tuple of the crossed over child and the original fitter individual
+		"""
+
+		SWAP_PB = .5
+		(child, parent) = self._sortedParents(other)
+		betterInd = child.getCopy()
+		(childInds, parInds) = child._matchingGenes(parent)
+		if(draws is None):
+			draws = np.random.uniform(size=len(childInds))
+		swap = draws[:len(childInds)] <= SWAP_PB
+		child.weights[childInds[swap]] = (child.weights[childInds[swap]] + parent.weights[parInds[swap]])/2
+
+		child.invalidatePlan(PLAN_WEIGHTS)
+
+		return (child, betterInd)
+
+	def getDistance(self, other, theta1, theta2, theta3):
+		"""distance between the topologies of two genotypes, same formula as Genotype.getDistance"""
+
+		(selfInnovs, selfWeights) = self.getGeneArrays()
+		(otherInnovs, otherWeights) = other.getGeneArrays()
+		return gene_distance(selfInnovs, selfWeights, otherInnovs, otherWeights, theta1, theta2, theta3)
+
+	def getGeneArrays(self):
+		"""returns (sorted innovation numbers, weights in the same order) of all connections"""
+
+		(innovs, order) = self.getInnovationArrays()
+		return (innovs, self.weights[order])
+
+	def findRangeOfInnovationNumbers(self):
+		return (np.min(self.innovations), np.max(self.innovations))
+
+	def getTotalWeight(self):
+		return np.sum(self.weights)
+
+	def get_con_cost(self):
+		return np.sum(np.fabs(self.weights))
+
+	def getCopy(self):
+		"""copies the genotype - only the arrays and small containers are copied,
+		the activation plan is immutable so it is shared with the copy
+		"""
+
+		new = self.shallowCopy()
+		for name in ("actKeys", "levels", "innovations", "srcs", "dsts", "weights", "enabled"):
+			setattr(new, name, getattr(self, name).copy())
+		new.plan_dirty = set(getattr(self, "plan_dirty", PLAN_ALL))
+		if(getattr(self, "changed_nodes", None) is not None):
+			new.changed_nodes = set(self.changed_nodes)
+		if(getattr(self, "connection_pairs", None) is not None):
+			new.connection_pairs = (self.connection_pairs[0], set(self.connection_pairs[1]))
+		# fitness objects given by deap hold their own values
+		if("fitness" in self.__dict__):
+			new.fitness = copy.deepcopy(self.fitness)
+		return new
+
+	def __deepcopy__(self, memo):
+		return self.getCopy()
+
+	def clone(self):
+		# copying the arrays is already cheap, nothing is shared
+		return self.getCopy()
+
+	def toGenotype(self):
+		"""creates a Genotype with Node and Connection objects from the arrays"""
+
+		genotype = self.shallowCopy()
+		genotype.__class__ = Genotype
+		genotype.nodes = [Node(i, 0, int(self.levels[i]), int(self.actKeys[i])) for i in range(self.gSize)]
+		genotype.connections = []
+		for c in range(len(self.weights)):
+			con = Connection(genotype.nodes[self.srcs[c]], genotype.nodes[self.dsts[c]], float(self.weights[c]), int(self.innovations[c]))
+			con.setStatus(bool(self.enabled[c]))
+			genotype.connections.append(con)
+		for name in ("actKeys", "levels", "innovations", "srcs", "dsts", "weights", "enabled", "connection_pairs"):
+			genotype.__dict__.pop(name, None)
+		genotype.invalidatePlan(PLAN_TOPOLOGY)
+		return genotype
+
+	def gen_networkx_graph(self):
+		return self.toGenotype().gen_networkx_graph()
+
+	def graph_genotype(self, fig_num=100, edge_labels=False):
+		self.toGenotype().graph_genotype(fig_num, edge_labels)
+
+	def __str__(self):
+		return str(self.toGenotype())
+
+
+def from_genotype(genotype, cls=ArrayGenotype):
+	"""Creates an array genotype from a Genotype made of Node and Connection objects
+
+	Parameters:
+	genotype -- the Genotype being converted
+	cls -- class of the result, can be a deap creator class derived from ArrayGenotype
+	"""
+
+	result = cls.__new__(cls)
+	result.__dict__.update(dict((k, v) for k, v in genotype.__dict__.items() if k not in ("nodes", "connections")))
+	nodeRows = dict((n.getNodeNum(), row) for row, n in enumerate(genotype.nodes))
+	result.actKeys = np.array([n.getActKey() for n in genotype.nodes], dtype=int)
+	layers = [n.getNodeLayer() for n in genotype.nodes]
+	result.levels = np.array([OUTPUT_LEVEL if l == sys.maxsize else int(l) for l in layers], dtype=np.int64)
+	result.innovations = np.array([c.getInnovationNumber() for c in genotype.connections], dtype=int)
+	result.srcs = np.array([nodeRows[c.getNodeIn().getNodeNum()] for c in genotype.connections], dtype=int)
+	result.dsts = np.array([nodeRows[c.getNodeOut().getNodeNum()] for c in genotype.connections], dtype=int)
+	result.weights = np.array([c.getWeight() for c in genotype.connections], dtype=float)
+	result.enabled = np.array([c.getStatus() for c in genotype.connections], dtype=bool)
+	result.gSize = len(genotype.nodes)
+	result.__dict__.pop("connection_pairs", None)
+	result.invalidatePlan(PLAN_TOPOLOGY)
+	# genotypes saved with fractional layers need integer levels
+	if(genotype.hasFloatLayers()):
+		result.relevel()
+	return result
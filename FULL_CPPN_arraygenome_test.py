@@ -0,0 +1,120 @@
+"""Tests for the array backed genotype - an ArrayGenotype must hold the same
+genes and give the same outputs as the Genotype it is converted from or
+to, build the same initial network from the same random numbers, cross
+over the same way for the same draws, and its copies must not share arrays
+with it. Can be run with pytest or directly from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_arraygenome import ArrayGenotype, from_genotype
+from FULL_CPPN_struct import Genotype
+from FULL_CPPN_innovation import GlobalInnovation
+from FULL_CPPN_getpixels import getNormalizedInputArray
+from FULL_CPPN_testhelp import GAUSS_KEY, REPLACEMENT_KEY, make_population
+
+NUM_X = 5
+NUM_Y = 5
+THETAS = (1.0, 1.0, .4)
+
+
+def as_genotype(genotype):
+	if(isinstance(genotype, ArrayGenotype)):
+		return genotype.toGenotype()
+	return genotype
+
+
+def same_genes(genotype1, genotype2):
+	"""returns True if both genotypes have the same innovations, weights, statuses and activations"""
+
+	(innovs1, weights1) = genotype1.getGeneArrays()
+	(innovs2, weights2) = genotype2.getGeneArrays()
+	(genotype1, genotype2) = (as_genotype(genotype1), as_genotype(genotype2))
+	keys1 = [n.getActKey() for n in genotype1.nodes]
+	keys2 = [n.getActKey() for n in genotype2.nodes]
+	status1 = sorted((c.getInnovationNumber(), c.getStatus()) for c in genotype1.connections)
+	status2 = sorted((c.getInnovationNumber(), c.getStatus()) for c in genotype2.connections)
+
+	return (np.array_equal(innovs1, innovs2) and np.allclose(weights1, weights2) and keys1 == keys2 and status1 == status2)
+
+
+def row_outputs(genotype, inputs):
+	return np.array([genotype.getOutput(list(row)) for row in inputs])
+
+
+def test_new_matches_genotype():
+	for seed in range(5):
+		np.random.seed(seed)
+		genotype = Genotype(2, 1)
+		np.random.seed(seed)
+		arrays = ArrayGenotype(2, 1)
+		assert same_genes(arrays, genotype), seed
+
+
+def test_converted_matches_genotype():
+	np.random.seed(13)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	pop = make_population(15, 8)
+	arrays = [from_genotype(genotype) for genotype in pop]
+	for (genotype, converted) in zip(pop, arrays):
+		assert same_genes(converted, genotype)
+		assert same_genes(converted.toGenotype(), genotype)
+		assert np.allclose(converted.getOutputBatch(inputs), row_outputs(genotype, inputs))
+	for i in range(len(pop)):
+		for j in range(len(pop)):
+			assert np.isclose(arrays[i].getDistance(arrays[j], *THETAS), pop[i].getDistance(pop[j], *THETAS)), (i, j)
+
+
+def test_mutated_arrays_match_converted():
+	np.random.seed(14)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	gb = GlobalInnovation(2, 1)
+	for i in range(10):
+		arrays = ArrayGenotype(2, 1)
+		for m in range(8):
+			(gb.innovDict, gb.current) = arrays.nodeMutate(gb.innovDict, gb.current)
+			gb.current = arrays.connectionMutate(gb.current)
+			arrays.weightMutate()
+			arrays.activationMutate()
+		arrays.actKeys[arrays.actKeys == GAUSS_KEY] = REPLACEMENT_KEY
+		arrays.invalidatePlan("activations")
+		assert np.allclose(arrays.getOutputBatch(inputs), row_outputs(arrays.toGenotype(), inputs)), i
+
+
+def test_crossover_matches_genotype():
+	np.random.seed(15)
+	pop = make_population(10, 8)
+	arrays = [from_genotype(genotype) for genotype in pop]
+	for i in range(30):
+		(a, b) = np.random.randint(len(pop), size=2)
+		draws = np.random.uniform(size=100)
+		child = pop[a].clone().crossover(pop[b], draws)
+		arrayChild = arrays[a].getCopy().crossover(arrays[b], draws)
+		assert same_genes(arrayChild, child), i
+
+
+def test_copy_is_independent():
+	np.random.seed(16)
+	gb = GlobalInnovation(2, 1)
+	original = from_genotype(make_population(1, 6)[0])
+	before = original.toGenotype()
+	copied = original.getCopy()
+	for m in range(5):
+		(gb.innovDict, gb.current) = copied.nodeMutate(gb.innovDict, gb.current)
+		copied.weightMutate()
+		copied.activationMutate()
+	assert same_genes(original, before)
+	assert not same_genes(copied, before)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_new_matches_genotype, test_converted_matches_genotype, test_mutated_arrays_match_converted,
+			test_crossover_matches_genotype, test_copy_is_independent):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -0,0 +1,292 @@
+"""This file contains the code generator for CPPN genotypes. A genotype is
+turned into the source of a straight-line python/numpy function with one
+statement per connection, so a finished design can be rendered without
+building or traversing any Node or Connection objects.
+
+Generated functions are cached by a fingerprint of the genome, both in
+memory (with least recently used eviction) and as source files on disk,
+and can be exported as standalone modules. Files in the cache directory
+are never trusted on their own - a file is only executed if it is exactly
+the source the generator gives for the genome, anything else is replaced
+"""
+
+import os
+import inspect
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from FULL_CPPN_plan import build_plan
+from FULL_CPPN_optimize import optimize_plan
+from FULL_CPPN_getpixels import getNormalizedInputArray
+from FULL_CPPN_act import activation_source, activation_helper
+
+# name of the function inside of every generated source
+FUNC_NAME = "cppn"
+
+# default limits/location of the compiled function cache
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_CACHE_DIR = "compiled_cppns"
+
+
+def get_plan(genotype):
+	"""gets the optimized activation plan of a genotype, genotypes loaded from
+	old pickle files may not have a cached plan so one is built for them
+	"""
+
+	if(hasattr(genotype, "getOptimizedPlan")):
+		return genotype.getOptimizedPlan()
+	return optimize_plan(build_plan(genotype))[0]
+
+
+def plan_fingerprint(plan):
+	"""Creates a fingerprint of everything in a plan that affects the output
+	of the network - two genomes with the same fingerprint generate the same code
+	"""
+
+	h = hashlib.sha1()
+	h.update(np.array([plan.numIn, plan.numOut, plan.numNodes], dtype=np.int64).tobytes())
+	for arr in (plan.nodeKeys, plan.srcRows, plan.dstRows):
+		h.update(arr.astype(np.int64).tobytes())
+	h.update(plan.weights.astype(np.float64).tobytes())
+	h.update(plan.nodeBias.astype(np.float64).tobytes())
+	# the stages decide when nodes are activated, which matters if crossover broke the level order
+	h.update(plan.edgeStages().astype(np.int64).tobytes())
+	return h.hexdigest()
+
+
+def _act_source(actKey, x):
+	"""returns the numpy expression that activates variable x with actKey"""
+
+	source = activation_source(actKey, x)
+	if(source is not None):
+		return source
+	# activations registered without a source are called through the activation registry
+	return "activate_array({0}, {1})".format(actKey, x)
+
+
+def generate_source(genotype, func_name=FUNC_NAME):
+	"""Generates the source for a straight-line numpy function that computes the
+	same output as genotype.getOutputBatch - the function takes an (N, numIn)
+	input matrix (bias excluded) and returns an (N, numOut) output matrix
+
+	Parameters:
+	genotype -- the CPPN genotype being compiled
+	func_name -- name given to the generated function
+
+	Returns:
+	string containing the source of a python module defining the function
+	"""
+
+	plan = get_plan(genotype)
+	body = []
+	defined = set()
+
+	# set values of input nodes and bias node
+	for row in range(plan.numIn - 1):
+		body.append("n{0} = inputs[:, {0}]".format(row))
+		defined.add(row)
+	body.append("n{0} = np.ones(inputs.shape[0])".format(plan.numIn - 1))
+	defined.add(plan.numIn - 1)
+
+	# nodes with constant parts folded in by the optimizer start at that value
+	for row in range(plan.numIn, plan.numNodes):
+		if(plan.nodeBias[row] != 0):
+			body.append("n{0} = np.full(inputs.shape[0], {1!r})".format(row, float(plan.nodeBias[row])))
+			defined.add(row)
+
+	usedKeys = set()
+	for (start, end, stageRows, srcPos, rounds, activate) in plan.stages:
+		# every in node of a stage is activated before any edge of the stage is added,
+		# the same as run_stages, so a node read in several stages is activated again
+		if(activate):
+			for src in stageRows:
+				if(src not in defined):
+					body.append("n{0} = np.zeros(inputs.shape[0])".format(src))
+					defined.add(src)
+				body.append("a{0} = {1}".format(src, _act_source(plan.nodeKeys[src], "n" + str(src))))
+				usedKeys.add(plan.nodeKeys[src])
+		for e in range(start, end):
+			src = plan.srcRows[e]
+			dst = plan.dstRows[e]
+			# do not activate the inputs, only hidden/output nodes
+			if(activate):
+				signal = "a" + str(src)
+			else:
+				signal = "n" + str(src)
+			if(dst in defined):
+				body.append("n{0} += {1}*{2!r}".format(dst, signal, float(plan.weights[e])))
+			else:
+				body.append("n{0} = {1}*{2!r}".format(dst, signal, float(plan.weights[e])))
+				defined.add(dst)
+
+	outNames = []
+	for outRow in plan.outRows:
+		if(outRow not in defined):
+			body.append("n{0} = np.zeros(inputs.shape[0])".format(outRow))
+		body.append("o{0} = {1}".format(outRow, _act_source(plan.nodeKeys[outRow], "n" + str(outRow))))
+		usedKeys.add(plan.nodeKeys[outRow])
+		outNames.append("o" + str(outRow))
+	body.append("return np.column_stack(({0},))".format(", ".join(outNames)))
+
+	lines = ['"""CPPN compiled from genome {0}"""'.format(plan_fingerprint(plan)), "", "import numpy as np"]
+	if(any(activation_source(k, "x") is None for k in usedKeys)):
+		lines.append("from FULL_CPPN_act import activate_array")
+	lines.append("")
+	# array functions called by the activation sources are copied into the module
+	helpers = set(activation_helper(k) for k in usedKeys) - set([None])
+	for helper in sorted(helpers, key=lambda func: func.__name__):
+		lines.append(inspect.getsource(helper))
+	lines.append("def {0}(inputs):".format(func_name))
+	# large negative sigmoid inputs overflow exp, the result correctly goes to 0
+	lines.append("\twith np.errstate(over='ignore'):")
+	lines.extend("\t\t" + line for line in body)
+
+	return "\n".join(lines) + "\n"
+
+
+def load_source(source, func_name=FUNC_NAME, name="<cppn>"):
+	"""compiles generated source and returns the function defined inside of it"""
+
+	namespace = {}
+	exec(compile(source, name, "exec"), namespace)
+	return namespace[func_name]
+
+
+def export_module(genotype, filepath, func_name=FUNC_NAME):
+	"""Writes the generated source for a genotype into a python file that can
+	be imported on its own to render the design
+
+	Parameters:
+	genotype -- the CPPN genotype being exported
+	filepath -- path of the .py file being written
+	func_name -- name given to the generated function
+	"""
+
+	new_file = open(filepath, "w")
+	new_file.write(generate_source(genotype, func_name))
+	new_file.close()
+
+
+class CompiledCache():
+	"""Cache of compiled CPPN functions keyed by genome fingerprint - functions
+	are kept in memory up to a maximum count (least recently used are evicted
+	first) and their sources are kept on disk so they survive between sessions
+
+	the source of a genome is always generated again and a disk copy is only
+	used if it is byte-identical, so stale files from an older generator or
+	files edited by anyone else with access to cache_dir are never executed
+	"""
+
+	def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, cache_dir=DEFAULT_CACHE_DIR):
+		"""Constructor for the compiled function cache
+
+		Parameters:
+		max_entries -- maximum number of functions kept in memory
+		cache_dir -- directory for generated sources, None to only cache in memory
+		"""
+
+		self.max_entries = max_entries
+		self.cache_dir = cache_dir
+		self.functions = OrderedDict()
+
+		# counters used to see how much the cache is saving
+		self.hits = 0
+		self.disk_hits = 0
+		self.misses = 0
+		self.rejected = 0
+
+	def get(self, genotype):
+		"""returns the compiled function for a genotype, generating it if needed"""
+
+		key = plan_fingerprint(get_plan(genotype))
+		if(key in self.functions):
+			self.hits += 1
+			self.functions.move_to_end(key)
+			return self.functions[key]
+
+		source = generate_source(genotype)
+		if(self.cache_dir is None):
+			self.misses += 1
+		else:
+			path = os.path.join(self.cache_dir, key + ".py")
+			if(self._read_source(path) == source):
+				self.disk_hits += 1
+			else:
+				# missing or different files are (re)written, never executed
+				if(os.path.exists(path)):
+					self.rejected += 1
+				self.misses += 1
+				self._write_source(path, source)
+
+		func = load_source(source, name="<cppn {0}>".format(key))
+		self.functions[key] = func
+		# evict least recently used functions once the cache is full
+		while(len(self.functions) > self.max_entries):
+			self.functions.popitem(last=False)
+
+		return func
+
+	def _read_source(self, path):
+		"""returns the contents of a source file, None if it cannot be read"""
+
+		try:
+			source_file = open(path, "r")
+		except OSError:
+			return None
+		source = source_file.read()
+		source_file.close()
+		return source
+
+	def _write_source(self, path, source):
+		"""writes a source file to a temporary name and then moves it into
+		place so other processes never read a partially written file
+		"""
+
+		os.makedirs(self.cache_dir, exist_ok=True)
+		tmp_path = "{0}.{1}.tmp".format(path, os.getpid())
+		tmp_file = open(tmp_path, "w")
+		tmp_file.write(source)
+		tmp_file.close()
+		os.replace(tmp_path, path)
+
+	def clear(self):
+		self.functions = OrderedDict()
+
+	def __len__(self):
+		return len(self.functions)
+
+	def __str__(self):
+		result = ""
+		result += ("COMPILED FUNCTIONS IN MEMORY: " + str(len(self.functions)) + "\n")
+		result += ("HITS: " + str(self.hits) + " DISK HITS: " + str(self.disk_hits) + " MISSES: " + str(self.misses) +
+				" REJECTED: " + str(self.rejected) + "\n")
+		return result
+
+
+# cache shared by everything in the process that compiles genotypes
+COMPILED_CACHE = CompiledCache()
+
+
+def compile_genotype(genotype, cache=None):
+	"""returns a compiled numpy function for the genotype, using the shared
+	cache unless another cache is given
+	"""
+
+	if(cache is None):
+		cache = COMPILED_CACHE
+	return cache.get(genotype)
+
+
+def render_genotype(genotype, num_x, num_y, cache=None):
+	"""Renders the first output of a genotype over a num_x by num_y grid of
+	normalized inputs with its compiled function - used to render finished
+	designs at high resolutions
+
+	Returns:
+	flattened numpy array of num_x*num_y outputs
+	"""
+
+	func = compile_genotype(genotype, cache)
+	return func(getNormalizedInputArray(num_x, num_y))[:, 0]
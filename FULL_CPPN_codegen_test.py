@@ -0,0 +1,89 @@
+"""Tests for the CPPN code generator - compiled functions must give the same
+outputs as Genotype.getOutput, including for children of crossover whose
+connections break the level order of their nodes, and the compiled cache
+must never run a source file it did not generate. Can be run with pytest or
+directly from terminal
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from FULL_CPPN_codegen import CompiledCache, get_plan, plan_fingerprint
+from FULL_CPPN_getpixels import getNormalizedInputArray
+from FULL_CPPN_testhelp import make_deterministic, make_population
+
+NUM_X = 6
+NUM_Y = 6
+
+
+def same_as_get_output(genotype, cache, inputs):
+	"""returns True if the compiled function gives the outputs of getOutput"""
+
+	expected = np.array([genotype.getOutput(list(row)) for row in inputs])
+	return np.allclose(cache.get(genotype)(inputs), expected)
+
+
+def test_mutated_networks():
+	np.random.seed(5)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	cache = CompiledCache(cache_dir=None)
+	for genotype in make_population(20, 10):
+		assert same_as_get_output(genotype, cache, inputs)
+
+
+def test_crossover_out_of_order():
+	np.random.seed(11)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	cache = CompiledCache(cache_dir=None)
+	pop = make_population(20, 10)
+
+	numOutOfOrder = 0
+	for i in range(400):
+		parent1 = pop[np.random.randint(len(pop))]
+		parent2 = pop[np.random.randint(len(pop))]
+		child = parent1.clone().crossover(parent2)
+		make_deterministic(child)
+		if(not child.getActivationPlan().inOrder()):
+			numOutOfOrder += 1
+			assert same_as_get_output(child, cache, inputs), i
+
+	# the test is only useful if crossover actually broke the level order
+	assert numOutOfOrder > 0
+
+
+def test_disk_copy_is_checked():
+	np.random.seed(6)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	genotype = make_population(1, 6)[0]
+	cache_dir = tempfile.mkdtemp()
+	try:
+		path = os.path.join(cache_dir, plan_fingerprint(get_plan(genotype)) + ".py")
+		# a file with the right name but other contents must not be executed
+		tampered = open(path, "w")
+		tampered.write("def cppn(inputs):\n\traise AssertionError('tampered source was executed')\n")
+		tampered.close()
+		cache = CompiledCache(cache_dir=cache_dir)
+		assert same_as_get_output(genotype, cache, inputs)
+		assert cache.rejected == 1 and cache.disk_hits == 0
+
+		# the rewritten file matches the generated source, so it is used by a new cache
+		cache = CompiledCache(cache_dir=cache_dir)
+		assert same_as_get_output(genotype, cache, inputs)
+		assert cache.rejected == 0 and cache.disk_hits == 1
+	finally:
+		shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_mutated_networks, test_crossover_out_of_order, test_disk_copy_is_checked):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -15,6 +15,8 @@ from FULL_CPPN_deaphelp import weightMutate, conMutate, nodeMutate, xover, xover
 from FULL_CPPN_innovation import GlobalInnovation
 import numpy as np
 from FULL_CPPN_evalg import getSharingMatrix, speciatePopulationFirstTime, speciatePopulationNotFirstTime
+from FULL_CPPN_species import SpeciesSet
+from FULL_CPPN_genedist import get_distance
 from FULL_CPPN_evalg import getFittestFromSpecies, getNicheCounts, binarySelect
 from FULL_CPPN_vis import visConnections, visHiddenNodes, findNumGoodSolutions, showHeatMap, visGeneralData
 from FULL_CPPN_evaluation import evaluate_xor, evaluate_classification
@@ -75,8 +77,6 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 	# if a species' fitness becomes stagnant - it is penalized
 	MIN_NUM_STAGNANT_GENERATIONS = 35
 	STAGNATION_THRESHOLD = 1.05
-	LAST_FITNESS = []
-	CURRENT_STAG_GENS = []
 
 	# the following is used for modifying the speciation threshold
 	GENERATION_TO_MODIFY_THRESH = 30 # this is the first generation that the threshold can begin being adjusted
@@ -85,6 +85,9 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 	LAST_NUM_SPECIES = -1
 
 
+	# species keep their IDs between generations, stagnation is tracked per species
+	speciesSet = SpeciesSet(thresh, theta1, theta2, theta3)
+
 	for g in range(NGEN):
 		print("RUNNING GENERATION " + str(g))
 
@@ -94,10 +97,10 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 			visHiddenNodes(pop)
 
 		# create a 2D array representing species from the population
-		if(g == 0):
-			species = speciatePopulationFirstTime(pop, thresh, theta1, theta2, theta3)
-		else:
-			species = speciatePopulationNotFirstTime(pop, thresh, theta1, theta2, theta3)
+		# elites keep the species they were chosen from, the rest are compared against all representatives at once
+		speciesSet.thresh = thresh
+		currSpecies = speciesSet.speciate(pop)
+		species = [spec.members for spec in currSpecies]
 
 		# determine if speciation threshold needs to be modified and apply modification
 		if(g >= GENERATION_TO_MODIFY_THRESH):
@@ -126,29 +129,18 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 			avgSpecFit /= len(species[specInd])
 			
 			# check if fitness is stagnant for current generations and update stagnant counter appropriately
-			if(specInd < len(LAST_FITNESS)):
-				if(avgSpecFit/LAST_FITNESS[specInd] <= STAGNATION_THRESHOLD):
-					CURRENT_STAG_GENS[specInd] = CURRENT_STAG_GENS[specInd] + 1
-				else:
-					# reset stagnation counter is a species improves enough to be above the threshold
-					CURRENT_STAG_GENS[specInd] = 0
-			
-			# if this is the first generation for a species, append values for it into both stagnation-tracking lists
-			else:
-				LAST_FITNESS.append(avgSpecFit)
-				CURRENT_STAG_GENS.append(0)
+			# the first generation of a species only records its fitness
+			currSpecies[specInd].recordFitness(avgSpecFit, STAGNATION_THRESHOLD)
 
 		# traverse the list of stagnance counters to see if any species need to be penalized for being stagnant
-		index = 0
-		for spec in CURRENT_STAG_GENS:
+		for spec in currSpecies:
 			# if stagnant generations too high, penalize the species
-			if(spec >= MIN_NUM_STAGNANT_GENERATIONS):
+			if(spec.stagnantGens >= MIN_NUM_STAGNANT_GENERATIONS):
 				# penalizing stagnant species
-				for org in species[index]:
+				for org in spec.members:
 					# penalization increases as the number of stagnant generations increases
-					org.fitness /= (float(2*spec)/MIN_NUM_STAGNANT_GENERATIONS)
+					org.fitness /= (float(2*spec.stagnantGens)/MIN_NUM_STAGNANT_GENERATIONS)
 					org.fit_obj.values = (org.fitness,)	
-			index += 1
 
 		tournamentSelectSpecies = []
 
@@ -164,7 +156,8 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 		
 		# fittest from species function selects all species representatives
 		# and sets the species variable for the rest of the population to sys.maxsize
-		fitTup = getFittestFromSpecies(species)
+		# the representatives are marked with the ID of their species
+		fitTup = speciesSet.getFittest()
 		bestInSpecies = fitTup[0]
 		pop = fitTup[1]
 
@@ -201,7 +194,7 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 				interspecies_probability = .001 # probability individuals crossed over if not in same species
 				child1 = pop[child1Ind]
 				child2 = pop[child2Ind]
-				dist = child1.getDistance(child2, theta1, theta2, theta3)
+				dist = get_distance(child1, child2, theta1, theta2, theta3)
 
 				# crossover happens with different probability depending if individuals in question are in same species
 				if(child1.species == sys.maxsize and child2.species == sys.maxsize and dist < thresh and np.random.uniform() <= cxPb):
@@ -5,8 +5,9 @@ from scoop import futures
 import pickle
 
 from FULL_CPPN_struct import Genotype
-from FULL_CPPN_deaphelp import weightMutate, conMutate, nodeMutate, xover, actMutate
-from FULL_CPPN_evaluation import evaluate_pic_scoop, evaluate_nov_pic
+from FULL_CPPN_deaphelp import weightMutate, conMutate, nodeMutate, xover, actMutate, cross_pairs
+from FULL_CPPN_evaluation import evaluate_pic_scoop, evaluate_nov_pic, evaluate_pic_population
+from FULL_CPPN_nsga import sel_nsga2
 
 """The below contains all of the deap configuration used for CPPN so that it can be
 called and edited from a central location"""
@@ -32,9 +33,11 @@ toolbox.register("population", tools.initRepeat, list, toolbox.individual, n=POP
 
 # register all functions needed for evolution in the toolbox
 toolbox.register("evaluate", evaluate_pic_scoop)
+toolbox.register("evaluate_pop", evaluate_pic_population)
 toolbox.register("assign_fit", evaluate_nov_pic)
-toolbox.register("select", tools.selNSGA2, k=POP_SIZE)
+toolbox.register("select", sel_nsga2, k=POP_SIZE)
 toolbox.register("mate", xover)
+toolbox.register("mate_pairs", cross_pairs)
 toolbox.register("weightMutate", weightMutate)
 toolbox.register("connectionMutate", conMutate)
 toolbox.register("nodeMutate", nodeMutate)
@@ -18,11 +18,15 @@ from FULL_CPPN_deaphelp import weightMutate, conMutate, nodeMutate, xover, xover
 from FULL_CPPN_deaphelp import examine_population, get_file_name
 from FULL_CPPN_innovation import GlobalInnovation
 from FULL_CPPN_evalg import getSharingMatrix, speciatePopulationFirstTime, speciatePopulationNotFirstTime
+from FULL_CPPN_species import SpeciesSet
+from FULL_CPPN_genedist import get_distance
 from FULL_CPPN_evalg import getFittestFromSpecies, getNicheCounts, binarySelect
 #from FULL_CPPN_vis import visConnections, visHiddenNodes, findNumGoodSolutions
-from FULL_CPPN_evaluation import evaluate_classification, evaluate_pic, evaluate_pic_scoop, assign_fit_scoop
+from FULL_CPPN_evaluation import evaluate_classification, evaluate_pic, evaluate_pic_scoop, assign_fit_scoop, assign_fit_population, evaluate_pic_population
 #from FULL_CPPN_gendata import genGaussianData, genCircularData, genXORData
 from FULL_CPPN_getpixels import getBinaryPixels, getNormalizedInputs#, graphImage
+from FULL_CPPN_evalctx import create_context
+from FULL_CPPN_targetcache import load_target
 
 # set up arguments to be parsed from the terminal
 parser = argparse.ArgumentParser()
@@ -50,8 +54,6 @@ np.random.seed(SEED)
 # if a species' fitness becomes stagnant - it is penalized
 MIN_NUM_STAGNANT_GENERATIONS = 35
 STAGNATION_THRESHOLD = 1.05
-LAST_FITNESS = []
-CURRENT_STAG_GENS = []
 
 # the following is used for modifying the speciation threshold
 GENERATION_TO_MODIFY_THRESH = 30 # this is the first generation that the threshold can begin being adjusted
@@ -70,7 +72,10 @@ NUM_Y = 50
 NORM_IN = getNormalizedInputs(NUM_X, NUM_Y)
 # must get filename from parser to complete file path
 FILE_PATH = './fitting_images/' + args.path
-PIXELS = getBinaryPixels(FILE_PATH, NUM_X, NUM_Y)
+PIXELS = load_target(FILE_PATH, NUM_X, NUM_Y).pixels
+
+# inputs and target are loaded once by each worker, tasks only carry the ID of the context
+CONTEXT = create_context(NORM_IN, PIXELS)
 
 
 
@@ -95,8 +100,11 @@ toolbox.register("population", tools.initRepeat, list, toolbox.individual, n = P
 
 # register all functions needed for evolution in the toolbox
 TOURN_SIZE = 3
-toolbox.register("evaluate", evaluate_pic_scoop)
+toolbox.register("evaluate", evaluate_pic_scoop, ctx_id=CONTEXT.id)
+toolbox.register("evaluate_pop", evaluate_pic_population, ctx_id=CONTEXT.id)
 toolbox.register("assign_fit", assign_fit_scoop)
+toolbox.register("assign_fit_pop", assign_fit_population, mat_pen=MATERIAL_PENALIZATION_THRESHOLD,
+		mat_unp=MATERIAL_UNPRESENT_PENALIZATION, ctx_id=CONTEXT.id)
 toolbox.register("select", binarySelect)
 toolbox.register("tournSelect", tools.selTournament, fit_attr = "fitness")
 toolbox.register("mate", xover_avg)
@@ -118,9 +126,9 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 	gb = GlobalInnovation(numIn, numOut)
 
 
-	# used to check whether a species fitness becomes stagnant
-	LAST_FITNESS = []	
-	CURRENT_STAG_GENS = []
+
+	# species keep their IDs between generations, stagnation is tracked per species
+	speciesSet = SpeciesSet(thresh, theta1, theta2, theta3)
 
 	for g in range(NGEN):
 		print("RUNNING GENERATION " + str(g))
@@ -131,10 +139,10 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 		#	visHiddenNodes(pop)
 
 		# create a 2D array representing species from the population
-		if(g == 0):
-			species = speciatePopulationFirstTime(pop, thresh, theta1, theta2, theta3)
-		else:
-			species = speciatePopulationNotFirstTime(pop, thresh, theta1, theta2, theta3)
+		# elites keep the species they were chosen from, the rest are compared against all representatives at once
+		speciesSet.thresh = thresh
+		currSpecies = speciesSet.speciate(pop)
+		species = [spec.members for spec in currSpecies]
 
 		# determine if speciation threshold needs to be modified and apply modification
 		# decrease threshold slowly to increase species, but increase quickly to keep to many
@@ -154,15 +162,11 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 		# find all fitness values for individuals in population, update fitness tracking for species
 		for specInd in range(len(species)):
 			avgSpecFit = 0.0
-			# only the output pixels are mapped back, all evaluation must be done below
-			outputs = toolbox.map(toolbox.evaluate, species[specInd])
-			output_tups = []
-			for o in outputs:
-				output_tups.append((o[0], PIXELS, len(species[specInd]), 
-						MATERIAL_PENALIZATION_THRESHOLD, MATERIAL_UNPRESENT_PENALIZATION))
-
-			# map all outputs to the genotypes with their actual fitness assigned
-			fitnesses = toolbox.map(toolbox.assign_fit, output_tups)		
+			# the whole species is evaluated at once, fitness is assigned below
+			outputs = toolbox.evaluate_pop(species[specInd])
+
+			# score all outputs of the species together with the actual fitness assigned
+			fitnesses = toolbox.assign_fit_pop(outputs, len(species[specInd]))
 			org_ind = 0
 			for f in fitnesses:
 				gen = species[specInd][org_ind]
@@ -200,29 +204,18 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 			'''
 			
 			# check if fitness is stagnant for current generations and update stagnant counter appropriately
-			if(specInd < len(LAST_FITNESS)):
-				if(avgSpecFit/LAST_FITNESS[specInd] <= STAGNATION_THRESHOLD):
-					CURRENT_STAG_GENS[specInd] = CURRENT_STAG_GENS[specInd] + 1
-				else:
-					# reset stagnation counter is a species improves enough to be above the threshold
-					CURRENT_STAG_GENS[specInd] = 0
-			
-			# if this is the first generation for a species, append values for it into both stagnation-tracking lists
-			else:
-				LAST_FITNESS.append(avgSpecFit)
-				CURRENT_STAG_GENS.append(0)
+			# the first generation of a species only records its fitness
+			currSpecies[specInd].recordFitness(avgSpecFit, STAGNATION_THRESHOLD)
 
 		# traverse the list of stagnance counters to see if any species need to be penalized for being stagnant
-		index = 0
-		for spec in CURRENT_STAG_GENS:
+		for spec in currSpecies:
 			# if stagnant generations too high, penalize the species
-			if(spec >= MIN_NUM_STAGNANT_GENERATIONS):
+			if(spec.stagnantGens >= MIN_NUM_STAGNANT_GENERATIONS):
 				# penalizing stagnant species
-				for org in species[index]:
+				for org in spec.members:
 					# penalization increases as the number of stagnant generations increases
-					org.fitness /= (float(2*spec)/MIN_NUM_STAGNANT_GENERATIONS)
+					org.fitness /= (float(2*spec.stagnantGens)/MIN_NUM_STAGNANT_GENERATIONS)
 					org.fit_obj.values = (org.fitness,)	
-			index += 1
 
 		tournamentSelectSpecies = []
 
@@ -239,7 +232,8 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 		
 		# fittest from species function selects all species representatives
 		# and sets the species variable for the rest of the population to sys.maxsize
-		fitTup = getFittestFromSpecies(species)
+		# the representatives are marked with the ID of their species
+		fitTup = speciesSet.getFittest()
 		bestInSpecies = fitTup[0]
 		pop = fitTup[1]
 
@@ -278,7 +272,7 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 				interspecies_probability = .001 # probability individuals crossed over if not in same species
 				child1 = pop[child1Ind]
 				child2 = pop[child2Ind]
-				dist = child1.getDistance(child2, theta1, theta2, theta3)
+				dist = get_distance(child1, child2, theta1, theta2, theta3)
 
 				# crossover happens with different probability depending if individuals in question are in same species
 				if(child1.species == sys.maxsize and child2.species == sys.maxsize and dist < thresh and np.random.uniform() <= cxPb):
@@ -14,6 +14,7 @@ import pickle
 
 from FULL_CPPN_struct import Genotype
 from FULL_CPPN_getpixels import graphImage
+from FULL_CPPN_nsga import non_dominated_sort, fitness_matrix
 
 '''
 function for applying weight mutation to an individual
@@ -100,6 +101,27 @@ def xover_avg(individual1, individual2):
 	return (newInd1, newInd2)
 
 
+def cross_pairs(pairs, method="crossoverReturnBoth"):
+	"""Crosses over a whole generation of pairs at once - the random numbers
+	that decide which matching genes are swapped are drawn for every pair in
+	a single call and split between the pairs
+
+	Parameters:
+	pairs -- list of (individual1, individual2) tuples being crossed over
+	method -- name of the crossover method of the individuals that is used
+
+	Returns:
+	list with the result of the crossover method for every pair
+	"""
+
+	# a pair can never have more matching genes than its smaller genome
+	sizes = [min(len(ind1.getInnovationArrays()[0]), len(ind2.getInnovationArrays()[0])) for (ind1, ind2) in pairs]
+	offsets = np.cumsum([0] + sizes)
+	draws = np.random.uniform(size=offsets[-1])
+
+	return [getattr(ind1, method)(ind2, draws=draws[offsets[i]:offsets[i + 1]]) for i, (ind1, ind2) in enumerate(pairs)]
+
+
 '''
 this method takes a partial population that was yielded by selecting 
 from species and clones individuals to make the population have the 
@@ -115,7 +137,7 @@ def makeFullPop(partialPop, popSize):
 	# continually add copies of individuals for the partial population
 	# until partial population is of the correct size
 	while(len(partialPop) < popSize):
-		currentOrg = partialPop[index % ogSize].getCopy()
+		currentOrg = partialPop[index % ogSize].clone()
 		currentOrg.species = sys.maxsize
 		partialPop.append(currentOrg)
 		index += 1
@@ -132,7 +154,7 @@ output, used to visualize results of data set problems for CPPN
 @return numpy array containing all outputs that is resized properly to be put into the heat map
 '''
 def getOutputsForHeatMap(org, maxValue, step):
-	outputs = []
+	inputs = []
 	# start activating at upper left corner of range
 	# move down the column of pixels then move to the next row
 	# until the bottom right corner is reached
@@ -140,17 +162,18 @@ def getOutputsForHeatMap(org, maxValue, step):
 	while(xVal <= maxValue):
 		yVal = maxValue
 		while(yVal >= -maxValue):
-			outputs.append(org.getOutput([xVal, yVal])[0])
+			inputs.append([xVal, yVal])
 			yVal -= step
 		xVal += step
 
-	# put values into a numpy array and reshape it based on maxValue and step before returning
-	outputs_np = np.array(outputs, copy = True)
+	# activate the CPPN over the whole range at once, then reshape
+	# based on maxValue and step before returning
+	outputs_np = org.getOutputBatch(np.array(inputs))[:, 0]
 	outputs_np = np.reshape(outputs_np, (int(maxValue*2/step), int(maxValue*2/step)))
 	return outputs_np
 
 
-def save_population(population, seed_num, filepath):
+def save_population(population, seed_num, filepath, phenotypes=None):
 	"""Fucntion for serializing an entire population of CPPN
 	genotypes using pickle. 
 
@@ -158,11 +181,15 @@ def save_population(population, seed_num, filepath):
 	population -- the population being saved
 	seed_num -- the seed number used to evolve the population
 	filename -- the filepath to the file being saved
+	phenotypes -- optional PackedImages with the output of every individual
 	"""
 
 	new_file = open(filepath, "wb")
-	# save population in a tuple with the seed number
+	# save population in a tuple with the seed number, packed phenotypes are added
+	# at the end so loading the population with [0] still works
 	pop_tuple = (population, seed_num)
+	if(phenotypes is not None):
+		pop_tuple = (population, seed_num, phenotypes)
 	pickle.dump(pop_tuple, new_file)
 	new_file.close()
 
@@ -197,11 +224,8 @@ def examine_population(population, norm_in):
 
 	n = 0
 	for org in population:
-		outputs = []
-		# get all outputs for every pixel in space of picture and put all into a numpy array
-		for ins in norm_in:
-			outputs.append(org.getOutput([ins[0], ins[1]])[0])
-		outputs_np = np.array(outputs, copy = True)
+		# get all outputs for every pixel in space of picture at once in a numpy array
+		outputs_np = org.getOutputBatch(np.array(norm_in)[:, :2])[:, 0]
 		# 100 and 200 represent the figure numbers for each of the separate graphs
 		graphImage(outputs_np, NUM_X, NUM_Y, 100)
 		org.graph_genotype(200)
@@ -216,20 +240,37 @@ def examine_population_dmat(population, NUM_X, NUM_Y):
 	norm_in = pickle.load(open("norm_in.txt", "rb"))
 	d_mat = pickle.load(open("d_mat.txt", "rb"))
 
+	# each row of inputs is the (x, y) location followed by its d parameter
+	inputs = np.column_stack((np.array(norm_in), d_mat))
+
 	n = 0
 	for org in population:
-		outputs = []
-		# get all outputs for every pixel in space of picture and put all into a numpy array
-		for ins_1, ins_2 in zip(norm_in, d_mat):
-			ins = (ins_1[0], ins_1[1], ins_2)
-			outputs.append(org.getOutput(ins)[0])
-		outputs_np = np.array(outputs, copy = True)
+		# get all outputs for every pixel in space of picture at once in a numpy array
+		outputs_np = org.getOutputBatch(inputs)[:, 0]
 		# 100 and 200 represent the figure numbers for each of the separate graphs
 		graphImage(outputs_np, NUM_X, NUM_Y, 100)
 		org.graph_genotype(200)
 		input("SHOWING individual #{0}".format(str(n)))
 		n += 1
 
+def get_edge_report(population):
+	"""Method for summarizing how many edges of a population are actually
+	evaluated - raw edges count every connection in the genotypes (including
+	disabled ones) and effective edges count the edges left after the
+	activation plans are optimized
+
+	Returns:
+	string with the raw and effective edge counts of the population
+	"""
+
+	reports = [org.getPlanReport() for org in population]
+	raw = sum(r.rawEdges for r in reports)
+	enabled = sum(r.enabledEdges for r in reports)
+	effective = sum(r.effectiveEdges for r in reports)
+	percent = 100.0*effective/raw if raw > 0 else 100.0
+
+	return "RAW EDGES: {0} ENABLED: {1} EFFECTIVE: {2} ({3:.1f}% of raw)".format(raw, enabled, effective, percent)
+
 def get_pareto_front(pop):
 	"""This function goes through a population and finds the pareto
 	optimal front within the population and returns it within a list.
@@ -237,23 +278,10 @@ def get_pareto_front(pop):
 	by any other individuals within the population
 	"""
 	
-	pareto_front = []
-	# go through every individual and see if that individual is dominated
-	for ind in pop:
-		fit_tup = ind.fitness
-		other_ind = 0
-		found_dom = False
-		# compare to every other individual in population
-		while(not found_dom and other_ind < len(pop)):
-			other_fit = pop[other_ind].fitness
-			if(other_fit.dominates(fit_tup)):
-				found_dom = True
-			other_ind += 1
-		# add to pareto front if not dominated
-		if(not found_dom):
-			pareto_front.append(ind)
+	# the first front of the non-dominated sort, in the order of the population
+	fronts = non_dominated_sort(fitness_matrix(pop), first_front_only=True)
+	if(len(fronts) == 0):
+		return []
 
-	
-	# return all non-dominated individuals
-	return pareto_front
+	return [pop[ind] for ind in fronts[0]]
 
@@ -0,0 +1,189 @@
+"""This file contains the incremental (delta) evaluation of CPPN genotypes.
+The value of every node of an evaluated genotype is kept in a cache, when
+a mutant is copied from that genotype and changed by weight, activation or
+connection mutations only the nodes below the changed nodes are
+re-evaluated - all other node values are taken from the parent.
+
+The cache is bounded by the number of bytes of node values it holds, least
+recently used entries are evicted first and entries of individuals that
+left the population can be dropped after every selection
+"""
+
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from FULL_CPPN_act import activate_group
+
+# default maximum amount of memory for cached node values (256 MB)
+DEFAULT_MAX_BYTES = 256*1024*1024
+
+
+class NodeValueCache():
+	"""Cache of the node values of evaluated genotypes for one fixed matrix of
+	inputs - genotypes store the key of their entry in value_key, which is
+	copied into mutants along with the rest of the genotype
+	"""
+
+	def __init__(self, inputs, max_bytes=DEFAULT_MAX_BYTES):
+		"""Constructor for the node value cache
+
+		Parameters:
+		inputs -- numpy array of shape (N, numIn - 1) that all genotypes are evaluated on
+		max_bytes -- maximum size of all cached node values together
+		"""
+
+		self.inputs = np.asarray(inputs, dtype=float)
+		self.max_bytes = max_bytes
+		self.entries = OrderedDict()
+		self.num_bytes = 0
+
+		# counters used to see how much the cache is saving
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.rows_evaluated = 0
+		self.rows_total = 0
+
+	def get(self, key):
+		"""returns (nodeNums, values) stored under key or None if it is not cached"""
+
+		if(key is None or key not in self.entries):
+			return None
+		self.entries.move_to_end(key)
+		return self.entries[key]
+
+	def put(self, nodeNums, values):
+		"""stores node values in the cache and returns the key of the new entry"""
+
+		key = uuid.uuid4().hex
+		values.flags.writeable = False
+		self.entries[key] = (nodeNums, values)
+		self.num_bytes += values.nbytes
+
+		# evict least recently used entries, always keep the newest one
+		while(self.num_bytes > self.max_bytes and len(self.entries) > 1):
+			(oldNums, oldValues) = self.entries.popitem(last=False)[1]
+			self.num_bytes -= oldValues.nbytes
+			self.evictions += 1
+
+		return key
+
+	def retain(self, population):
+		"""drops every entry that does not belong to an individual of the population,
+		should be called after selection so only possible parents are kept
+		"""
+
+		keep = set(getattr(ind, "value_key", None) for ind in population)
+		for key in list(self.entries.keys()):
+			if(key not in keep):
+				self.num_bytes -= self.entries[key][1].nbytes
+				del self.entries[key]
+				self.evictions += 1
+
+	def clear(self):
+		self.entries = OrderedDict()
+		self.num_bytes = 0
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __str__(self):
+		result = ""
+		result += ("CACHED GENOTYPES: " + str(len(self.entries)) + " MB: " + str(self.num_bytes/(1024.0*1024.0)) + "\n")
+		result += ("HITS: " + str(self.hits) + " MISSES: " + str(self.misses) + " EVICTIONS: " + str(self.evictions) + "\n")
+		result += ("NODE ROWS RE-EVALUATED: " + str(self.rows_evaluated) + " OF " + str(self.rows_total) + "\n")
+		return result
+
+
+def find_dirty_rows(plan, dirty):
+	"""marks every node below an already dirty node as dirty, edges of the plan
+	are in topological order so a single pass over the stages is enough
+	"""
+
+	for (start, end, stageRows, srcPos, rounds, activate) in plan.stages:
+		srcDirty = dirty[plan.srcRows[start:end]]
+		dirty[plan.dstRows[start:end][srcDirty]] = True
+
+	return dirty
+
+
+def run_dirty_stages(plan, values, dirty):
+	"""re-evaluates only the dirty nodes of a plan, clean nodes keep the values
+	they already have in the values matrix
+
+	Parameters:
+	plan -- the ActivationPlan being run
+	values -- 2D numpy array of node values, updated in place
+	dirty -- boolean numpy array marking the node rows that must be re-evaluated
+	"""
+
+	values[dirty] = plan.nodeBias[dirty, None]
+	for (start, end, stageRows, srcPos, rounds, activate) in plan.stages:
+		for (roundStart, roundEnd) in rounds:
+			edges = roundStart + np.flatnonzero(dirty[plan.dstRows[roundStart:roundEnd]])
+			if(len(edges) == 0):
+				continue
+			srcRows = plan.srcRows[edges]
+			# do not activate the inputs, only hidden/output nodes
+			if(activate):
+				signals = activate_group(plan.nodeKeys[srcRows], values[srcRows])
+			else:
+				signals = values[srcRows]
+			# FORMULA: nodeOut.val += activation(nodeIn.val)*weight
+			values[plan.dstRows[edges]] += signals*plan.weights[edges, None]
+
+
+def evaluate_delta(genotype, cache):
+	"""Evaluates a genotype over the inputs of the cache, reusing the node values
+	of the genotype it was copied from when only weights, activations or
+	connections have changed since then
+
+	Parameters:
+	genotype -- the Genotype being evaluated
+	cache -- NodeValueCache holding the values of previously evaluated genotypes
+
+	Returns:
+	numpy array of shape (N, numOut) of network outputs
+	"""
+
+	plan = genotype.getActivationPlan()
+	nodeNums = genotype.getNodeNumbers()
+	entry = cache.get(getattr(genotype, "value_key", None))
+	changed = getattr(genotype, "changed_nodes", None)
+	cache.rows_total += plan.numNodes
+
+	# cached values can only be used if the node list is the same as when they were stored, and
+	# only hold the values nodes are read at if every node is read after all of its edges
+	if(entry is not None and changed is not None and np.array_equal(entry[0], nodeNums) and plan.inOrder()):
+		cache.hits += 1
+		if(len(changed) == 0):
+			values = entry[1]
+		else:
+			# inputs are never activated, so their values never change
+			dirty = np.isin(nodeNums, list(changed))
+			dirty[:plan.numIn] = False
+			dirty = find_dirty_rows(plan, dirty)
+			values = entry[1].copy()
+			run_dirty_stages(plan, values, dirty)
+			cache.rows_evaluated += np.count_nonzero(dirty)
+			genotype.value_key = cache.put(nodeNums, values)
+	else:
+		cache.misses += 1
+		values = plan.nodeValues(cache.inputs)
+		cache.rows_evaluated += plan.numNodes
+		genotype.value_key = cache.put(nodeNums, values)
+
+	genotype.changed_nodes = set()
+	return plan.outputsFrom(values)
+
+
+def evaluate_population_delta(pop, cache):
+	"""Evaluates a list of genotypes with evaluate_delta
+
+	Returns:
+	numpy array of shape (len(pop), N, numOut) with the outputs of every genotype
+	"""
+
+	return np.array([evaluate_delta(ind, cache) for ind in pop])
@@ -0,0 +1,74 @@
+"""Equivalence tests for delta evaluation - mutants evaluated from the cached
+node values of their parents must give the same outputs as evaluating their
+whole plan, after every kind of mutation. Can be run with pytest or directly
+from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_innovation import GlobalInnovation
+from FULL_CPPN_getpixels import getNormalizedInputArray
+from FULL_CPPN_deltaeval import NodeValueCache, evaluate_delta
+from FULL_CPPN_testhelp import make_population, GAUSS_KEY, REPLACEMENT_KEY
+
+# the networks are compared on a small grid
+NUM_X = 6
+NUM_Y = 6
+
+
+def replace_gaussians(genotype):
+	"""replaces gaussian activations added by a mutation, the changed nodes are
+	passed on so delta evaluation still re-evaluates only below them
+	"""
+
+	changed = []
+	for i, node in enumerate(genotype.nodes):
+		if(node.getActKey() == GAUSS_KEY):
+			genotype.ownNode(i).setActKey(REPLACEMENT_KEY)
+			changed.append(node.getNodeNum())
+	if(len(changed) > 0):
+		genotype.invalidatePlan("activations", changed)
+
+
+def test_delta_after_mutators():
+	np.random.seed(5)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	gb = GlobalInnovation(2, 1)
+	gb.current = 1000
+	pop = make_population(20, 6)
+	cache = NodeValueCache(inputs)
+	for ind in pop:
+		evaluate_delta(ind, cache)
+
+	def node_mutate(ind):
+		(gb.innovDict, gb.current) = ind.nodeMutate(gb.innovDict, gb.current)
+
+	def connection_mutate(ind):
+		gb.current = ind.connectionMutate(gb.current)
+
+	mutators = [("weightMutate", lambda ind: ind.weightMutate()), ("activationMutate", lambda ind: ind.activationMutate()),
+			("nodeMutate", node_mutate), ("connectionMutate", connection_mutate)]
+	for (name, mutate) in mutators:
+		hits = cache.hits
+		for parent in pop:
+			child = parent.clone()
+			mutate(child)
+			replace_gaussians(child)
+			expected = child.getActivationPlan().activate(inputs)
+			assert np.allclose(evaluate_delta(child, cache), expected), name
+
+		# weight and activation changes keep the node list, so the cached values must be used
+		if(name in ("weightMutate", "activationMutate")):
+			assert cache.hits > hits, name
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_delta_after_mutators,):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -0,0 +1,266 @@
+"""This file contains the behaviour descriptor extractors used to measure
+novelty. Comparing raw output images is expensive and mostly measures pixel
+aligned noise, so each extractor reduces an output image to a few tens of
+values before nearest neighbours are searched:
+
+projection -- a fixed random projection of the pixels
+pca -- an incremental PCA fitted on the phenotypes of the archive
+thumbnail -- block averages of the image at a few coarse scales
+moments -- area, centroid, second order moments and contour features of the shape
+
+Every extractor takes a (P x N) matrix of outputs or PackedImages and keeps
+track of its memory use and of the time spent extracting descriptors
+"""
+
+import time
+
+import numpy as np
+
+from FULL_CPPN_phenotype import PackedImages
+
+# default number of dimensions of the projection and PCA descriptors
+DEFAULT_DIMS = 32
+
+# default side lengths of the thumbnails
+DEFAULT_SCALES = (4, 8)
+
+DESCRIPTOR_TYPES = ("none", "projection", "pca", "thumbnail", "moments")
+
+
+def _as_matrix(outputs):
+	"""returns outputs as a float32 matrix with one image in each row, unpacking packed images"""
+
+	if(isinstance(outputs, PackedImages)):
+		return outputs.unpack().astype(np.float32)
+
+	outputs = np.asarray(outputs, dtype=np.float32)
+	if(outputs.ndim == 1):
+		outputs = outputs[None, :]
+
+	return outputs
+
+
+class DescriptorExtractor():
+	"""Base class of the extractors - subclasses implement _extract and may
+	implement partial_fit, version changes whenever fitting changes the
+	descriptors of images that were already extracted
+	"""
+
+	def __init__(self, dims):
+		self.dims = dims
+		self.version = 0
+		self.numExtracted = 0
+		self.extractTime = 0.0
+
+	def transform(self, outputs):
+		"""returns the (P x dims) float32 descriptors of the outputs"""
+
+		start = time.time()
+		desc = self._extract(_as_matrix(outputs)).astype(np.float32)
+		self.extractTime += time.time() - start
+		self.numExtracted += len(desc)
+
+		return desc
+
+	def partial_fit(self, outputs):
+		"""fixed extractors have nothing to fit"""
+
+		return self
+
+	def memory_bytes(self):
+		"""returns the number of bytes held by the extractor's parameters"""
+
+		return 0
+
+	def __str__(self):
+		result = ""
+		result += ("DESCRIPTOR: " + type(self).__name__ + " DIMS: " + str(self.dims) + " MEMORY KB: " + str(self.memory_bytes()/1024.0) + "\n")
+		perImage = self.extractTime/max(self.numExtracted, 1)
+		result += ("EXTRACTED: " + str(self.numExtracted) + " MS PER IMAGE: " + str(perImage*1000.0) + "\n")
+		return result
+
+
+class RandomProjection(DescriptorExtractor):
+	"""Projects the pixels onto fixed random gaussian directions, distances between
+	descriptors approximate distances between images (Johnson-Lindenstrauss)
+	"""
+
+	def __init__(self, numPix, dims=DEFAULT_DIMS, seed=None):
+		DescriptorExtractor.__init__(self, dims)
+		rng = np.random.RandomState(seed)
+		self.projection = (rng.normal(size=(numPix, dims))/np.sqrt(dims)).astype(np.float32)
+
+	def _extract(self, outputs):
+		return outputs.dot(self.projection)
+
+	def memory_bytes(self):
+		return self.projection.nbytes
+
+
+class IncrementalPCA(DescriptorExtractor):
+	"""Principal components updated one batch at a time from the singular values
+	and components of the previous batches (as in Ross et al. incremental PCA),
+	so the archive never has to be decomposed as a whole
+	"""
+
+	def __init__(self, numPix, dims=DEFAULT_DIMS):
+		DescriptorExtractor.__init__(self, dims)
+		self.mean = np.zeros(numPix)
+		self.components = np.zeros((0, numPix))
+		self.singularValues = np.zeros(0)
+		self.numSeen = 0
+
+	def partial_fit(self, outputs):
+		"""updates the components with a batch of images"""
+
+		batch = _as_matrix(outputs).astype(float)
+		if(len(batch) == 0):
+			return self
+
+		numNew = len(batch)
+		total = self.numSeen + numNew
+		batchMean = np.mean(batch, axis=0)
+		centered = batch - batchMean
+
+		# the old components carry the variance of everything seen before, the last
+		# row corrects for the difference between the old and the batch mean
+		if(self.numSeen > 0):
+			correction = np.sqrt(self.numSeen*numNew/float(total))*(self.mean - batchMean)
+			centered = np.vstack((self.singularValues[:, None]*self.components, centered, correction))
+
+		(U, S, Vt) = np.linalg.svd(centered, full_matrices=False)
+		self.components = Vt[:self.dims]
+		self.singularValues = S[:self.dims]
+		self.mean = (self.numSeen*self.mean + numNew*batchMean)/total
+		self.numSeen = total
+		self.version += 1
+
+		return self
+
+	def _extract(self, outputs):
+		desc = (outputs - self.mean).dot(self.components.T)
+
+		# unused dimensions stay 0 until enough images have been seen
+		if(desc.shape[1] < self.dims):
+			desc = np.hstack((desc, np.zeros((len(desc), self.dims - desc.shape[1]))))
+		return desc
+
+	def memory_bytes(self):
+		return self.mean.nbytes + self.components.nbytes + self.singularValues.nbytes
+
+
+class Thumbnails(DescriptorExtractor):
+	"""Averages the image over a coarse grid at every scale, small shifts of the
+	shape only change a thumbnail slightly while they change many pixels
+	"""
+
+	def __init__(self, numX, numY, scales=DEFAULT_SCALES):
+		DescriptorExtractor.__init__(self, sum(s*s for s in scales))
+		self.shape = (numX, numY)
+
+		# one averaging matrix per scale and axis, each row/column of the image belongs to one block
+		self.pools = []
+		for s in scales:
+			self.pools.append((self._pool(numX, s), self._pool(numY, s)))
+
+	@staticmethod
+	def _pool(length, blocks):
+		pool = np.zeros((length, blocks), dtype=np.float32)
+		pool[np.arange(length), (np.arange(length)*blocks)//length] = 1.0
+		return pool/np.sum(pool, axis=0)
+
+	def _extract(self, outputs):
+		images = outputs.reshape((len(outputs),) + self.shape)
+		thumbs = [np.matmul(np.matmul(rows.T, images), cols).reshape(len(outputs), -1) for (rows, cols) in self.pools]
+		return np.hstack(thumbs)
+
+	def memory_bytes(self):
+		return sum(rows.nbytes + cols.nbytes for (rows, cols) in self.pools)
+
+
+class ShapeMoments(DescriptorExtractor):
+	"""Describes the shape by its area, centroid, normalized second order moments,
+	the first two Hu invariants, its bounding box and the length of its contour
+	"""
+
+	def __init__(self, numX, numY):
+		DescriptorExtractor.__init__(self, 12)
+		self.shape = (numX, numY)
+		# coordinates are scaled to [0, 1] so the features do not depend on the resolution
+		self.rows = np.linspace(0.0, 1.0, numX, dtype=np.float32)
+		self.cols = np.linspace(0.0, 1.0, numY, dtype=np.float32)
+
+	def _extract(self, outputs):
+		images = outputs.reshape((len(outputs),) + self.shape)
+		numPix = float(outputs.shape[1])
+
+		area = np.sum(outputs, axis=1)
+		safeArea = np.maximum(area, 1e-9)
+		rowMass = np.sum(images, axis=2)
+		colMass = np.sum(images, axis=1)
+		cr = rowMass.dot(self.rows)/safeArea
+		cc = colMass.dot(self.cols)/safeArea
+
+		# central second order moments
+		mu20 = rowMass.dot(self.rows*self.rows)/safeArea - cr*cr
+		mu02 = colMass.dot(self.cols*self.cols)/safeArea - cc*cc
+		mu11 = np.einsum("pij,i,j->p", images, self.rows, self.cols)/safeArea - cr*cc
+		hu1 = mu20 + mu02
+		hu2 = (mu20 - mu02)**2 + 4.0*mu11*mu11
+
+		# bounding box from the first and last rows and columns with material
+		hasRows = rowMass > 0
+		hasCols = colMass > 0
+		height = (self.shape[0] - np.argmax(hasRows[:, ::-1], axis=1) - np.argmax(hasRows, axis=1))/float(self.shape[0])
+		width = (self.shape[1] - np.argmax(hasCols[:, ::-1], axis=1) - np.argmax(hasCols, axis=1))/float(self.shape[1])
+
+		# contour pixels are black pixels with a white (or missing) 4-neighbour
+		black = images > .5
+		padded = np.pad(black, ((0, 0), (1, 1), (1, 1)))
+		interior = padded[:, :-2, 1:-1] & padded[:, 2:, 1:-1] & padded[:, 1:-1, :-2] & padded[:, 1:-1, 2:]
+		contour = np.sum(black & ~interior, axis=(1, 2))
+		compactness = contour/np.sqrt(safeArea)
+
+		desc = np.column_stack((area/numPix, cr, cc, mu20, mu02, mu11, hu1, hu2,
+					height, width, contour/numPix, compactness))
+		# images without material all share the same descriptor
+		desc[area <= 0] = 0.0
+		return desc
+
+
+def get_extractor(name, numX, numY, dims=DEFAULT_DIMS, seed=None):
+	"""Creates the descriptor extractor with the given name
+
+	Parameters:
+	name -- one of DESCRIPTOR_TYPES, "none" compares the raw packed images
+	numX -- width of the images
+	numY -- height of the images
+	dims -- number of dimensions of the projection and PCA descriptors
+	seed -- seed of the random projection
+
+	Returns:
+	the DescriptorExtractor, or None for "none" or an unknown name
+	"""
+
+	if(name == "projection"):
+		return RandomProjection(numX*numY, dims, seed)
+	elif(name == "pca"):
+		return IncrementalPCA(numX*numY, dims)
+	elif(name == "thumbnail"):
+		return Thumbnails(numX, numY)
+	elif(name == "moments"):
+		return ShapeMoments(numX, numY)
+	elif(name != "none"):
+		print("Unknown descriptor type " + str(name) + ", comparing raw images.")
+
+	return None
+
+
+def euclid_matrix(desc1, desc2):
+	"""returns the (len(desc1) x len(desc2)) euclidian distances between two sets of
+	descriptors, computed with one matrix product
+	"""
+
+	sq = np.sum(desc1*desc1, axis=1)[:, None] + np.sum(desc2*desc2, axis=1)[None, :] - 2.0*desc1.dot(desc2.T)
+
+	return np.sqrt(np.maximum(sq, 0.0))
@@ -0,0 +1,111 @@
+"""Tests for the behaviour descriptor extractors - packed and dense copies of
+the same images must give the same descriptors, incremental PCA fitted one
+batch at a time must give the distances of a PCA of all images at once, and
+thumbnails, moments and descriptor distances must match loop references.
+Can be run with pytest or directly from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_descriptors import RandomProjection, IncrementalPCA, Thumbnails, ShapeMoments, euclid_matrix, get_extractor
+from FULL_CPPN_phenotype import pack_images
+
+NUM_X = 12
+NUM_Y = 10
+DIMS = 6
+
+
+def make_images(rng, num):
+	"""returns binary images of random rectangles, some of them empty"""
+
+	images = np.zeros((num, NUM_X, NUM_Y))
+	for image in images[2:]:
+		(r, c) = (rng.randint(NUM_X - 2), rng.randint(NUM_Y - 2))
+		image[r:rng.randint(r + 1, NUM_X + 1), c:rng.randint(c + 1, NUM_Y + 1)] = 1.0
+	return images.reshape(num, -1)
+
+
+def test_packed_matches_dense():
+	rng = np.random.RandomState(20)
+	images = make_images(rng, 30)
+	for name in ("projection", "pca", "thumbnail", "moments"):
+		extractor = get_extractor(name, NUM_X, NUM_Y, DIMS, seed=3)
+		extractor.partial_fit(images)
+		assert np.allclose(extractor.transform(pack_images(images)), extractor.transform(images), atol=1e-5), name
+
+
+def test_incremental_pca_matches_batch():
+	rng = np.random.RandomState(21)
+	# images close to a low dimensional subspace so the leading components are well separated
+	basis = rng.normal(size=(DIMS, NUM_X*NUM_Y))
+	scales = np.array([10.0, 8.0, 6.0, 4.0, 3.0, 2.0])
+	data = (rng.normal(size=(90, DIMS))*scales).dot(basis) + .01*rng.normal(size=(90, NUM_X*NUM_Y))
+
+	pca = IncrementalPCA(NUM_X*NUM_Y, DIMS)
+	for start in range(0, len(data), 20):
+		pca.partial_fit(data[start:start + 20])
+	assert np.allclose(pca.mean, np.mean(data, axis=0))
+
+	# distances do not depend on the signs of the components
+	centered = data - np.mean(data, axis=0)
+	components = np.linalg.svd(centered, full_matrices=False)[2][:DIMS]
+	expected = euclid_matrix(centered.dot(components.T), centered.dot(components.T))
+	desc = pca.transform(data).astype(float)
+	assert np.allclose(euclid_matrix(desc, desc), expected, rtol=1e-3, atol=1e-2)
+
+
+def test_thumbnails_match_block_means():
+	rng = np.random.RandomState(22)
+	images = rng.uniform(size=(5, NUM_X*NUM_Y))
+	scales = (3, 4)
+	desc = Thumbnails(NUM_X, NUM_Y, scales).transform(images)
+	for (p, image) in enumerate(images.reshape(-1, NUM_X, NUM_Y)):
+		expected = []
+		for s in scales:
+			rowBlocks = (np.arange(NUM_X)*s)//NUM_X
+			colBlocks = (np.arange(NUM_Y)*s)//NUM_Y
+			for i in range(s):
+				for j in range(s):
+					expected.append(np.mean(image[rowBlocks == i][:, colBlocks == j]))
+		assert np.allclose(desc[p], expected, atol=1e-5), p
+
+
+def test_moments_match_loops():
+	rng = np.random.RandomState(23)
+	images = make_images(rng, 10)
+	desc = ShapeMoments(NUM_X, NUM_Y).transform(images)
+	rows = np.linspace(0.0, 1.0, NUM_X)
+	cols = np.linspace(0.0, 1.0, NUM_Y)
+	for (p, image) in enumerate(images.reshape(-1, NUM_X, NUM_Y)):
+		black = [(rows[i], cols[j]) for i in range(NUM_X) for j in range(NUM_Y) if image[i, j] > .5]
+		if(len(black) == 0):
+			assert np.all(desc[p] == 0), p
+			continue
+		(cr, cc) = np.mean(black, axis=0)
+		mu20 = np.mean([(r - cr)**2 for (r, c) in black])
+		mu02 = np.mean([(c - cc)**2 for (r, c) in black])
+		mu11 = np.mean([(r - cr)*(c - cc) for (r, c) in black])
+		assert np.allclose(desc[p][:6], [len(black)/float(NUM_X*NUM_Y), cr, cc, mu20, mu02, mu11], atol=1e-5), p
+
+
+def test_euclid_matrix_matches_loop():
+	rng = np.random.RandomState(24)
+	desc1 = rng.normal(size=(8, DIMS))
+	desc2 = rng.normal(size=(5, DIMS))
+	expected = [[np.sqrt(np.sum((a - b)**2)) for b in desc2] for a in desc1]
+	assert np.allclose(euclid_matrix(desc1, desc2), expected)
+	# the same seed always gives the same projection
+	assert np.array_equal(RandomProjection(NUM_X*NUM_Y, DIMS, 5).projection, RandomProjection(NUM_X*NUM_Y, DIMS, 5).projection)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_packed_matches_dense, test_incremental_pca_matches_batch, test_thumbnails_match_block_means,
+			test_moments_match_loops, test_euclid_matrix_matches_loop):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
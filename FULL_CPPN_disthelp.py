@@ -6,6 +6,9 @@ import sys
 
 import numpy as np
 
+# output pixels at or above this value are considered black (material)
+BLACK_THRESHOLD = .3
+
 
 def get_hausdorff_dist(px, distances_black, distances_white):
 	"""Finds the hausdorff distance between the candidate pixels
@@ -17,26 +20,122 @@ def get_hausdorff_dist(px, distances_black, distances_white):
 	
 	# NOTE: considered a black pixel if value above .3!	
 
-	# get distance value for all black pixels in the output
-	all_dist = []
-	for index in range(len(px)):
-		# apply the exponential function to each distance to penalize pixels exponentially
-		if(px[index] >= .3):
-			all_dist.append(distances_black[index])	
-		else:
-			all_dist.append(distances_white[index])
+	# black output pixels take their distance to the closest black target pixel,
+	# white output pixels their distance to the closest white target pixel
+	px = np.ravel(px)
+	all_dist = np.where(px >= BLACK_THRESHOLD, np.ravel(distances_black), np.ravel(distances_white))
 	
 	# return average of values in the array
-	avg_dist = np.sum(np.array(all_dist))
+	avg_dist = np.sum(all_dist)
 	
 	return avg_dist, 
 
 
 
+def _lower_envelope_sq(f):
+	"""One dimensional squared distance transform of every row of f, using the
+	lower envelope of parabolas from Felzenszwalb and Huttenlocher - all rows
+	are processed together so there is one numpy operation per column instead
+	of one python operation per pixel
+
+	Parameters:
+	f -- 2D numpy array of finite sampled function values (0 at feature pixels)
+
+	Returns:
+	2D numpy array d with d[r][q] = min over p of (q - p)^2 + f[r][p]
+	"""
+
+	(numRows, n) = f.shape
+	rows = np.arange(numRows)
+
+	# v holds the locations of the parabolas in each envelope, z the boundaries between them
+	v = np.zeros((numRows, n), dtype=int)
+	z = np.empty((numRows, n + 1))
+	z[:, 0] = -np.inf
+	z[:, 1] = np.inf
+	k = np.zeros(numRows, dtype=int)
+
+	for q in range(1, n):
+		fq = f[:, q] + q*q
+		active = rows
+		# parabolas hidden by the new one are removed until every row is done
+		while(len(active) > 0):
+			vk = v[active, k[active]]
+			s = (fq[active] - (f[active, vk] + vk*vk))/(2.0*(q - vk))
+			hidden = s <= z[active, k[active]]
+			done = active[~hidden]
+			k[done] += 1
+			v[done, k[done]] = q
+			z[done, k[done]] = s[~hidden]
+			z[done, k[done] + 1] = np.inf
+			k[active[hidden]] -= 1
+			active = active[hidden]
+
+	# read the lowest parabola at every location
+	d = np.empty((numRows, n))
+	k = np.zeros(numRows, dtype=int)
+	for q in range(n):
+		behind = z[rows, k + 1] < q
+		while(np.any(behind)):
+			k[behind] += 1
+			behind = z[rows, k + 1] < q
+		vk = v[rows, k]
+		d[:, q] = (q - vk)*(q - vk) + f[rows, vk]
+
+	return d
+
+
+def get_edt(features):
+	"""Exact euclidean distance transform - finds the distance of every pixel to
+	the closest feature pixel in time linear in the number of pixels, by
+	transforming the columns and then the rows (the transform is separable)
+
+	Parameters:
+	features -- boolean numpy array marking the feature pixels, either a single 2D
+	image or a stack of images along the first axis that are transformed together
+
+	Returns:
+	numpy array of distances with the shape of features, np.inf everywhere in an
+	image that has no feature pixels
+	"""
+
+	features = np.asarray(features, dtype=bool)
+	(numRows, numCols) = features.shape[-2:]
+
+	# non-feature pixels start larger than any distance inside of the image, a finite
+	# value keeps the envelope intersections well defined
+	far = float(numRows*numRows + numCols*numCols)
+	f = np.where(features, 0.0, far).reshape(-1, numRows, numCols)
+
+	# the columns of every image are transformed as rows of the transposed images
+	cols = _lower_envelope_sq(f.transpose(0, 2, 1).reshape(-1, numRows))
+	cols = cols.reshape(-1, numCols, numRows).transpose(0, 2, 1)
+	sq = _lower_envelope_sq(cols.reshape(-1, numCols)).reshape(features.shape)
+
+	dist = np.sqrt(sq)
+	dist[sq >= far] = np.inf
+	return dist
+
+
 def get_dist_mat(targ_pix, px_val):
 	"""Creates a matrix that finds, for every pixel in the target
 	pixel matrix, the euclidian distance to the nearest black pixel
-	in the target pixel matrix
+	in the target pixel matrix - gives the same result as
+	get_dist_mat_brute using an exact distance transform
+	"""
+
+	targ_pix = np.asarray(targ_pix)
+	result_mat = get_edt(targ_pix == px_val)
+
+	# pixels are given the largest distance if there is no pixel of the value at all
+	result_mat[np.isinf(result_mat)] = sys.maxsize
+
+	return result_mat.flatten()
+
+
+def get_dist_mat_brute(targ_pix, px_val):
+	"""Brute force version of get_dist_mat that compares every pixel
+	against every pixel of the value, kept as a reference
 	"""
 	
 	# find location of all black pixels
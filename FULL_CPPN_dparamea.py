@@ -15,16 +15,21 @@ import pickle
 from scoop import futures
 
 from FULL_CPPN_struct import Genotype
+from FULL_CPPN_plan import PLAN_WEIGHTS
 from FULL_CPPN_deaphelp import weightMutate, conMutate, nodeMutate, xover, xover_avg, actMutate, save_population
 from FULL_CPPN_deaphelp import examine_population_dmat, get_file_name
 from FULL_CPPN_innovation import GlobalInnovation
 from FULL_CPPN_evalg import getSharingMatrix, speciatePopulationFirstTime, speciatePopulationNotFirstTime
+from FULL_CPPN_species import SpeciesSet
+from FULL_CPPN_genedist import get_distance, DISTANCE_CACHE
 from FULL_CPPN_evalg import getFittestFromSpecies, getNicheCounts, binarySelect
 #from FULL_CPPN_vis import visConnections, visHiddenNodes, findNumGoodSolutions
-from FULL_CPPN_evaluation import evaluate_classification, evaluate_pic, evaluate_pic_scoop, assign_fit_scoop
-from FULL_CPPN_evaluation import evaluate_pic_dparam
+from FULL_CPPN_evaluation import evaluate_classification, evaluate_pic, evaluate_pic_scoop, assign_fit_scoop, assign_fit_population
+from FULL_CPPN_evaluation import evaluate_pic_dparam, evaluate_pic_dparam_population
 #from FULL_CPPN_gendata import genGaussianData, genCircularData, genXORData
 from FULL_CPPN_getpixels import getBinaryPixels, getNormalizedInputs, get_d_mat#, graphImage
+from FULL_CPPN_evalctx import create_context
+from FULL_CPPN_targetcache import load_target
 
 # set up arguments to be parsed from the terminal
 parser = argparse.ArgumentParser()
@@ -32,6 +37,8 @@ parser.add_argument("path", type=str,
 	help="filepath to image that is being tested.")
 parser.add_argument("seed", type=int, 
 	help="Seed number for the current experiment.")
+parser.add_argument("--verbose", action="store_true",
+	help="Print the hit rate of the gene distance cache every generation.")
 '''
 parser.add_argument("weight", type=int, 
 	help="Weight Mutation probability.")
@@ -55,8 +62,6 @@ np.random.seed(SEED)
 # if a species' fitness becomes stagnant - it is penalized
 MIN_NUM_STAGNANT_GENERATIONS = 35
 STAGNATION_THRESHOLD = 1.05
-LAST_FITNESS = []
-CURRENT_STAG_GENS = []
 
 # the following is used for modifying the speciation threshold
 GENERATION_TO_MODIFY_THRESH = 30 # this is the first generation that the threshold can begin being adjusted
@@ -82,15 +87,20 @@ pickle.dump(NORM_IN, NORM_IN_FILE)
 
 # must get filename from parser to complete file path
 FILE_PATH = './fitting_images/' + args.path
-PIXELS = getBinaryPixels(FILE_PATH, NUM_X, NUM_Y)
+# pixels and the d parameter matrix are only created the first time a target is used at this resolution
+print("Loading distances matrix . . .")
+TARGET = load_target(FILE_PATH, NUM_X, NUM_Y)
+PIXELS = TARGET.pixels
 
 
-# generate the d parameter matrix and serialize it 
-print("Generating distances matrix . . .")
+# serialize the d parameter matrix
 D_MAT_FILE = open("d_mat.txt", "wb")
-d_mat = get_d_mat(PIXELS, NUM_X, NUM_Y)
+d_mat = np.array(TARGET.d_mat)
 pickle.dump(d_mat, D_MAT_FILE)
-print("Finished distances matrix . . . ")
+print("Finished distances matrix (cached: " + str(TARGET.cached) + ") . . . ")
+
+# inputs, d parameters and target are loaded once by each worker, tasks only carry the ID of the context
+CONTEXT = create_context(NORM_IN, PIXELS, d_mat=d_mat)
 
 
 
@@ -115,8 +125,11 @@ toolbox.register("population", tools.initRepeat, list, toolbox.individual, n = P
 
 # register all functions needed for evolution in the toolbox
 TOURN_SIZE = 3
-toolbox.register("evaluate", evaluate_pic_dparam)
+toolbox.register("evaluate", evaluate_pic_dparam, ctx_id=CONTEXT.id)
+toolbox.register("evaluate_pop", evaluate_pic_dparam_population, ctx_id=CONTEXT.id)
 toolbox.register("assign_fit", assign_fit_scoop)
+toolbox.register("assign_fit_pop", assign_fit_population, mat_pen=MATERIAL_PENALIZATION_THRESHOLD,
+		mat_unp=MATERIAL_UNPRESENT_PENALIZATION, ctx_id=CONTEXT.id)
 toolbox.register("select", binarySelect)
 toolbox.register("tournSelect", tools.selTournament, fit_attr = "fitness")
 toolbox.register("mate", xover_avg)
@@ -141,14 +154,15 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 		ind.connections[1].setWeight(0)
 		ind.connections[2].setWeight(D_PARAM_WEIGHT)
 		ind.connections[3].setWeight(0)
+		ind.invalidatePlan(PLAN_WEIGHTS)
 
 	# use global innovation object to track the creation of new innovation numbers during evolution
 	gb = GlobalInnovation(numIn, numOut)
 
 
-	# used to check whether a species fitness becomes stagnant
-	LAST_FITNESS = []	
-	CURRENT_STAG_GENS = []
+
+	# species keep their IDs between generations, stagnation is tracked per species
+	speciesSet = SpeciesSet(thresh, theta1, theta2, theta3)
 
 	for g in range(NGEN):
 		print("RUNNING GENERATION " + str(g))
@@ -159,10 +173,10 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 		#	visHiddenNodes(pop)
 
 		# create a 2D array representing species from the population
-		if(g == 0):
-			species = speciatePopulationFirstTime(pop, thresh, theta1, theta2, theta3)
-		else:
-			species = speciatePopulationNotFirstTime(pop, thresh, theta1, theta2, theta3)
+		# elites keep the species they were chosen from, the rest are compared against all representatives at once
+		speciesSet.thresh = thresh
+		currSpecies = speciesSet.speciate(pop)
+		species = [spec.members for spec in currSpecies]
 
 		# determine if speciation threshold needs to be modified and apply modification
 		# decrease threshold slowly to increase species, but increase quickly to keep to many
@@ -182,15 +196,11 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 		# find all fitness values for individuals in population, update fitness tracking for species
 		for specInd in range(len(species)):
 			avgSpecFit = 0.0
-			# only the output pixels are mapped back, all evaluation must be done below
-			outputs = toolbox.map(toolbox.evaluate, species[specInd])
-			output_tups = []
-			for o in outputs:
-				output_tups.append((o[0], PIXELS, len(species[specInd]), 
-						MATERIAL_PENALIZATION_THRESHOLD, MATERIAL_UNPRESENT_PENALIZATION))
-
-			# map all outputs to the genotypes with their actual fitness assigned
-			fitnesses = toolbox.map(toolbox.assign_fit, output_tups)		
+			# the whole species is evaluated at once, fitness is assigned below
+			outputs = toolbox.evaluate_pop(species[specInd])
+
+			# score all outputs of the species together with the actual fitness assigned
+			fitnesses = toolbox.assign_fit_pop(outputs, len(species[specInd]))
 			org_ind = 0
 			for f in fitnesses:
 				gen = species[specInd][org_ind]
@@ -228,34 +238,25 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 			'''
 			
 			# check if fitness is stagnant for current generations and update stagnant counter appropriately
-			if(specInd < len(LAST_FITNESS)):
-				if(avgSpecFit/LAST_FITNESS[specInd] <= STAGNATION_THRESHOLD):
-					CURRENT_STAG_GENS[specInd] = CURRENT_STAG_GENS[specInd] + 1
-				else:
-					# reset stagnation counter is a species improves enough to be above the threshold
-					CURRENT_STAG_GENS[specInd] = 0
-			
-			# if this is the first generation for a species, append values for it into both stagnation-tracking lists
-			else:
-				LAST_FITNESS.append(avgSpecFit)
-				CURRENT_STAG_GENS.append(0)
+			# the first generation of a species only records its fitness
+			currSpecies[specInd].recordFitness(avgSpecFit, STAGNATION_THRESHOLD)
 
 		# traverse the list of stagnance counters to see if any species need to be penalized for being stagnant
-		index = 0
-		for spec in CURRENT_STAG_GENS:
+		for spec in currSpecies:
 			# if stagnant generations too high, penalize the species
-			if(spec >= MIN_NUM_STAGNANT_GENERATIONS):
+			if(spec.stagnantGens >= MIN_NUM_STAGNANT_GENERATIONS):
 				# penalizing stagnant species
-				for org in species[index]:
+				for org in spec.members:
 					# penalization increases as the number of stagnant generations increases
-					org.fitness /= (float(2*spec)/MIN_NUM_STAGNANT_GENERATIONS)
+					org.fitness /= (float(2*spec.stagnantGens)/MIN_NUM_STAGNANT_GENERATIONS)
 					org.fit_obj.values = (org.fitness,)	
-			index += 1
 
 		tournamentSelectSpecies = []
 
 		# speciate the population after finding corresponding fitnesses
 		print("Num Species: " + str(len(species)))
+		if(args.verbose):
+			print(DISTANCE_CACHE)
 		# go through each species and select the best individuals from each species
 		for specInd in range(len(species)):
 			# set all species back to 0 first:
@@ -267,7 +268,8 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 		
 		# fittest from species function selects all species representatives
 		# and sets the species variable for the rest of the population to sys.maxsize
-		fitTup = getFittestFromSpecies(species)
+		# the representatives are marked with the ID of their species
+		fitTup = speciesSet.getFittest()
 		bestInSpecies = fitTup[0]
 		pop = fitTup[1]
 
@@ -306,7 +308,7 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 				interspecies_probability = .001 # probability individuals crossed over if not in same species
 				child1 = pop[child1Ind]
 				child2 = pop[child2Ind]
-				dist = child1.getDistance(child2, theta1, theta2, theta3)
+				dist = get_distance(child1, child2, theta1, theta2, theta3)
 
 				# crossover happens with different probability depending if individuals in question are in same species
 				if(child1.species == sys.maxsize and child2.species == sys.maxsize and dist < thresh and np.random.uniform() <= cxPb):
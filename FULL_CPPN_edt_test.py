@@ -0,0 +1,67 @@
+"""Equivalence tests for the exact distance transform - the maps created by
+get_dist_mat and get_d_mat must be the same as the ones from the brute force
+versions on every image of the fitting_images set. Can be run with pytest or
+directly from terminal
+"""
+
+import os
+
+import numpy as np
+
+from FULL_CPPN_getpixels import getBinaryPixels, get_d_mat, get_d_mat_brute
+from FULL_CPPN_disthelp import get_dist_mat, get_dist_mat_brute
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fitting_images")
+
+# the brute force versions are quadratic in the number of pixels, so a lower
+# resolution than the experiments is used to keep the tests quick
+NUM_X = 24
+NUM_Y = 24
+
+
+def get_image_paths():
+	return [os.path.join(IMAGE_DIR, name) for name in sorted(os.listdir(IMAGE_DIR)) if name.endswith(".png")]
+
+
+def check_maps(pixels, numX, numY):
+	"""returns True if the signed and unsigned maps of the pixels match the brute force maps"""
+
+	px = np.reshape(pixels, (numX, numY))
+	same = np.array_equal(get_d_mat(pixels, numX, numY), get_d_mat_brute(pixels, numX, numY))
+	for px_val in (0, 1):
+		same = same and np.array_equal(get_dist_mat(px, px_val), get_dist_mat_brute(px, px_val))
+
+	return same
+
+
+def test_fitting_images():
+	for path in get_image_paths():
+		pixels = getBinaryPixels(path, NUM_X, NUM_Y)
+		assert check_maps(pixels, NUM_X, NUM_Y), path
+
+
+def test_random_pixels():
+	np.random.seed(0)
+	for (numX, numY) in [(1, 1), (1, 9), (9, 1), (12, 17), (20, 20)]:
+		for density in (.05, .5, .95):
+			pixels = (np.random.uniform(size=numX*numY) < density).astype(int)
+			assert check_maps(pixels, numX, numY), (numX, numY, density)
+
+
+def test_single_value():
+	# images with only one value have no pixels of the other value to measure to
+	for value in (0, 1):
+		pixels = np.full(10*10, value)
+		assert check_maps(pixels, 10, 10)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_fitting_images, test_random_pixels, test_single_value):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -0,0 +1,156 @@
+"""This file contains the evaluation context shared by the evaluation functions
+that run inside of scoop workers. A context holds everything that is the
+same for every genotype of a run - the normalized input grid, the target
+pixels and the distance maps - so it is loaded once per worker process and
+task payloads only carry its ID.
+
+The main process writes every context it creates into a file named by its
+ID - the ID is the path of that file without its extension, so it also
+tells workers which directory to look in. A worker loads the file the first
+time a task refers to the ID (or up front when init_context is used as a
+process pool initializer) and keeps it for the rest of the run
+"""
+
+import os
+import hashlib
+import pickle
+
+import numpy as np
+
+# directory that contexts are written to so that workers can load them
+DEFAULT_CONTEXT_DIR = "eval_contexts"
+
+# contexts loaded in this process, keyed by ID
+_CONTEXTS = {}
+
+# ID of the context built from the files written by older drivers
+LEGACY_ID = "legacy"
+
+
+class EvalContext():
+	"""Everything needed to evaluate and score genotypes for one target image"""
+
+	def __init__(self, norm_in, pixels=None, d_mat=None, dist_black=None, dist_white=None):
+		"""Constructor for the evaluation context, unused parts may be left as None
+
+		Parameters:
+		norm_in -- normalized (x, y) inputs for every pixel location
+		pixels -- binary pixels of the target image
+		d_mat -- d parameter for every pixel location, added as an extra input
+		dist_black -- distance of every location to the closest black target pixel
+		dist_white -- distance of every location to the closest white target pixel
+		"""
+
+		self.norm_in = np.asarray(norm_in, dtype=float)
+		self.pixels = None if pixels is None else np.asarray(pixels)
+		self.d_mat = None if d_mat is None else np.asarray(d_mat, dtype=float)
+		self.dist_black = None if dist_black is None else np.asarray(dist_black, dtype=float)
+		self.dist_white = None if dist_white is None else np.asarray(dist_white, dtype=float)
+
+		# each row of inputs is the (x, y) location followed by its d parameter if there is one
+		if(self.d_mat is None):
+			self.inputs = self.norm_in
+		else:
+			self.inputs = np.column_stack((self.norm_in, self.d_mat))
+
+		self.id = self._fingerprint()
+
+	def _fingerprint(self):
+		"""the ID of a context is a hash of its contents, so the same run always
+		writes the same file and two different targets never share an ID
+		"""
+
+		h = hashlib.sha1()
+		for arr in (self.norm_in, self.pixels, self.d_mat, self.dist_black, self.dist_white):
+			if(arr is None):
+				h.update(b"none")
+			else:
+				h.update(str(arr.shape).encode())
+				h.update(np.ascontiguousarray(arr, dtype=np.float64).tobytes())
+		return h.hexdigest()
+
+	def arrays(self):
+		"""returns the arrays of the context that are not None, keyed by name"""
+
+		names = ("norm_in", "pixels", "d_mat", "dist_black", "dist_white")
+		return dict((name, getattr(self, name)) for name in names if getattr(self, name) is not None)
+
+
+def _context_path(ctx_id, context_dir):
+	"""IDs carry the directory of their file, bare fingerprints are looked up in context_dir"""
+
+	if(os.path.dirname(ctx_id) == ""):
+		ctx_id = os.path.join(context_dir, ctx_id)
+	return ctx_id + ".npz"
+
+
+def create_context(norm_in, pixels=None, d_mat=None, dist_black=None, dist_white=None, context_dir=DEFAULT_CONTEXT_DIR):
+	"""Creates an evaluation context in the main process, registers it and
+	writes it to disk so workers can load it by its ID
+
+	Returns:
+	the new EvalContext, its ID holds context_dir so workers load it from there
+	"""
+
+	ctx = EvalContext(norm_in, pixels, d_mat, dist_black, dist_white)
+	ctx.id = os.path.join(context_dir, ctx.id)
+	_CONTEXTS[ctx.id] = ctx
+
+	path = _context_path(ctx.id, context_dir)
+	if(not os.path.exists(path)):
+		# written to a temporary name and moved into place so workers never read a partial file
+		os.makedirs(context_dir, exist_ok=True)
+		tmp_path = "{0}.{1}.tmp.npz".format(path[:-len(".npz")], os.getpid())
+		np.savez(tmp_path, **ctx.arrays())
+		os.replace(tmp_path, path)
+
+	return ctx
+
+
+def init_context(ctx_id, context_dir=DEFAULT_CONTEXT_DIR):
+	"""Loads a context into this process if it is not loaded yet - can be given
+	as the initializer of a process pool so it is loaded before the first task.
+	IDs from create_context already hold their directory, context_dir is only
+	used for IDs that do not
+
+	Returns:
+	the loaded EvalContext
+	"""
+
+	if(ctx_id in _CONTEXTS):
+		return _CONTEXTS[ctx_id]
+
+	if(ctx_id == LEGACY_ID):
+		ctx = _load_legacy()
+	else:
+		data = np.load(_context_path(ctx_id, context_dir))
+		ctx = EvalContext(**dict((name, data[name]) for name in data.files))
+		data.close()
+		ctx.id = ctx_id
+	_CONTEXTS[ctx_id] = ctx
+	return ctx
+
+
+def _load_legacy():
+	"""builds a context from the norm_in.txt/d_mat.txt files that drivers write
+	into the working directory, read once instead of on every evaluation
+	"""
+
+	norm_in = pickle.load(open("norm_in.txt", "rb"))
+	d_mat = None
+	if(os.path.exists("d_mat.txt")):
+		d_mat = pickle.load(open("d_mat.txt", "rb"))
+	return EvalContext(norm_in, d_mat=d_mat)
+
+
+def get_context(ctx_id=None):
+	"""returns the context with the given ID, loading it the first time it is
+	used in this process - None gives the context of the legacy input files
+	"""
+
+	if(ctx_id is None):
+		ctx_id = LEGACY_ID
+	ctx = _CONTEXTS.get(ctx_id)
+	if(ctx is None):
+		ctx = init_context(ctx_id)
+	return ctx
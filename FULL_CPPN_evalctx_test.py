@@ -0,0 +1,94 @@
+"""Tests for the evaluation context - a context loaded by a fresh worker from
+its ID must hold the arrays the main process created it with, the legacy
+context must hold what the old drivers read from norm_in.txt/d_mat.txt on
+every call, and evaluating through either gives the outputs of getOutput.
+Can be run with pytest or directly from terminal
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+import FULL_CPPN_evalctx
+from FULL_CPPN_evalctx import create_context, get_context, LEGACY_ID
+from FULL_CPPN_evaluation import evaluate_pic_scoop
+from FULL_CPPN_getpixels import getNormalizedInputArray
+from FULL_CPPN_testhelp import make_population
+
+NUM_X = 6
+NUM_Y = 6
+
+
+def forget_contexts(ids):
+	"""removes contexts from this process, as if it were a freshly started worker"""
+
+	for ctx_id in ids:
+		FULL_CPPN_evalctx._CONTEXTS.pop(ctx_id, None)
+
+
+def test_worker_loads_created_context():
+	np.random.seed(18)
+	context_dir = tempfile.mkdtemp()
+	try:
+		norm_in = getNormalizedInputArray(NUM_X, NUM_Y)
+		pixels = (np.random.uniform(size=NUM_X*NUM_Y) < .4).astype(int)
+		d_mat = np.random.uniform(size=NUM_X*NUM_Y)
+		ctx = create_context(norm_in, pixels, d_mat=d_mat, context_dir=os.path.join(context_dir, "ctx"))
+		# the same contents always give the same ID, other contents a different one
+		assert create_context(norm_in, pixels, d_mat=d_mat, context_dir=os.path.join(context_dir, "ctx")).id == ctx.id
+		other = create_context(norm_in, 1 - pixels, d_mat=d_mat, context_dir=os.path.join(context_dir, "ctx"))
+		assert other.id != ctx.id
+
+		forget_contexts([ctx.id, other.id])
+		loaded = get_context(ctx.id)
+		assert loaded is not ctx
+		assert set(loaded.arrays()) == set(["norm_in", "pixels", "d_mat"])
+		for (name, arr) in ctx.arrays().items():
+			assert np.array_equal(loaded.arrays()[name], arr), name
+		assert np.array_equal(loaded.inputs, np.column_stack((norm_in, d_mat)))
+		# a worker keeps the context it loaded for the rest of the run
+		assert get_context(ctx.id) is loaded
+		forget_contexts([ctx.id])
+	finally:
+		shutil.rmtree(context_dir, ignore_errors=True)
+
+
+def test_legacy_context_matches_files():
+	np.random.seed(19)
+	work_dir = tempfile.mkdtemp()
+	old_dir = os.getcwd()
+	try:
+		os.chdir(work_dir)
+		norm_in = [list(row) for row in getNormalizedInputArray(NUM_X, NUM_Y)]
+		pickle.dump(norm_in, open("norm_in.txt", "wb"))
+		forget_contexts([LEGACY_ID])
+		pop = make_population(5, 6)
+		for genotype in pop:
+			# baseline evaluate_pic_scoop read norm_in.txt and ran the network one location at a time
+			expected = np.array([genotype.getOutput(ins)[0] for ins in pickle.load(open("norm_in.txt", "rb"))])
+			assert np.allclose(evaluate_pic_scoop(genotype)[0], expected)
+		assert np.array_equal(get_context().norm_in, np.array(norm_in))
+		assert get_context().d_mat is None
+
+		# the files are only read the first time
+		os.remove("norm_in.txt")
+		assert np.allclose(evaluate_pic_scoop(pop[0])[0], [pop[0].getOutput(ins)[0] for ins in norm_in])
+	finally:
+		os.chdir(old_dir)
+		forget_contexts([LEGACY_ID])
+		shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_worker_loads_created_context, test_legacy_context_matches_files):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
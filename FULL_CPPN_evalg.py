@@ -1,6 +1,10 @@
 import copy
 import numpy as np
 import sys
+
+from FULL_CPPN_genedist import get_distance_matrix
+from FULL_CPPN_species import assign_species
+
 '''
 File that implements helper methods for the CPPN evolutionary algorithm
 File contains a main variation algorithm, mutation algorithm, 
@@ -27,7 +31,7 @@ def tournamentSelect(population, tournSize, partialPop):
 		for ind in tournament:
 			if(bestInd == None or ind.getFitness() > bestInd.getFitness()):
 				bestInd = ind
-		newPop.append(bestInd.getCopy())
+		newPop.append(bestInd.clone())
 
 	return newPop
 
@@ -45,8 +49,9 @@ def binarySelect(population, partialPop):
 	#stores all selected individuals from binary tournaments
 	newPop = partialPop # set equal to partial pop so best inds copied directly into new generation
 	# all individuals get a chance to compete twice
-	pop1 = copy.deepcopy(population)
-	pop2 = copy.deepcopy(population)
+	# winners are cloned below, so the shuffled lists only need references
+	pop1 = list(population)
+	pop2 = list(population)
 	np.random.shuffle(pop1)
 	np.random.shuffle(pop2)
 	# ONLY CONTINUE ADDING ELEMENTS IF PARTIAL POP IS NOT OF SIZE EQUAL TO POPSIZE
@@ -56,18 +61,18 @@ def binarySelect(population, partialPop):
 		ind1 = pop1.pop()
 		ind2 = pop1.pop()
 		if(ind1.getFitness() > ind2.getFitness()):
-			newPop.append(ind1.getCopy())
+			newPop.append(ind1.clone())
 		else:
-			newPop.append(ind2.getCopy())
+			newPop.append(ind2.clone())
 	
 	#performs binary selection on second copy of population
 	while(len(partialPop) < len(population) and len(pop2) > 1):
 		ind1 = pop2.pop()
 		ind2 = pop2.pop()
 		if(ind1.getFitness() > ind2.getFitness()):
-			newPop.append(ind1.getCopy())
+			newPop.append(ind1.clone())
 		else:
-			newPop.append(ind2.getCopy())
+			newPop.append(ind2.clone())
 	
 	return newPop
 
@@ -154,77 +159,42 @@ method for separating all members of a population into groups of species for the
 @return 2D list containing all species
 '''
 def speciatePopulationFirstTime(pop, thresh, theta1, theta2, theta3):
-	species = [[]]
-	species[0].append(pop[0])
+	# the first individual founds the first species, all individuals are compared at once
+	(assignments, newReps) = assign_species([org.getGeneArrays() for org in pop], [], thresh, theta1, theta2, theta3)
+	species = [[] for rep in newReps]
+	for (currOrg, spInd) in zip(pop, assignments):
+		species[spInd].append(currOrg)
 	species[0][0].species = 0
-	for orgInd in range(1,len(pop)):
-		currOrg = pop[orgInd]
-		spInd = 0
-		foundSpecies = False
-		# find correct species for each individual and add it into the vector for that species
-		while(spInd < len(species) and not foundSpecies):
-			# get distance from representative element in that species - check if below threshold
-			dist = currOrg.getDistance(species[spInd][0], theta1, theta2, theta3)
-			if(dist <= thresh):
-				foundSpecies = True
-			else:
-				spInd += 1
-		# either add to the species it was found to match or create new species
-		if(foundSpecies):
-			species[spInd].append(currOrg)
-		else:
-			species.append([currOrg])
 
 	return species
 
 '''
 method for speciating population after it has already been speciated
+individuals that already have a species number (the fittest of each species
+from the last generation) each start a species, all others are assigned to them
 @param pop population that is being separated into species
 @param thresh maximum value of distance between two genomes to be in the same species
 @param theta1,2,3 weights used for calculating distance
 @return 2D list containing species
 '''
 def speciatePopulationNotFirstTime(pop, thresh, theta1, theta2, theta3):
-	species = [[]]
 	sortedPop = sorted(pop, key = lambda x: x.species)
-	# store index and current species
-	foundNotSpeciated = False
-	species[0].append(pop[0])
-	index = 1 # index in the sortedPop lists
 	# add all species that already have a species number
-	while(not foundNotSpeciated and index < len(sortedPop)):
-		org = sortedPop[index]
-		if(org.species == sys.maxsize):
-			foundNotSpeciated = True
-#		elif(org.species == currSpecies):
-#			species[currSpeciesInd].append(org)
-#			popIndex += 1
-		else:
-			index += 1
-			species.append([org])
-
-	# add all species that need to be assigned a species
-	for orgInd in range(index, len(pop)):
-		currOrg = sortedPop[orgInd]
-		spInd = 0
-		foundSpecies = False
-
-		# loop through all species and find best one for current org
-		while(spInd < len(species) and not foundSpecies):
-			# get distance from representative element in that species to decide if a member
-			dist = currOrg.getDistance(species[spInd][0], theta1, theta2, theta3)
-			if(dist <= thresh):
-				foundSpecies = True
-			else:
-				spInd += 1
-
-		# decide where to add into species
-		if(foundSpecies):
-			# add org to species it was found to match and set its species number accordingly
-			species[spInd].append(currOrg)
-		else:
-			# must create new species, make it's number one larger than current largest species num
-			species.append([currOrg])
+	index = 0
+	while(index < len(sortedPop) and sortedPop[index].species != sys.maxsize):
+		index += 1
+	species = [[org] for org in sortedPop[:index]]
+
+	# add all species that need to be assigned a species, compared against all representatives at once
+	rest = sortedPop[index:]
+	(assignments, newReps) = assign_species([org.getGeneArrays() for org in rest], [spec[0].getGeneArrays() for spec in species],
+							thresh, theta1, theta2, theta3)
+	for rep in newReps:
+		# must create new species, make it's number one larger than current largest species num
+		species.append([])
+	for (currOrg, spInd) in zip(rest, assignments):
+		# add org to species it was found to match and set its species number accordingly
+		species[spInd].append(currOrg)
 		currOrg.species = spInd
 	#print(len(species))
 	return species
@@ -254,7 +224,7 @@ def getFittestFromSpecies(species):
 
 		# append the fittest element from each species directly into next population
 		# assign correct species number - all others reset to default values to be reassigned
-		fittest = fittest.getCopy()
+		fittest = fittest.clone()
 		fittest.species = specInd
 		partialPop.append(fittest)
 
@@ -393,18 +363,16 @@ individuals of a population, later used for explicit fitness sharing
 @return matrix containing all sharing information between species
 '''
 def getSharingMatrix(population, threshold, alpha, theta1, theta2, theta3):
-	# stores all sharing info
-	result = np.ones((len(population), len(population)))
-	for ind1 in range(len(population)):
-		for ind2 in range(len(population)):
-			# order does not matter, matrix is symmetric
-			# all diagonal entries should be 1, hence > and not >=
-			if(ind2 > ind1):
-				org1 = population[ind1]
-				org2 = population[ind2]
-				distance = org1.getDistance(org2, theta1, theta2, theta3)
-				result[ind1][ind2] = calculateSharingFunction(distance, threshold, alpha)
-				result[ind2][ind1] = result[ind1][ind2]
+	# all distances are found at once, distance from ind1 to ind2 is used for ind2 > ind1
+	# distances between genomes that did not change since the last generation are cached
+	distances = get_distance_matrix(population, theta1, theta2, theta3)
+	upper = np.triu(distances, 1)
+	distances = upper + upper.T
+	# stores all sharing info, same as calculateSharingFunction for every entry
+	result = np.where(distances <= threshold, 1 - (distances/threshold)**alpha, 0)
+	# order does not matter, matrix is symmetric
+	# all diagonal entries should be 1
+	np.fill_diagonal(result, 1)
 	# return matrix containing all fitness sharing values
 	return result
 
@@ -450,8 +418,9 @@ def select_n_binary(pop, k):
 	new_pop = []
 
 	# all individuals get a chance to compete twice
-	pop_1 = copy.deepcopy(pop)
-	pop_2 = copy.deepcopy(pop)
+	# winners are cloned below, so the shuffled lists only need references
+	pop_1 = list(pop)
+	pop_2 = list(pop)
 
 	# must shuffle to make the selections random
 	np.random.shuffle(pop_1)
@@ -463,18 +432,18 @@ def select_n_binary(pop, k):
 		ind_1 = pop_1.pop()
 		ind_2 = pop_1.pop()
 		if(ind_1.fit_obj < ind_2.fit_obj):
-			new_pop.append(ind_1.getCopy())
+			new_pop.append(ind_1.clone())
 		else:
-			new_pop.append(ind_2.getCopy())
+			new_pop.append(ind_2.clone())
 
 	#performs binary selection on second copy of population
 	while(len(pop_2) > 1 and len(new_pop) < k):
 		ind_1 = pop_2.pop()
 		ind_2 = pop_2.pop()
 		if(ind_1.fit_obj < ind_2.fit_obj):
-			new_pop.append(ind_1.getCopy())
+			new_pop.append(ind_1.clone())
 		else:
-			new_pop.append(ind_2.getCopy())
+			new_pop.append(ind_2.clone())
 	
 	# new pop should be of length k at this point
 	return new_pop
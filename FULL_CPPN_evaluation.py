@@ -6,12 +6,15 @@ These functions can be plugged in to the main deap ea to
 configure the evolution toward whatever experiment is being run
 '''
 import numpy as np
-import pickle
 
-from FULL_CPPN_scoop import activate_CPPN_scoop
 from FULL_CPPN_getpixels import getNormalizedInputs
+from FULL_CPPN_evalctx import get_context
+from FULL_CPPN_popeval import evaluate_population
+from FULL_CPPN_deltaeval import evaluate_population_delta
 from FULL_CPPN_novhelp import get_kNN_measure, get_cross_entropy
-from FULL_CPPN_disthelp import get_hausdorff_dist
+from FULL_CPPN_disthelp import get_hausdorff_dist, BLACK_THRESHOLD
+from FULL_CPPN_metrics import thresholded_distance, material_l1
+from FULL_CPPN_phenotype import PackedImages, pack_images
 
 '''
 fitness evaluation used for DEAP CPPN XOR implementation
@@ -99,13 +102,8 @@ def evaluate_pic(genotype, pix, normIn, speciesLength, material_penalization_thr
 	# there are significantly fewer locations with pix than without generally	
 	NO_MATERIAL_PENALIZATION = 3	
 
-	outputs = []
-	# get all outputs for every pixel in space of picture and put all into a numpy array
-	for ins in normIn:
-		outputs.append(genotype.getOutput([ins[0], ins[1]])[0])
-
-	# convert outputs to a numpy array
-	outputs_np = np.array(outputs, copy = True)
+	# get all outputs for every pixel in space of picture at once in a numpy array
+	outputs_np = genotype.getOutputBatch(np.array(normIn)[:, :2])[:, 0]
 
 	# decide if fitness should be penalized for using too little material
 	total_px_used = float(np.sum(outputs_np))
@@ -128,22 +126,64 @@ def evaluate_pic(genotype, pix, normIn, speciesLength, material_penalization_thr
 	return (total_fit/(speciesLength*penalization),)
 
 
-def evaluate_pic_scoop(genotype):
+def evaluate_pic_scoop(genotype, ctx_id=None, packed=False):
 	"""simplified version of picture evaluation function that is compatible
-	with scoop, previous version could not be pickled with all parameters
+	with scoop, previous version could not be pickled with all parameters -
+	the inputs come from the evaluation context with the given ID, which is
+	loaded only once in each worker. If packed is set the binary output is
+	returned packed into bits, so 64 times less is sent back from the worker
 	"""
 
 	NUM_X = 75
 	NUM_Y = 75
-	NORM_IN = pickle.load(open("norm_in.txt", "rb"))
-	output = []
-	# get all outputs and append them to output list
-	for ins in NORM_IN:
-		ins = (genotype, ins)
-		result = activate_CPPN_scoop(ins)[0]
-		output.append(result)
+	NORM_IN = get_context(ctx_id).norm_in
+	# activate the CPPN over every input location at once
+	output = genotype.getOutputBatch(NORM_IN)[:, 0]
+	if(packed):
+		return (pack_images(output).bits[0],)
 	
-	return (np.array(output, copy=True),)
+	return (output,)
+
+
+def evaluate_pic_population(pop, ctx_id=None, packed=False):
+	"""population version of evaluate_pic_scoop - all genotypes are evaluated
+	together by the block evaluation engine inside of the calling process, so
+	no genotypes or outputs have to be pickled and sent to scoop workers
+
+	Parameters:
+	pop -- list of genotypes being evaluated
+	ctx_id -- ID of the evaluation context holding the inputs
+	packed -- if True the binary outputs are returned packed into bits
+
+	Returns:
+	list of (output,) tuples in the same form as mapping evaluate_pic_scoop over pop,
+	or PackedImages of all outputs if packed is set
+	"""
+
+	NORM_IN = get_context(ctx_id).norm_in
+	outputs = evaluate_population(pop, NORM_IN)[:, :, 0]
+	if(packed):
+		return pack_images(outputs)
+
+	return [(out,) for out in outputs]
+
+
+def evaluate_pic_delta(pop, cache):
+	"""version of evaluate_pic_population that reuses the cached node values of
+	each genotype's parent, so mutants only re-evaluate the nodes below their
+	mutations - the cache must be created with the normalized inputs
+
+	Parameters:
+	pop -- list of genotypes being evaluated
+	cache -- NodeValueCache shared between generations
+
+	Returns:
+	list of (output,) tuples in the same form as mapping evaluate_pic_scoop over pop
+	"""
+
+	outputs = evaluate_population_delta(pop, cache)[:, :, 0]
+
+	return [(out,) for out in outputs]
 
 
 def assign_fit_scoop(info_tup):
@@ -154,11 +194,17 @@ def assign_fit_scoop(info_tup):
 
 	Parameters:
 	info_tup -- contains output pix, genotype, target pix, 
-	and all needed constants for fitness calculation
+	and all needed constants for fitness calculation - the target
+	pix may be given as the ID of an evaluation context instead and
+	the output pix may be packed into bits (a uint8 array)
 	"""
 
 	# get all needed info out of the tuple
 	out, pix, spec_len, mat_pen, mat_unp = info_tup
+	if(isinstance(pix, str)):
+		pix = get_context(pix).pixels
+	if(isinstance(out, np.ndarray) and out.dtype == np.uint8):
+		return (material_l1(PackedImages(out, len(pix)), pix, spec_len, mat_pen, mat_unp)[0],)
 
 	# compute fitness, penalizing for material used
 	proportion_mat_used = float(np.sum(out))/len(pix)
@@ -175,25 +221,66 @@ def assign_fit_scoop(info_tup):
 
 	return (total_fit,)
 
-def evaluate_pic_dparam(genotype):
+def assign_fit_population(outputs, spec_len, mat_pen, mat_unp, ctx_id=None):
+	"""population version of assign_fit_scoop that scores every output of a
+	species at once in the calling process
+
+	Parameters:
+	outputs -- list of (output,) tuples, (P x N) matrix of output images or PackedImages
+	spec_len -- number of individuals in the species
+	mat_pen -- proportion of material below which the fitness is penalized
+	mat_unp -- factor applied to pixels where the target has material and the output does not
+	ctx_id -- ID of the evaluation context holding the target pixels
+
+	Returns:
+	list of (fitness,) tuples in the same form as mapping assign_fit_scoop over the outputs
+	"""
+
+	if(len(outputs) == 0):
+		return []
+	fits = material_l1(np.array([o[0] for o in outputs]) if isinstance(outputs, list) else outputs,
+			get_context(ctx_id).pixels, spec_len, mat_pen, mat_unp)
+
+	return [(fit,) for fit in fits]
+
+def evaluate_pic_dparam(genotype, ctx_id=None, packed=False):
 	"""simplified version of picture evaluation function that is compatible
 	with scoop, this version also activates the CPPN with the use of the d
-	parameter derived from the pixels in the target image.
+	parameter derived from the pixels in the target image. If packed is set
+	the binary output is returned packed into bits
 	"""
 
 	NUM_X = 50
 	NUM_Y = 50
-	NORM_IN = pickle.load(open("norm_in.txt", "rb"))
-	D_MAT = pickle.load(open("d_mat.txt","rb"))
-	output = []
-	# get all outputs and append them to output list
-	for (ins_1, ins_2) in zip(NORM_IN, D_MAT):
-		ins_tup = (ins_1[0], ins_1[1], ins_2)
-		ins = (genotype, ins_tup)
-		result = activate_CPPN_scoop(ins)[0]
-		output.append(result)
+	# each row of inputs is the (x, y) location followed by its d parameter
+	ins = get_context(ctx_id).inputs
+	output = genotype.getOutputBatch(ins)[:, 0]
+	if(packed):
+		return (pack_images(output).bits[0],)
 	
-	return (np.array(output, copy=True),)
+	return (output,)
+
+def evaluate_pic_dparam_population(pop, ctx_id=None, packed=False):
+	"""population version of evaluate_pic_dparam that evaluates all genotypes
+	together with the block evaluation engine
+
+	Parameters:
+	pop -- list of genotypes being evaluated
+	ctx_id -- ID of the evaluation context holding the inputs and d parameters
+	packed -- if True the binary outputs are returned packed into bits
+
+	Returns:
+	list of (output,) tuples in the same form as mapping evaluate_pic_dparam over pop,
+	or PackedImages of all outputs if packed is set
+	"""
+
+	# each row of inputs is the (x, y) location followed by its d parameter
+	ins = get_context(ctx_id).inputs
+	outputs = evaluate_population(pop, ins)[:, :, 0]
+	if(packed):
+		return pack_images(outputs)
+
+	return [(out,) for out in outputs]
 
 def evaluate_novelty(eval_tup):
 	"""Evaluation function for the novelty search evolutionary
@@ -211,8 +298,13 @@ def evaluate_nov_pic(eval_tup):
 	picture simulatanously - individuals then selected with the
 	use of NSGA-II"""
 	
-	# unpack the input tuple
-	genotype, output, black_dist, white_dist = eval_tup
+	# unpack the input tuple, the distance maps may be given as the ID of an evaluation context
+	if(len(eval_tup) == 3):
+		genotype, output, ctx_id = eval_tup
+		ctx = get_context(ctx_id)
+		black_dist, white_dist = ctx.dist_black, ctx.dist_white
+	else:
+		genotype, output, black_dist, white_dist = eval_tup
 	
 	# get fitness for both objectives	
 	target_fit = get_hausdorff_dist(output, black_dist, white_dist)#assign_fit_scoop((output, pixels, spec_len, mat_pen, mat_unp))
@@ -221,6 +313,67 @@ def evaluate_nov_pic(eval_tup):
 	# return fitness for both objectives inside of a tuple
 	return (target_fit[0], con_fit[0])
 
+def compact_phenotype(output):
+	"""packs an output image into one bit per pixel (set for black pixels), which
+	is all that novelty and archiving need and is 64 times smaller than the output
+	"""
+
+	return pack_images(np.ravel(output), BLACK_THRESHOLD).bits[0]
+
+def evaluate_score_nov(genotype, ctx_id=None, keep_phenotype=False):
+	"""Fused version of evaluate_pic_scoop and evaluate_nov_pic - renders the
+	genotype, scores it against the target of the evaluation context and packs
+	its phenotype inside the same task, so only the genotype is sent to a worker
+	and only the fitness (and packed phenotype) comes back instead of the image
+
+	Parameters:
+	genotype -- the genotype being evaluated
+	ctx_id -- ID of the evaluation context holding the inputs and distance maps
+	keep_phenotype -- if True the compact phenotype of the output is returned as well
+
+	Returns:
+	((target fitness, connection count), phenotype) tuple, phenotype is None unless keep_phenotype is set
+	"""
+
+	ctx = get_context(ctx_id)
+	output = genotype.getOutputBatch(ctx.norm_in)[:, 0]
+	target_fit = thresholded_distance(output, ctx.dist_black, ctx.dist_white)[0]
+	phenotype = compact_phenotype(output) if keep_phenotype else None
+
+	return ((target_fit, len(genotype.connections)), phenotype)
+
+def evaluate_score_nov_population(pop, cache=None, ctx_id=None, keep_phenotype=False):
+	"""population version of evaluate_score_nov that renders all genotypes in the
+	calling process (from the cached node values of their parents if a cache is
+	given) and scores them right there - the node value cache only lives in the
+	calling process, so mapping evaluate_score_nov over workers cannot use it
+
+	Parameters:
+	pop -- list of genotypes being evaluated
+	cache -- optional NodeValueCache created with the normalized inputs of the context
+	ctx_id -- ID of the evaluation context holding the inputs and distance maps
+	keep_phenotype -- if True the compact phenotypes of the outputs are returned as well
+
+	Returns:
+	list of (fitness, phenotype) tuples in the same form as mapping evaluate_score_nov over pop
+	"""
+
+	if(cache is None):
+		outputs = evaluate_population(pop, get_context(ctx_id).norm_in)[:, :, 0]
+	else:
+		outputs = evaluate_population_delta(pop, cache)[:, :, 0]
+
+	# all outputs are scored against the distance maps with one matrix-vector product
+	ctx = get_context(ctx_id)
+	target_fits = thresholded_distance(outputs, ctx.dist_black, ctx.dist_white)
+
+	results = []
+	for genotype, output, target_fit in zip(pop, outputs, target_fits):
+		phenotype = compact_phenotype(output) if keep_phenotype else None
+		results.append(((target_fit, len(genotype.connections)), phenotype))
+
+	return results
+
 def evaluate_con_cost(genotype):
 	"""Evaluates the connection cost fitness of a given network
 	using the connection cost class method.
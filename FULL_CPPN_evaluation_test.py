@@ -0,0 +1,66 @@
+"""Tests for the fused render-and-score evaluation - the worker task
+evaluate_score_nov must give the fitness and packed phenotype of the in
+process population stage and of the per-genome baseline evaluate_nov_pic.
+Can be run with pytest or directly from terminal
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+from FULL_CPPN_evalctx import create_context
+from FULL_CPPN_evaluation import evaluate_score_nov, evaluate_score_nov_population, evaluate_nov_pic
+from FULL_CPPN_deltaeval import NodeValueCache
+from FULL_CPPN_disthelp import get_dist_mat
+from FULL_CPPN_getpixels import getNormalizedInputArray
+from FULL_CPPN_testhelp import make_population
+
+# size of the target image the genomes are scored against
+NUM_X = 8
+NUM_Y = 8
+
+
+def make_context(context_dir):
+	"""creates an evaluation context for a random target image"""
+
+	pixels = (np.random.uniform(size=NUM_X*NUM_Y) < .4).astype(int)
+	px = np.reshape(pixels, (NUM_X, NUM_Y))
+	return create_context(getNormalizedInputArray(NUM_X, NUM_Y), pixels,
+				dist_black=get_dist_mat(px, 1), dist_white=get_dist_mat(px, 0), context_dir=context_dir)
+
+
+def test_worker_matches_population():
+	np.random.seed(12)
+	context_dir = tempfile.mkdtemp()
+	try:
+		ctx = make_context(os.path.join(context_dir, "contexts"))
+		pop = make_population(15, 6)
+		cache = NodeValueCache(ctx.norm_in)
+		expected = evaluate_score_nov_population(pop, cache, ctx.id, True)
+
+		for (ind, (fitness, phenotype)) in zip(pop, expected):
+			# workers get pickled genomes, so the task is run on a pickled copy
+			(workerFit, workerPhenotype) = evaluate_score_nov(pickle.loads(pickle.dumps(ind)), ctx.id, True)
+			assert np.allclose(workerFit, fitness)
+			assert np.array_equal(workerPhenotype, phenotype)
+
+			# the baseline scores the output of getOutput one pixel at a time
+			output = np.array([ind.getOutput(list(row))[0] for row in ctx.norm_in])
+			assert np.allclose(evaluate_nov_pic((ind, output, ctx.id)), fitness)
+	finally:
+		shutil.rmtree(context_dir)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_worker_matches_population,):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -0,0 +1,365 @@
+"""This file contains the gene alignment and the NEAT distance between CPPN
+genomes. Genes are compared through arrays of their innovation numbers in
+sorted order, so two genomes are aligned with one merge instead of scanning
+every connection of one genome against every connection of the other.
+
+The distance between every pair of genomes of a population is computed at
+once from a sparse innovation-by-individual weight matrix, which makes
+speciation and explicit fitness sharing feasible for large populations.
+
+Distances are cached across generations by the fingerprints of the genomes,
+so unchanged individuals (species representatives, elites) are never
+compared twice
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+# default maximum number of genome pairs kept in the distance cache
+DEFAULT_MAX_PAIRS = 100000
+# fraction of new genomes above which a population's distance matrix is computed whole
+DEFAULT_RECOMPUTE_FRACTION = 0.5
+
+
+def align_genes(innovs1, innovs2):
+	"""Aligns the genes of two genomes by innovation number with one vectorized
+	merge (binary search) of their sorted innovation numbers
+
+	Parameters:
+	innovs1 -- sorted numpy array of innovation numbers of the first genome
+	innovs2 -- sorted numpy array of innovation numbers of the second genome
+
+	Returns:
+	(matching1, matching2, only1, only2) tuple of positions in the sorted arrays -
+	matching1[i] and matching2[i] hold the same innovation number, only1/only2
+	are the disjoint and excess genes of each genome
+	"""
+
+	pos = np.searchsorted(innovs2, innovs1)
+	found = np.zeros(len(innovs1), dtype=bool)
+	inRange = pos < len(innovs2)
+	found[inRange] = innovs2[pos[inRange]] == innovs1[inRange]
+	matching1 = np.flatnonzero(found)
+	matching2 = pos[found]
+	unmatched2 = np.ones(len(innovs2), dtype=bool)
+	unmatched2[matching2] = False
+	return (matching1, matching2, np.flatnonzero(~found), np.flatnonzero(unmatched2))
+
+
+def gene_fingerprint(innovs, weights):
+	"""returns a fingerprint of the sorted gene arrays of a genome, two genomes
+	with the same fingerprint have the same distance to every other genome
+	"""
+
+	h = hashlib.sha1()
+	h.update(np.asarray(innovs, dtype=np.int64).tobytes())
+	h.update(np.asarray(weights, dtype=np.float64).tobytes())
+	return h.hexdigest()
+
+
+def gene_distances(innovs1, weights1, innovs2, weights2, theta1, theta2, theta3):
+	"""Finds the NEAT distance between two genomes in both directions from one
+	alignment of their gene arrays - genes of a genome outside the innovation
+	range of the other are excess, genes of a genome missing from the other are
+	disjoint (excess genes included), so the two directions can differ
+
+	Parameters:
+	innovs1, weights1 -- sorted innovation numbers and matching weights of the first genome
+	innovs2, weights2 -- sorted innovation numbers and matching weights of the second genome
+	theta1,2,3 -- weights given to excess genes, disjoint genes and average weight difference
+
+	Returns:
+	(distance from first to second, distance from second to first) tuple
+	"""
+
+	(matching1, matching2, only1, only2) = align_genes(innovs1, innovs2)
+	numExcess1 = np.count_nonzero((innovs1 < innovs2[0]) | (innovs1 > innovs2[-1]))
+	numExcess2 = np.count_nonzero((innovs2 < innovs1[0]) | (innovs2 > innovs1[-1]))
+
+	# must calculate average weight difference between matching genes
+	weightDifference = 0.0
+	if(len(matching1) > 0):
+		weightDifference = np.sum(np.fabs(weights1[matching1] - weights2[matching2]))/len(matching1)
+
+	# N is the number of genes in the larger genome
+	N = max(len(innovs1), len(innovs2))
+
+	# distance formula: O1*disjoint + O2*excess + O3*averageWeightDiff
+	return (((theta1*numExcess1)/N) + ((theta2*len(only1))/N) + ((theta3*weightDifference)),
+			((theta1*numExcess2)/N) + ((theta2*len(only2))/N) + ((theta3*weightDifference)))
+
+
+def gene_distance(innovs1, weights1, innovs2, weights2, theta1, theta2, theta3):
+	"""Finds the NEAT distance from one genome to another from their gene arrays,
+	gives the same value as Genotype.getDistance
+	"""
+
+	return gene_distances(innovs1, weights1, innovs2, weights2, theta1, theta2, theta3)[0]
+
+
+def gene_distance_matrix(genes1, genes2, theta1, theta2, theta3):
+	"""Computes the distance from every genome of one list to every genome of
+	another with matrix operations, built on a sparse innovation-by-individual
+	weight matrix over the innovation numbers present in either list
+
+	Parameters:
+	genes1 -- list of (sorted innovations, weights) gene arrays of the first genomes
+	genes2 -- list of (sorted innovations, weights) gene arrays of the second genomes
+	theta1,2,3 -- weights given to excess genes, disjoint genes and average weight difference
+
+	Returns:
+	numpy array of shape (len(genes1), len(genes2)) - entry [i, j] is the
+	distance from genome i of the first list to genome j of the second list
+	"""
+
+	numFirst = len(genes1)
+	geneArrays = list(genes1) + list(genes2)
+	lengths = np.array([len(innovs) for (innovs, weights) in geneArrays])
+	allInnovs = np.concatenate([innovs for (innovs, weights) in geneArrays])
+	allWeights = np.concatenate([weights for (innovs, weights) in geneArrays])
+	individuals = np.repeat(np.arange(len(geneArrays)), lengths)
+
+	# only innovation numbers present in the genomes get a column
+	(innovations, columns) = np.unique(allInnovs, return_inverse=True)
+	presence = np.zeros((len(geneArrays), len(innovations)))
+	presence[individuals, columns] = 1.0
+	(lengths1, lengths2) = (lengths[:numFirst], lengths[numFirst:])
+
+	# matching genes of every pair counted with one matrix product
+	numMatching = presence[:numFirst].dot(presence[numFirst:].T)
+	numDisjoint = lengths1[:, None] - numMatching
+
+	# genes of i inside the innovation range of j are found from running counts over the sorted columns
+	counts = np.zeros((numFirst, len(innovations) + 1))
+	counts[:, 1:] = np.cumsum(presence[:numFirst], axis=1)
+	starts = np.array([np.searchsorted(innovations, innovs[0]) for (innovs, weights) in genes2], dtype=int)
+	ends = np.array([np.searchsorted(innovations, innovs[-1]) + 1 for (innovs, weights) in genes2], dtype=int)
+	numExcess = lengths1[:, None] - (counts[:, ends] - counts[:, starts])
+
+	# weight differences are summed per innovation over the genomes holding it,
+	# the sparse matrix is kept in column order so each innovation is one slice
+	order = np.lexsort((individuals, columns))
+	colStarts = np.searchsorted(columns[order], np.arange(len(innovations) + 1))
+	weightSums = np.zeros((numFirst, len(genes2)))
+	for col in range(len(innovations)):
+		colSlice = order[colStarts[col]:colStarts[col + 1]]
+		rows = individuals[colSlice]
+		first = rows < numFirst
+		if(np.any(first) and not np.all(first)):
+			w = allWeights[colSlice]
+			weightSums[np.ix_(rows[first], rows[~first] - numFirst)] += np.fabs(w[first][:, None] - w[~first][None, :])
+	weightDifference = np.divide(weightSums, numMatching, out=np.zeros_like(weightSums), where=numMatching > 0)
+
+	# N is the number of genes in the larger genome
+	N = np.maximum(lengths1[:, None], lengths2[None, :])
+
+	# distance formula: O1*disjoint + O2*excess + O3*averageWeightDiff
+	return ((theta1*numExcess)/N) + ((theta2*numDisjoint)/N) + ((theta3*weightDifference))
+
+
+def population_distance_matrix(pop, theta1, theta2, theta3):
+	"""Computes the distance between every pair of genomes of a population with
+	matrix operations - entry [i, j] is pop[i].getDistance(pop[j], ...), the
+	matrix is not symmetric because excess genes are counted for pop[i] only
+
+	Parameters:
+	pop -- list of genotypes
+	theta1,2,3 -- weights given to excess genes, disjoint genes and average weight difference
+
+	Returns:
+	numpy array of shape (len(pop), len(pop)) of distances
+	"""
+
+	geneArrays = [ind.getGeneArrays() for ind in pop]
+	return gene_distance_matrix(geneArrays, geneArrays, theta1, theta2, theta3)
+
+
+class DistanceCache():
+	"""Cache of distances between genomes keyed by the fingerprints of both
+	genomes. Pairs compared one at a time are stored once with the distance in
+	both directions, so looking a pair up in either order is a hit, and least
+	recently used pairs are evicted first once the cache is full.
+
+	Whole populations are kept as one distance matrix over the fingerprints of
+	the last population, the next population reuses its rows with array
+	indexing and only the rows and columns of new genomes are computed
+	"""
+
+	def __init__(self, max_pairs=None, recompute_fraction=DEFAULT_RECOMPUTE_FRACTION):
+		"""Constructor for the distance cache
+
+		Parameters:
+		max_pairs -- maximum number of genome pairs kept in the cache, if None it is
+				DEFAULT_MAX_PAIRS or every pair of the largest population seen, whichever is larger
+		recompute_fraction -- if more than this fraction of a population is new, its
+				whole distance matrix is computed at once instead of only the new rows
+		"""
+
+		self.fixed_size = max_pairs is not None
+		self.max_pairs = max_pairs if self.fixed_size else DEFAULT_MAX_PAIRS
+		self.recompute_fraction = recompute_fraction
+		self.entries = OrderedDict()
+
+		# distance matrix of the last population and the row of each fingerprint in it
+		self.block = np.zeros((0, 0))
+		self.blockIndex = {}
+		self.blockThetas = None
+
+		# counters used to see how much the cache is saving
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def _key(self, fp1, fp2, thetas):
+		"""returns (key, flipped) - fingerprints are put in order so both
+		directions of a pair share one entry
+		"""
+
+		if(fp1 <= fp2):
+			return ((fp1, fp2) + thetas, False)
+		return ((fp2, fp1) + thetas, True)
+
+	def get(self, fp1, fp2, thetas):
+		"""returns the cached distance from genome fp1 to genome fp2 or None"""
+
+		(key, flipped) = self._key(fp1, fp2, thetas)
+		if(key in self.entries):
+			self.entries.move_to_end(key)
+			return self.entries[key][1 if flipped else 0]
+
+		# pairs of the last population are answered from its matrix
+		if(thetas == self.blockThetas and fp1 in self.blockIndex and fp2 in self.blockIndex):
+			return self.block[self.blockIndex[fp1], self.blockIndex[fp2]]
+		return None
+
+	def put(self, fp1, fp2, thetas, dist12, dist21):
+		"""stores the distances between two genomes in both directions"""
+
+		(key, flipped) = self._key(fp1, fp2, thetas)
+		self.entries[key] = (dist21, dist12) if flipped else (dist12, dist21)
+		self.entries.move_to_end(key)
+		# evict least recently used pairs once the cache is full
+		while(len(self.entries) > self.max_pairs):
+			self.entries.popitem(last=False)
+			self.evictions += 1
+
+	def distance(self, ind1, ind2, theta1, theta2, theta3):
+		"""returns ind1.getDistance(ind2, theta1, theta2, theta3), computed only
+		if the pair of genomes is not in the cache
+		"""
+
+		thetas = (theta1, theta2, theta3)
+		(fp1, fp2) = (ind1.getFingerprint(), ind2.getFingerprint())
+		dist = self.get(fp1, fp2, thetas)
+		if(dist is not None):
+			self.hits += 1
+			return dist
+
+		self.misses += 1
+		(innovs1, weights1) = ind1.getGeneArrays()
+		(innovs2, weights2) = ind2.getGeneArrays()
+		(dist12, dist21) = gene_distances(innovs1, weights1, innovs2, weights2, theta1, theta2, theta3)
+		self.put(fp1, fp2, thetas, dist12, dist21)
+		return dist12
+
+	def matrix(self, pop, theta1, theta2, theta3):
+		"""Same as population_distance_matrix but the rows of genomes that were in
+		the last population are copied from its matrix - only the rows and columns
+		of new genomes are computed, or the whole matrix if most genomes are new
+
+		Parameters:
+		pop -- list of genotypes
+		theta1,2,3 -- weights given to excess genes, disjoint genes and average weight difference
+
+		Returns:
+		numpy array of shape (len(pop), len(pop)) of distances
+		"""
+
+		thetas = (theta1, theta2, theta3)
+		fps = [ind.getFingerprint() for ind in pop]
+
+		# identical genomes (elites, clones) only need to be compared once
+		uniqueInds = {}
+		for (ind, fp) in zip(pop, fps):
+			uniqueInds.setdefault(fp, ind)
+		uniqueFps = list(uniqueInds.keys())
+		index = dict((fp, i) for i, fp in enumerate(uniqueFps))
+		numUnique = len(uniqueFps)
+		if(not self.fixed_size):
+			self.max_pairs = max(self.max_pairs, (numUnique*(numUnique - 1))//2)
+
+		known = []
+		if(thetas == self.blockThetas):
+			known = [i for i, fp in enumerate(uniqueFps) if fp in self.blockIndex]
+		known = np.array(known, dtype=int)
+		new = np.setdiff1d(np.arange(numUnique), known)
+
+		# hits and misses are counted in genome pairs like the pairwise lookups
+		numKnownPairs = (len(known)*(len(known) - 1))//2
+		self.hits += numKnownPairs
+		self.misses += (numUnique*(numUnique - 1))//2 - numKnownPairs
+
+		genes = [uniqueInds[fp].getGeneArrays() for fp in uniqueFps]
+		if(len(new) > self.recompute_fraction*numUnique):
+			distances = gene_distance_matrix(genes, genes, theta1, theta2, theta3)
+		else:
+			distances = np.zeros((numUnique, numUnique))
+			oldRows = np.array([self.blockIndex[uniqueFps[i]] for i in known], dtype=int)
+			distances[np.ix_(known, known)] = self.block[np.ix_(oldRows, oldRows)]
+			if(len(new) > 0):
+				newGenes = [genes[i] for i in new]
+				distances[new, :] = gene_distance_matrix(newGenes, genes, theta1, theta2, theta3)
+				distances[np.ix_(known, new)] = gene_distance_matrix([genes[i] for i in known], newGenes, theta1, theta2, theta3)
+
+		# the matrix of this population is kept for the next one
+		(self.block, self.blockIndex, self.blockThetas) = (distances, index, thetas)
+
+		rows = np.array([index[fp] for fp in fps], dtype=int)
+		return distances[np.ix_(rows, rows)]
+
+	def hitRate(self):
+		"""returns the proportion of lookups that were answered from the cache"""
+
+		lookups = self.hits + self.misses
+		return self.hits/float(lookups) if lookups > 0 else 0.0
+
+	def clear(self):
+		self.entries = OrderedDict()
+		self.block = np.zeros((0, 0))
+		self.blockIndex = {}
+		self.blockThetas = None
+
+	def __len__(self):
+		return len(self.entries) + (len(self.blockIndex)*(len(self.blockIndex) - 1))//2
+
+	def __str__(self):
+		result = ""
+		result += ("CACHED DISTANCES: " + str(len(self)) + " HIT RATE: " + str(self.hitRate()) + "\n")
+		result += ("HITS: " + str(self.hits) + " MISSES: " + str(self.misses) + " EVICTIONS: " + str(self.evictions) + "\n")
+		return result
+
+
+# cache shared by everything in the process that compares genomes
+DISTANCE_CACHE = DistanceCache()
+
+
+def get_distance(ind1, ind2, theta1, theta2, theta3, cache=None):
+	"""returns the distance from ind1 to ind2 through the shared distance cache
+	unless another cache is given
+	"""
+
+	if(cache is None):
+		cache = DISTANCE_CACHE
+	return cache.distance(ind1, ind2, theta1, theta2, theta3)
+
+
+def get_distance_matrix(pop, theta1, theta2, theta3, cache=None):
+	"""returns population_distance_matrix(pop, ...) through the shared distance
+	cache unless another cache is given
+	"""
+
+	if(cache is None):
+		cache = DISTANCE_CACHE
+	return cache.matrix(pop, theta1, theta2, theta3)
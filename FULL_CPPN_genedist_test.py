@@ -0,0 +1,90 @@
+"""Tests for the gene distance engine - the distance matrices of a population
+must match Genotype.getDistance and the baseline gene-by-gene loop for every
+pair of genomes, over several generations of mutation and crossover. Can be
+run with pytest or directly from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_genedist import gene_distance_matrix, population_distance_matrix
+from FULL_CPPN_innovation import GlobalInnovation
+from FULL_CPPN_testhelp import make_population
+
+THETAS = (1.0, 1.0, .4)
+NUM_GENERATIONS = 5
+
+
+def baseline_distance(ind1, ind2, theta1, theta2, theta3):
+	"""the gene-by-gene distance loop Genotype.getDistance was written as before
+	it used sorted gene arrays
+	"""
+
+	innovs2 = [c.getInnovationNumber() for c in ind2.connections]
+	(minInnov, maxInnov) = (min(innovs2), max(innovs2))
+	numDisjoint = 0.0
+	numExcess = 0.0
+	for con in ind1.connections:
+		currInnov = con.getInnovationNumber()
+		if(currInnov < minInnov or currInnov > maxInnov):
+			numExcess += 1
+		if(currInnov not in innovs2):
+			numDisjoint += 1
+	weightDifference = 0.0
+	numMatchingConnections = 0
+	for con1 in ind1.connections:
+		for con2 in ind2.connections:
+			if(con1.getInnovationNumber() == con2.getInnovationNumber()):
+				weightDifference += np.fabs(con1.getWeight() - con2.getWeight())
+				numMatchingConnections += 1
+	weightDifference /= numMatchingConnections
+	N = max(len(ind1.connections), len(ind2.connections))
+
+	return ((theta1*numExcess)/N) + ((theta2*numDisjoint)/N) + ((theta3*weightDifference))
+
+
+def next_generation(pop, gb):
+	"""mutates every genome and replaces half of the population with crossover children"""
+
+	for ind in pop:
+		ind.weightMutate()
+		if(np.random.uniform() < .5):
+			(gb.innovDict, gb.current) = ind.nodeMutate(gb.innovDict, gb.current)
+		if(np.random.uniform() < .5):
+			gb.current = ind.connectionMutate(gb.current)
+	children = []
+	for i in range(len(pop)//2):
+		parent1 = pop[np.random.randint(len(pop))]
+		parent2 = pop[np.random.randint(len(pop))]
+		children.append(parent1.clone().crossover(parent2))
+
+	return pop[:len(pop) - len(children)] + children
+
+
+def test_matrix_matches_get_distance():
+	np.random.seed(10)
+	pop = make_population(16, 4)
+	# innovation numbers keep counting past the ones used to grow the population
+	gb = GlobalInnovation(2, 1)
+	gb.current = max(max(c.getInnovationNumber() for c in ind.connections) for ind in pop) + 1
+	for g in range(NUM_GENERATIONS):
+		pop = next_generation(pop, gb)
+		expected = np.array([[ind1.getDistance(ind2, *THETAS) for ind2 in pop] for ind1 in pop])
+		baseline = np.array([[baseline_distance(ind1, ind2, *THETAS) for ind2 in pop] for ind1 in pop])
+		assert np.allclose(expected, baseline), g
+		assert np.allclose(population_distance_matrix(pop, *THETAS), expected), g
+
+		# two different lists of genomes, such as a population and species representatives
+		genes = [ind.getGeneArrays() for ind in pop]
+		assert np.allclose(gene_distance_matrix(genes[:5], genes[5:], *THETAS), expected[:5, 5:]), g
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_matrix_matches_get_distance,):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -12,6 +12,11 @@ import numpy as np
 from matplotlib import colors
 import sys
 
+from FULL_CPPN_disthelp import get_edt
+
+# any pixel above binary threshold considered white, vic versa
+BINARY_THRESHOLD = 200
+
 
 '''
 THIS IS THE MAIN METHOD THAT SHOULD BE USED FOR GRABBING PIXELS IN OTHER FILES
@@ -20,12 +25,13 @@ in fitness evaluation for CPPN
 @param filepath path to image file that CPPN is being compared to 
 @param numX width of picture in pixels
 @param numY height of picuture in pixels
+@param threshold pixels with a value above the threshold are white
 @return numpy array containing all binary pixel values from original picture
 '''
-def getBinaryPixels(filepath, numX, numY):
+def getBinaryPixels(filepath, numX, numY, threshold=BINARY_THRESHOLD):
 	# gets normal RGB pixels in a list and converts to a numpy array of binary pixels
 	rgb_pix = getRGBPixels(filepath, numX, numY)
-	bin_pix = convertBinary(rgb_pix)
+	bin_pix = convertBinary(rgb_pix, threshold)
 
 	return bin_pix
 
@@ -63,12 +69,11 @@ def getRGBPixels(filepath, numX,numY):
 takes in a list of rgb pixels and converts it to a 
 numpy array of binary pixels 
 @param pixels list of rgb pixels
+@param threshold pixels with a value above the threshold are white
 @return numpy array containing binary version of rgb pixels
 pre: pixels should only contain completely black and white pixels
 '''
-def convertBinary(pixels):
-	# any pixel above binary threshold considered white, vic versa
-	BINARY_THRESHOLD = 200
+def convertBinary(pixels, threshold=BINARY_THRESHOLD):
 	binList = []
 
 	# only the first value in the tuple can be observed
@@ -77,7 +82,7 @@ def convertBinary(pixels):
 	for x in pixels:
 		# value of 255 is white, value of 0 is black
 		# 255 -> 0, 0 -> 1
-		if(x[0] > BINARY_THRESHOLD):
+		if(x[0] > threshold):
 			binList.append(0)
 		else:
 			binList.append(1)
@@ -132,11 +137,49 @@ def getNormalizedInputs(numX, numY):
 	return normIn
 
 
+def getNormalizedInputArray(numX, numY):
+	"""Same inputs as getNormalizedInputs but built directly as a numpy
+	array of shape (numX*numY, 2) - much faster for large resolutions
+	"""
+
+	# find mean and std for x and y values in inputs, same for both x and y
+	tmp = np.arange(1, numX + 1)
+	MEAN = np.mean(tmp)
+	STD = np.std(tmp)
+
+	# x changes fastest, matching the order of getNormalizedInputs
+	xs, ys = np.meshgrid(np.arange(numX), np.arange(numY))
+	return np.column_stack(((xs.flatten() - MEAN)/STD, (ys.flatten() - MEAN)/STD))
+
 
 def get_d_mat(pixels, numX, numY):
 	"""Generates the matrix that contains all values for 
 	the distance parameter that will be used in CPPN
-	activation.
+	activation - the distance of each pixel to the closest
+	pixel of the other value, negative for 0 pixels. Gives the
+	same result as get_d_mat_brute using an exact distance transform
+	"""
+
+	px = np.reshape(pixels, (numX, numY))
+	ones = (px == 1)
+
+	# distance of the 1 pixels to the closest 0 and of all other pixels to the closest 1
+	to_zero = get_edt(~ones)
+	to_one = get_edt(ones)
+	result = np.where(ones, to_zero, -to_one)
+
+	# pixels are given the largest distance if there is no pixel of the other value
+	result[np.isposinf(result)] = sys.maxsize
+	result[np.isneginf(result)] = -sys.maxsize
+
+	# flatten result before return to make it same form as 
+	# the other normalized location inputs
+	return result.flatten()
+
+
+def get_d_mat_brute(pixels, numX, numY):
+	"""Brute force version of get_d_mat that compares every pixel
+	against every pixel of the other value, kept as a reference
 	"""
 
 	result = np.zeros((numX, numY))
@@ -0,0 +1,138 @@
+"""This file contains the hypervolume indicator used to follow the convergence
+of a run with two minimized objectives (target distance and connection count).
+The hypervolume is the area dominated by the pareto front and bounded by a
+reference point, larger is better, and it never decreases while the front
+only improves.
+
+The area is found with a sweep over the front sorted by the first objective -
+O(n log n) for the sort and O(n) for the sweep. The tracker only keeps the
+current front, so each generation sorts the front together with the new
+points instead of everything that was ever evaluated, and it reports when the
+hypervolume stopped improving so a run can end early
+"""
+
+import numpy as np
+
+# number of generations the hypervolume has to improve within
+DEFAULT_PLATEAU_GENS = 20
+
+# relative improvement over the plateau window below which the run is considered converged
+DEFAULT_PLATEAU_TOL = 1e-3
+
+
+def front_2d(values):
+	"""Finds the non-dominated points of a set of two minimized objective values
+	with one sort and a running minimum
+
+	Parameters:
+	values -- (n x 2) matrix of objective values
+
+	Returns:
+	(m x 2) matrix of the non-dominated points sorted by the first objective,
+	duplicate points are only kept once
+	"""
+
+	values = np.asarray(values, dtype=float).reshape(-1, 2)
+	if(len(values) == 0):
+		return values
+
+	# sorted by the first objective and then the second, a point is non-dominated
+	# if its second objective is below every point before it
+	order = np.lexsort((values[:, 1], values[:, 0]))
+	ordered = values[order]
+	best_before = np.concatenate(([np.inf], np.minimum.accumulate(ordered[:-1, 1])))
+
+	return ordered[ordered[:, 1] < best_before]
+
+
+def hypervolume_2d(values, reference):
+	"""Finds the area dominated by a set of two minimized objective values and
+	bounded by the reference point
+
+	Parameters:
+	values -- (n x 2) matrix of objective values
+	reference -- (2,) reference point, points not strictly below it in both objectives add nothing
+
+	Returns:
+	the hypervolume as a float
+	"""
+
+	reference = np.asarray(reference, dtype=float)
+	front = front_2d(values)
+	front = front[np.all(front < reference, axis=1)]
+	if(len(front) == 0):
+		return 0.0
+
+	# every point adds the slice between its second objective and the one of the point before it
+	upper = np.concatenate(([reference[1]], front[:-1, 1]))
+
+	return float(np.sum((reference[0] - front[:, 0])*(upper - front[:, 1])))
+
+
+class HypervolumeTracker():
+	"""Keeps the pareto front of a run and its hypervolume after every generation"""
+
+	def __init__(self, reference=None, plateau_gens=DEFAULT_PLATEAU_GENS, plateau_tol=DEFAULT_PLATEAU_TOL):
+		"""Constructor for the hypervolume tracker
+
+		Parameters:
+		reference -- (2,) reference point, taken from the first generation if None
+		plateau_gens -- number of generations the hypervolume has to improve within
+		plateau_tol -- relative improvement over plateau_gens below which the run has converged
+		"""
+
+		self.reference = None if reference is None else np.asarray(reference, dtype=float)
+		self.plateau_gens = plateau_gens
+		self.plateau_tol = plateau_tol
+		self.front = np.zeros((0, 2))
+		self.history = []
+		self.times = []
+
+	def update(self, values, gen_time=0.0):
+		"""Merges a generation's objective values into the front and records its hypervolume
+
+		Parameters:
+		values -- (P x 2) matrix of minimized objective values
+		gen_time -- seconds the generation took, kept with the hypervolume
+
+		Returns:
+		the hypervolume after the generation
+		"""
+
+		values = np.asarray(values, dtype=float).reshape(-1, 2)
+
+		# the reference point lies a little past the worst values of the first generation
+		# and then stays fixed, so hypervolumes of later generations can be compared
+		if(self.reference is None and len(values) > 0):
+			worst = np.max(values[np.all(np.isfinite(values), axis=1)], axis=0, initial=0.0)
+			self.reference = worst + .1*np.abs(worst) + 1.0
+
+		self.front = front_2d(np.vstack((self.front, values)))
+		volume = 0.0
+		if(self.reference is not None):
+			volume = hypervolume_2d(self.front, self.reference)
+		self.history.append(volume)
+		self.times.append(gen_time)
+
+		return volume
+
+	def plateaued(self):
+		"""returns True if the hypervolume improved by less than plateau_tol (relative)
+		over the last plateau_gens generations
+		"""
+
+		if(self.plateau_gens <= 0 or len(self.history) <= self.plateau_gens):
+			return False
+
+		old = self.history[-1 - self.plateau_gens]
+		improvement = self.history[-1] - old
+
+		return improvement <= self.plateau_tol*max(abs(old), 1e-12)
+
+	def __str__(self):
+		result = ""
+		volume = self.history[-1] if len(self.history) > 0 else 0.0
+		result += ("HYPERVOLUME: " + str(volume) + " FRONT SIZE: " + str(len(self.front)) + "\n")
+		gen_time = self.times[-1] if len(self.times) > 0 else 0.0
+		result += ("GENERATION TIME: " + str(gen_time) + " TOTAL TIME: " + str(sum(self.times)) + "\n")
+		return result
@@ -0,0 +1,101 @@
+"""Tests for the hypervolume tracker - the front must hold exactly the points
+no other point dominates, the hypervolume must equal the area of the union
+of the boxes the points dominate, and tracking generation by generation
+must give the hypervolume of everything seen so far. Can be run with pytest
+or directly from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_hypervolume import front_2d, hypervolume_2d, HypervolumeTracker
+
+
+def make_values(rng, num):
+	"""returns trade-off values like target distance vs connection count, with ties"""
+
+	connections = rng.randint(3, 30, size=num).astype(float)
+	distance = 200.0/connections + rng.uniform(0, 20, size=num)
+	return np.column_stack((np.round(distance), connections))
+
+
+def brute_force_front(values):
+	"""returns the distinct points that no other point dominates, sorted by the first objective"""
+
+	front = set()
+	for p in values:
+		dominated = any(np.all(q <= p) and np.any(q < p) for q in values)
+		if(not dominated):
+			front.add(tuple(p))
+	return np.array(sorted(front)).reshape(-1, 2)
+
+
+def brute_force_volume(values, reference):
+	"""area of the union of the boxes between each point and the reference, found
+	by checking every cell of the grid made by the coordinates of the points
+	"""
+
+	values = values[np.all(values < reference, axis=1)]
+	xs = np.unique(np.concatenate((values[:, 0], [reference[0]])))
+	ys = np.unique(np.concatenate((values[:, 1], [reference[1]])))
+	volume = 0.0
+	for i in range(len(xs) - 1):
+		for j in range(len(ys) - 1):
+			# a cell is covered if a point is at or below its lower corner
+			if(np.any(np.all(values <= (xs[i], ys[j]), axis=1))):
+				volume += (xs[i + 1] - xs[i])*(ys[j + 1] - ys[j])
+	return volume
+
+
+def test_front_matches_brute_force():
+	rng = np.random.RandomState(25)
+	for num in (1, 5, 40, 120):
+		values = make_values(rng, num)
+		assert np.array_equal(front_2d(values), brute_force_front(values)), num
+
+
+def test_volume_matches_brute_force():
+	rng = np.random.RandomState(26)
+	for num in (1, 5, 40, 120):
+		values = make_values(rng, num)
+		# a reference point that cuts off some of the points
+		reference = np.percentile(values, 80, axis=0)
+		assert np.isclose(hypervolume_2d(values, reference), brute_force_volume(values, reference)), num
+	assert hypervolume_2d(np.zeros((0, 2)), (1.0, 1.0)) == 0.0
+
+
+def test_tracker_matches_all_values():
+	rng = np.random.RandomState(27)
+	tracker = HypervolumeTracker()
+	seen = np.zeros((0, 2))
+	for g in range(15):
+		values = make_values(rng, 20)
+		seen = np.vstack((seen, values))
+		volume = tracker.update(values)
+		assert np.array_equal(tracker.front, brute_force_front(seen)), g
+		assert np.isclose(volume, brute_force_volume(seen, tracker.reference)), g
+	# the front only improves, so the hypervolume never decreases
+	assert np.all(np.diff(tracker.history) >= 0)
+
+
+def test_plateau():
+	tracker = HypervolumeTracker(reference=(10.0, 10.0), plateau_gens=3)
+	for g in range(3):
+		tracker.update([[5.0 - g, 5.0]])
+		assert not tracker.plateaued(), g
+	tracker.update([[1.0, 5.0]])
+	assert not tracker.plateaued()
+	for g in range(3):
+		tracker.update([[9.0, 9.0]])
+	assert tracker.plateaued()
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_front_matches_brute_force, test_volume_matches_brute_force, test_tracker_matches_all_values, test_plateau):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -0,0 +1,189 @@
+"""This file contains the image fitness metrics computed for a whole population
+at once. Every function takes a (P x N) matrix holding the flattened output
+image of each of the P individuals in a row and returns a numpy array with
+one value per individual - each metric is a few matrix operations instead of
+a python loop over individuals and pixels.
+
+Binary outputs may be given as PackedImages instead, the metrics are then
+computed from popcounts and byte lookups on the packed bits
+"""
+
+import numpy as np
+
+from FULL_CPPN_disthelp import get_edt, BLACK_THRESHOLD
+from FULL_CPPN_phenotype import PackedImages, pack_target, popcount
+
+# outputs are clipped this far from 0 and 1 before taking the cross entropy
+CROSS_ENTROPY_EPS = 1e-7
+
+
+def as_population(outputs):
+	"""returns the outputs as a 2D float matrix with one individual in each row,
+	a single output image becomes a matrix with one row
+	"""
+
+	outputs = np.asarray(outputs, dtype=float)
+	if(outputs.ndim == 1):
+		outputs = outputs[None, :]
+	elif(outputs.ndim > 2):
+		outputs = outputs.reshape(len(outputs), -1)
+
+	return outputs
+
+
+def thresholded_distance(outputs, dist_black, dist_white, threshold=BLACK_THRESHOLD):
+	"""population version of get_hausdorff_dist - black output pixels add their
+	distance to the closest black target pixel, white output pixels their
+	distance to the closest white target pixel
+
+	Parameters:
+	outputs -- (P x N) matrix of output images
+	dist_black -- distance of every pixel to the closest black target pixel
+	dist_white -- distance of every pixel to the closest white target pixel
+	threshold -- output pixels at or above this value are black
+
+	Returns:
+	numpy array of P summed distances, lower is better
+	"""
+
+	dist_black = np.ravel(dist_black).astype(float)
+	dist_white = np.ravel(dist_white).astype(float)
+
+	# every pixel starts at its white distance and black pixels swap it for the black one
+	if(isinstance(outputs, PackedImages)):
+		return np.sum(dist_white) + outputs.weighted_sum(dist_black - dist_white)
+	black = as_population(outputs) >= threshold
+	return np.sum(dist_white) + black.dot(dist_black - dist_white)
+
+
+def material_l1(outputs, pixels, spec_len, mat_pen, mat_unp):
+	"""population version of the fitness in assign_fit_scoop - one minus the
+	absolute difference to the target summed over all pixels, with missing
+	material penalized by mat_unp and the whole fitness divided down if too
+	little material is used
+
+	Parameters:
+	outputs -- (P x N) matrix of output images
+	pixels -- binary target pixels
+	spec_len -- number of individuals in the species, a single value or one per individual
+	mat_pen -- proportion of material below which the fitness is penalized
+	mat_unp -- factor applied to pixels where the target has material and the output does not
+
+	Returns:
+	numpy array of P fitness values, higher is better
+	"""
+
+	if(isinstance(outputs, PackedImages)):
+		# with binary outputs the absolute differences are the pixels that differ and
+		# the unpresent ones are target pixels the output does not have
+		numPix = outputs.numPix
+		target = pack_target(pixels).bits
+		proportion_mat_used = outputs.counts()/float(numPix)
+		total_diff = popcount(outputs.bits ^ target) + (mat_unp - 1)*popcount(target & ~outputs.bits)
+	else:
+		outputs = as_population(outputs)
+		numPix = outputs.shape[1]
+		proportion_mat_used = np.sum(outputs, axis=1)/numPix
+
+		# differences of at least .5 are positive, so scaling them by mat_unp adds
+		# (mat_unp - 1) times their sum on top of the sum of absolute differences
+		diff = np.ravel(pixels)[None, :] - outputs
+		unpresent = diff >= .5
+		diff = np.fabs(diff, out=diff)
+		total_diff = np.sum(diff, axis=1) + (mat_unp - 1)*np.einsum("ij,ij->i", diff, unpresent)
+
+	# penalization starts at dividing by 2 and becomes larger as less material used
+	penalization = np.where(proportion_mat_used <= mat_pen, 2.0*(mat_pen/(proportion_mat_used + .001)), 1.0)
+
+	return (numPix - total_diff)/(np.asarray(spec_len, dtype=float)*penalization)
+
+
+def cross_entropy(outputs, pixels, eps=CROSS_ENTROPY_EPS):
+	"""population version of get_cross_entropy, the two terms of the sum are
+	each one matrix-vector product. Outputs are clipped to [eps, 1 - eps] so
+	binary outputs give finite values, and packed and dense copies of the same
+	binary images give the same values
+
+	Parameters:
+	outputs -- (P x N) matrix of output images or PackedImages
+	pixels -- binary target pixels
+	eps -- smallest distance of an output from 0 and 1
+
+	Returns:
+	numpy array of P cross entropy values, lower is better
+	"""
+
+	if(isinstance(outputs, PackedImages)):
+		# clipped binary pixels cost -log(1 - eps) if they match the target and -log(eps) otherwise
+		mismatched = popcount(outputs.bits ^ pack_target(pixels).bits).astype(float)
+		return -1.0*(mismatched*np.log(eps) + (outputs.numPix - mismatched)*np.log(1.0 - eps))
+
+	outputs = np.clip(as_population(outputs), eps, 1.0 - eps)
+	pixels = np.ravel(pixels).astype(float)
+
+	# formula -(y*log(a) + (1-y)log(1-a))
+	return -1.0*(np.log(outputs).dot(pixels) + np.log(1.0 - outputs).dot(1.0 - pixels))
+
+
+def iou(outputs, pixels, threshold=BLACK_THRESHOLD):
+	"""intersection over union of the black pixels of each output and the target
+
+	Returns:
+	numpy array of P values between 0 and 1, higher is better - two images
+	without any black pixels are counted as a perfect match
+	"""
+
+	if(isinstance(outputs, PackedImages)):
+		target = pack_target(pixels).bits
+		intersection = popcount(outputs.bits & target)
+		union = popcount(outputs.bits | target)
+	else:
+		black = as_population(outputs) >= threshold
+		target = (np.ravel(pixels) == 1)
+		intersection = black.dot(target.astype(float))
+		union = np.sum(black, axis=1) + np.sum(target) - intersection
+
+	with np.errstate(divide="ignore", invalid="ignore"):
+		return np.where(union > 0, intersection/union, 1.0)
+
+
+def chamfer(outputs, pixels, dist_black, shape, threshold=BLACK_THRESHOLD):
+	"""symmetric chamfer distance between the black pixels of each output and of
+	the target - the average distance of output pixels to the closest target pixel
+	plus the average distance of target pixels to the closest output pixel. The
+	distance maps of all outputs are created together with one distance transform
+
+	Parameters:
+	outputs -- (P x N) matrix of output images or PackedImages, packed outputs
+			are unpacked for the distance transform so they save no memory here
+	pixels -- binary target pixels
+	dist_black -- distance of every pixel to the closest black target pixel
+	shape -- (numX, numY) shape the flattened images are reshaped to
+	threshold -- output pixels at or above this value are black
+
+	Returns:
+	numpy array of P distances, lower is better - np.inf if an output or the
+	target has no black pixels
+	"""
+
+	# the distance transform needs the pixels of packed outputs, so only it unpacks them
+	if(isinstance(outputs, PackedImages)):
+		black = outputs.unpack().astype(bool)
+		numBlack = outputs.counts()
+		sum_to_target = outputs.weighted_sum(dist_black)
+	else:
+		black = as_population(outputs) >= threshold
+		numBlack = np.sum(black, axis=1)
+		sum_to_target = black.dot(np.ravel(dist_black).astype(float))
+	target = (np.ravel(pixels) == 1).astype(float)
+
+	# distance maps of the outputs, one image of the stack for each individual
+	dist_out = get_edt(black.reshape((len(black),) + tuple(shape))).reshape(len(black), -1)
+
+	if(np.sum(target) == 0):
+		return np.full(len(black), np.inf)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		to_target = sum_to_target/numBlack
+		to_output = dist_out.dot(target)/np.sum(target)
+
+	return np.where(numBlack > 0, to_target + to_output, np.inf)
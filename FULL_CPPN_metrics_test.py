@@ -0,0 +1,89 @@
+"""Tests for the population-wide image metrics - every metric must give the
+value of the per-individual baseline it replaces for each row of the output
+matrix. Can be run with pytest or directly from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_metrics import thresholded_distance, material_l1, cross_entropy, iou
+from FULL_CPPN_evaluation import assign_fit_scoop
+from FULL_CPPN_disthelp import get_hausdorff_dist, get_dist_mat_brute, BLACK_THRESHOLD
+from FULL_CPPN_novhelp import get_cross_entropy
+
+NUM_X = 9
+NUM_Y = 7
+POP_SIZE = 25
+
+
+def make_outputs(rng):
+	"""returns outputs strictly between 0 and 1 (so the cross entropy baseline is
+	finite), with some individuals using very little material, and a random target
+	"""
+
+	outputs = rng.uniform(.01, .99, size=(POP_SIZE, NUM_X*NUM_Y))
+	outputs[:5] *= .05
+	pixels = (rng.uniform(size=NUM_X*NUM_Y) < .4).astype(int)
+	return (outputs, pixels)
+
+
+def baseline_iou(output, pixels):
+	"""intersection over union of the black pixel positions of one output and the target"""
+
+	black = set(np.flatnonzero(output >= BLACK_THRESHOLD))
+	target = set(np.flatnonzero(pixels == 1))
+	if(len(black | target) == 0):
+		return 1.0
+	return len(black & target)/float(len(black | target))
+
+
+def test_thresholded_distance():
+	rng = np.random.RandomState(1)
+	(outputs, pixels) = make_outputs(rng)
+	px = np.reshape(pixels, (NUM_X, NUM_Y))
+	dist_black = np.ravel(get_dist_mat_brute(px, 1))
+	dist_white = np.ravel(get_dist_mat_brute(px, 0))
+	expected = [get_hausdorff_dist(out, dist_black, dist_white)[0] for out in outputs]
+	assert np.allclose(thresholded_distance(outputs, dist_black, dist_white), expected)
+
+
+def test_material_l1():
+	rng = np.random.RandomState(2)
+	(outputs, pixels) = make_outputs(rng)
+	for (mat_pen, mat_unp) in ((.1, 2.0), (.3, 1.0), (.5, 3.5)):
+		for spec_len in (1, 4):
+			expected = [assign_fit_scoop((out, pixels, spec_len, mat_pen, mat_unp))[0] for out in outputs]
+			assert np.allclose(material_l1(outputs, pixels, spec_len, mat_pen, mat_unp), expected), (mat_pen, mat_unp)
+	# one species length per individual
+	spec_lens = rng.randint(1, 6, size=POP_SIZE)
+	expected = [assign_fit_scoop((out, pixels, s, .1, 2.0))[0] for out, s in zip(outputs, spec_lens)]
+	assert np.allclose(material_l1(outputs, pixels, spec_lens, .1, 2.0), expected)
+
+
+def test_cross_entropy():
+	rng = np.random.RandomState(3)
+	(outputs, pixels) = make_outputs(rng)
+	expected = [get_cross_entropy(out, pixels) for out in outputs]
+	assert np.allclose(cross_entropy(outputs, pixels), expected)
+
+
+def test_iou():
+	rng = np.random.RandomState(4)
+	(outputs, pixels) = make_outputs(rng)
+	# an all white output against a target and against an all white target
+	outputs[0] = 0.0
+	expected = [baseline_iou(out, pixels) for out in outputs]
+	assert np.allclose(iou(outputs, pixels), expected)
+	empty = np.zeros(NUM_X*NUM_Y, dtype=int)
+	assert np.allclose(iou(outputs, empty), [baseline_iou(out, empty) for out in outputs])
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_thresholded_distance, test_material_l1, test_cross_entropy, test_iou):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -5,7 +5,7 @@
 
 import copy
 
-from FULL_CPPN_act import stepAct, sigAct, reluAct, sinAct, gaussAct, logAct, tanhAct, squareAct, absAct
+from FULL_CPPN_act import activate_scalar, num_activations
 
 # Node class, defined in this file to be used in CPPN implementation
 class Node: 	
@@ -16,10 +16,10 @@ class Node:
 	@param value stored within the node when it is activated, usually 0 or changed when CPPN is activated
 	@param layer topological value used to sort connection list before activating CPPN
 	@param actKey used to decide which activation function to use when activating CPPN
-	pre: 0 < actKey <= 5
+	pre: 0 <= actKey < number of registered activations
 	'''
 	def __init__(self, nodeNumber, value, layer, actKey):
-		if(actKey < 0 or actKey > 8):
+		if(actKey < 0 or actKey >= num_activations()):
 			print("Error: actKey is not within range.")
 		else:	
 			# layer is not a true layer - only used for sorting nodes based on network topology
@@ -104,23 +104,5 @@ class Node:
 	@return output of activation function with current node value as its input
 	'''
 	def activate(self):
-		val = self.getNodeValue()
-		if(self.getActKey() == 0):
-			val = stepAct(val)
-		elif(self.getActKey() == 1):
-			val = sigAct(val)
-		elif(self.getActKey() == 2):
-			val = reluAct(val)
-		elif(self.getActKey() == 3):
-			val = sinAct(val)
-		elif(self.getActKey() == 4):
-			val = gaussAct(val)
-		elif(self.getActKey() == 5):
-			val = logAct(val)
-		elif(self.getActKey() == 6):
-			val = tanhAct(val)
-		elif(self.getActKey() == 7):
-			val = squareAct(val)
-		elif(self.getActKey() == 8):
-			val = absAct(val)
-		return val
+		# activation function is looked up in the registry by its key
+		return activate_scalar(self.getActKey(), self.getNodeValue())
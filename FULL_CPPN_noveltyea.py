@@ -5,6 +5,7 @@ is implemented for novelty search using the CPPN
 import sys
 import os
 import copy
+import time
 
 from deap import base, tools, algorithms, creator
 import argparse
@@ -14,16 +15,25 @@ from scoop import futures
 
 from FULL_CPPN_struct import Genotype
 from FULL_CPPN_deaphelp import weightMutate, conMutate, nodeMutate, xover, xover_avg, actMutate, save_population
-from FULL_CPPN_deaphelp import examine_population_dmat, get_file_name, get_pareto_front
+from FULL_CPPN_deaphelp import examine_population_dmat, get_file_name, get_pareto_front, get_edge_report
 from FULL_CPPN_innovation import GlobalInnovation
 from FULL_CPPN_evalg import getSharingMatrix, speciatePopulationFirstTime, speciatePopulationNotFirstTime
 from FULL_CPPN_evalg import getFittestFromSpecies, getNicheCounts, binarySelect, select_n_binary
 from FULL_CPPN_vis import visConnections, visHiddenNodes, findNumGoodSolutions, plot_pareto_front, get_n_colors
 from FULL_CPPN_evaluation import evaluate_novelty, evaluate_pic_scoop
-from FULL_CPPN_evaluation import evaluate_pic_dparam, evaluate_nov_pic
+from FULL_CPPN_evaluation import evaluate_pic_dparam, evaluate_nov_pic, evaluate_score_nov, evaluate_score_nov_population
+from FULL_CPPN_deltaeval import NodeValueCache
 from FULL_CPPN_getpixels import getBinaryPixels, getNormalizedInputs, get_d_mat, graphImage
 from FULL_CPPN_disthelp import get_dist_mat 
 from FULL_CPPN_deapconfig import get_tb 
+from FULL_CPPN_evalctx import create_context
+from FULL_CPPN_phenotype import stack_images
+from FULL_CPPN_archive import NoveltyArchive
+from FULL_CPPN_nsga import fitness_matrix
+from FULL_CPPN_paretoarchive import ParetoArchive
+from FULL_CPPN_hypervolume import HypervolumeTracker
+from FULL_CPPN_descriptors import get_extractor, DESCRIPTOR_TYPES
+from FULL_CPPN_targetcache import load_target
 
 # set up arguments to be parsed from the terminal
 parser = argparse.ArgumentParser()
@@ -33,6 +43,18 @@ parser.add_argument("seed", type=int,
 	help="Seed number for the current experiment.")
 parser.add_argument("ngen", type=int,
 	help="Number of generations to run the evolution.")
+parser.add_argument("--descriptor", type=str, default="none", choices=DESCRIPTOR_TYPES,
+	help="Behaviour descriptor novelty is measured with.")
+parser.add_argument("--descriptor_dims", type=int, default=32,
+	help="Number of dimensions of projection and PCA descriptors.")
+parser.add_argument("--pareto_file", type=str, default=None,
+	help="File the pareto archive of the run is saved to.")
+parser.add_argument("--plateau_gens", type=int, default=0,
+	help="Stop once the hypervolume has not improved for this many generations, 0 never stops.")
+parser.add_argument("--workers", action="store_true",
+	help="Render and score every genome in a scoop worker instead of from the node value cache.")
+parser.add_argument("--verbose", action="store_true",
+	help="Print the raw and effective edge counts of the population every generation.")
 
 '''
 parser.add_argument("weight", type=int, 
@@ -64,11 +86,16 @@ pickle.dump(NORM_IN, NORM_IN_FILE)
 
 # must get filename from parser to complete file path
 FILE_PATH = './fitting_images/' + args.path
-PIXELS = getBinaryPixels(FILE_PATH, NUM_X, NUM_Y)
-print("Creating distance matrix...")
-DIST_MAT_BLACK = get_dist_mat(np.reshape(PIXELS, (NUM_X, NUM_Y)), 1)
-DIST_MAT_WHITE = get_dist_mat(np.reshape(PIXELS, (NUM_X, NUM_Y)), 0)
-print("Distance matrix created...")
+# pixels and distance maps are only created the first time a target is used at this resolution
+print("Loading target and distance matrix...")
+TARGET = load_target(FILE_PATH, NUM_X, NUM_Y)
+PIXELS = TARGET.pixels
+DIST_MAT_BLACK = TARGET.dist_black
+DIST_MAT_WHITE = TARGET.dist_white
+print("Distance matrix loaded (cached: " + str(TARGET.cached) + ")...")
+
+# inputs and distance maps are loaded once by each worker, tasks only carry the ID of the context
+CONTEXT = create_context(NORM_IN, PIXELS, dist_black=DIST_MAT_BLACK, dist_white=DIST_MAT_WHITE)
 
 
 # determines when to save the current population
@@ -82,6 +109,47 @@ SELECT_PROB = 2.0
 # retrieve the toolbox from the deap config file
 toolbox = get_tb()
 
+# node values of evaluated individuals are kept so mutants only re-evaluate what changed
+VALUE_CACHE = NodeValueCache(np.array(NORM_IN))
+
+# novelty of the mutants is measured against a bounded archive of packed phenotypes and reported,
+# it is for monitoring only - selection keeps the target distance and connection count objectives
+USE_ARCHIVE = True
+ARCHIVE_PROB = .05
+# phenotypes are reduced to short descriptors before nearest neighbours are searched, fitted extractors
+# (pca) are refit with the new archive entries every few generations
+DESCRIPTOR = get_extractor(args.descriptor, NUM_X, NUM_Y, args.descriptor_dims, seed=SEED)
+DESCRIPTOR_REFIT_GENS = 5
+NOV_ARCHIVE = NoveltyArchive(NUM_X*NUM_Y, insertion="random", insert_prob=ARCHIVE_PROB, eviction="oldest", seed=SEED,
+		extractor=DESCRIPTOR)
+
+# best trade-offs between target distance and connections found during the run, saved
+# with the population and at the end of the run
+PARETO_ARCHIVE = ParetoArchive(epsilon=(1.0, 1.0), capacity=1000)
+PARETO_FILE = args.pareto_file
+if(PARETO_FILE is None):
+	PARETO_FILE = "pareto_archive{0}.npz".format(SEED)
+
+# hypervolume of the front found so far is logged every generation, the run stops early
+# once it plateaus if --plateau_gens is given
+HV_TRACKER = HypervolumeTracker(plateau_gens=args.plateau_gens)
+
+# outputs are scored where they are rendered, compact phenotypes are only kept when they are archived
+KEEP_PHENOTYPES = USE_ARCHIVE
+toolbox.register("evaluate_score_one", evaluate_score_nov, ctx_id=CONTEXT.id, keep_phenotype=KEEP_PHENOTYPES)
+
+def evaluate_score_workers(pop):
+	"""renders, scores and packs every genome in a worker, only genomes are sent"""
+
+	return list(toolbox.map(toolbox.evaluate_score_one, pop))
+
+# workers render every genome in full, in process mutants are rendered from the cached values of their parents
+if(args.workers):
+	toolbox.register("evaluate_score", evaluate_score_workers)
+else:
+	toolbox.register("evaluate_score", evaluate_score_nov_population, cache=VALUE_CACHE, ctx_id=CONTEXT.id,
+			keep_phenotype=KEEP_PHENOTYPES)
+
 '''
 # create class for maximizing fitness and creating individual
 # must name fitness atribute fit_obj because fitness is a instance variable of Genotype class
@@ -129,29 +197,28 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 	non_dom = 0
 	
 	
-	# assign fitness to the initial population
-	outputs = list(toolbox.map(toolbox.evaluate, pop))
-
-	# create tuples that can be fed into the novelty fitness assignment function
-	output_tups = [(gen, vec[0], DIST_MAT_BLACK, DIST_MAT_WHITE) for gen, vec in zip(pop, outputs)]
-
-	# map all outputs to the genotypes with their actual fitness assigned
-	fitnesses = list(toolbox.map(toolbox.assign_fit, output_tups))
-	
-	'''
-	# find all output lists that should be added to the archive
-	for index in range(len(fitnesses)):
-		# randomly add individuals into the archive based on a probability
-		if(np.random.uniform() <= ARCHIVE_PROB):
-			NOV_ARCHIVE.append((pop[index], outputs[index]))
-	'''
+	# assign fitness to the initial population, node values are cached for the mutants
+	results = toolbox.evaluate_score(pop)
 
-	org_ind = 0
-	for f,o in zip(fitnesses, outputs):
-		gen = pop[org_ind]
+	# packed phenotypes are kept by individual so they can be saved with the population
+	phenotypes = {}
+	for gen, (f, phenotype) in zip(pop, results):
 		gen.fitness.values = f
 		gen.fit_obj = f[0]
-		org_ind += 1
+		phenotypes[id(gen)] = phenotype
+	PARETO_ARCHIVE.update(fitness_matrix(pop, False), pop, 0)
+	# the reference point of the hypervolume is set from the initial population
+	HV_TRACKER.update(fitness_matrix(pop, False))
+
+	# randomly add individuals into the archive based on a probability
+	if(USE_ARCHIVE):
+		images = stack_images([phenotypes[id(gen)] for gen in pop], NUM_X*NUM_Y)
+		# fitted descriptors start from the initial population
+		if(DESCRIPTOR is not None):
+			DESCRIPTOR.partial_fit(images)
+		NOV_ARCHIVE.update(images, NOV_ARCHIVE.score(images))
+		# the archived individuals were part of that fit, the first refit must not count them twice
+		NOV_ARCHIVE.mark_fitted()
 	
 	
 	# use global innovation object to track the creation of new innovation numbers during evolution
@@ -161,12 +228,17 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 	# run the evolution loop
 	for g in range(NGEN):
 		print("RUNNING GENERATION " + str(g))
+		gen_start = time.time()
+		# optimizing every plan for the report is not free, so it is only done when asked for
+		if(args.verbose):
+			print(get_edge_report(pop))
 	
 		# only apply mutation if there will be another iteration of selection following this
 		mutants = []
 		
 		for ind in pop:
-			new_ind = copy.deepcopy(ind)
+			# clone shares genes with the parent until a mutation changes them
+			new_ind = ind.clone()
 			# apply weight mutation
 			if(np.random.uniform() <= weightMutpb):
 				new_ind = toolbox.weightMutate(new_ind)[0]
@@ -212,21 +284,16 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 			mutants.append(new_ind)
 		
 		
-		# apply crossover
+		# apply crossover, pairs are collected first so the whole generation is crossed over at once
+		pairs = []
 		for child1Ind, child2Ind in zip(range(0,len(pop),2), range(1,len(pop),2)):
 			if(np.random.uniform() < cxPb):
 				# set species so you know which result corresponds to each parent
 				pop[child1Ind].species = 1
 				pop[child2Ind].species = 2
 				
-				# create a deep copy for the newly mutated individuals
-				ch_1 = copy.deepcopy(pop[child1Ind])
-				ch_2 = copy.deepcopy(pop[child2Ind])
-				new_inds = toolbox.mate(ch_1, ch_2)
-				
-				# add new mutants to the mutants list
-				mutants.append(new_inds[0])
-				mutants.append(new_inds[1])
+				# crossover works on copy-on-write clones, the parents are never changed
+				pairs.append((pop[child1Ind], pop[child2Ind]))
 				'''
 				# assign fitness to new individuals
 				for new_ind in new_inds:
@@ -246,22 +313,34 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 					else:
 						non_dom += 1
 				'''
-		# assign fitnesses to all mutants in the mutants list
-		# only the output pixels are mapped back, all evaluation must be done below
-		outputs = list(toolbox.map(toolbox.evaluate, mutants))
-
-		# create tuples that can be fed into the novelty fitness assignment function
-		output_tups = [(gen, vec[0], DIST_MAT_BLACK, DIST_MAT_WHITE) for gen, vec in zip(mutants, outputs)]
-
-		# map all outputs to the genotypes with their actual fitness assigned
-		fitnesses = list(toolbox.map(toolbox.assign_fit, output_tups))
+		
+		# add new mutants to the mutants list
+		for new_inds in toolbox.mate_pairs(pairs):
+			mutants.append(new_inds[0])
+			mutants.append(new_inds[1])
 
-		org_ind = 0
-		for f,o in zip(fitnesses, outputs):
-			gen = mutants[org_ind]
+		# assign fitnesses to all mutants in the mutants list
+		# mutants are evaluated from the cached values of their parents and scored in the same step
+		results = toolbox.evaluate_score(mutants)
+		for gen, (f, phenotype) in zip(mutants, results):
 			gen.fitness.values = f
 			gen.fit_obj = f[0]
-			org_ind += 1
+			phenotypes[id(gen)] = phenotype
+		# both objectives are minimized, so the raw fitness values are offered to the archive
+		PARETO_ARCHIVE.update(fitness_matrix(mutants, False), mutants, g + 1)
+		print(PARETO_ARCHIVE)
+
+		# novelty of the mutants against each other and the archive, reported but not selected on
+		if(USE_ARCHIVE):
+			images = stack_images([phenotypes[id(gen)] for gen in mutants], NUM_X*NUM_Y)
+			novelty = NOV_ARCHIVE.score(images)
+			NOV_ARCHIVE.update(images, novelty)
+			if(g % DESCRIPTOR_REFIT_GENS == 0):
+				NOV_ARCHIVE.fit_extractor()
+			print("AVERAGE NOVELTY: " + str(np.mean(novelty)))
+			print(NOV_ARCHIVE)
+			if(DESCRIPTOR is not None):
+				print(DESCRIPTOR)
 		#total = dom_good + dom_bad + non_dom + 0.0
 		#print("Mutants dominate parents: " + str(dom_good/total))
 		#print("Parents dominate mutants: " + str(dom_bad/total))
@@ -270,18 +349,35 @@ def main(nGen, weightMutpb, nodeMutpb, conMutpb, cxPb, actMutpb, thresh, alpha,
 		# select individuals to be present in the next generation's population
 		#if(np.random.uniform() <= SELECT_PROB):
 		pop = toolbox.select(pop + mutants)
+		# only individuals that survived selection can be parents in the next generation
+		VALUE_CACHE.retain(pop)
+		phenotypes = dict((id(ind), phenotypes[id(ind)]) for ind in pop)
 		#else:
 		#	pop = toolbox.binary_select(pop + mutants)
 		# must clear the dictionary of innovation numbers for the coming generation
 		# only check to see if same innovation occurs twice in a single generation
 		gb.clearDict()
+
+		# every evaluated individual was in pop or mutants, so the mutants complete the front
+		HV_TRACKER.update(fitness_matrix(mutants, False), time.time() - gen_start)
+		print(HV_TRACKER)
+		converged = HV_TRACKER.plateaued()
 		
 		# save the population if it has reached a saving point in the evolution
-		if(g > 0 and g % NGEN_TO_SAVE == 0):
+		if(g > 0 and (g % NGEN_TO_SAVE == 0 or converged)):
 			file_name = get_file_name("/home/crwolfe/Documents/CPPN_test_env/CPPN_pop_result", "CPPN_newdistcrossent".format(str(g)))
-			save_population(pop, SEED, file_name)				
+			saved_phenotypes = None
+			if(KEEP_PHENOTYPES):
+				saved_phenotypes = stack_images([phenotypes[id(ind)] for ind in pop], NUM_X*NUM_Y)
+			save_population(pop, SEED, file_name, saved_phenotypes)				
+			PARETO_ARCHIVE.save(PARETO_FILE)
+
+		if(converged):
+			print("HYPERVOLUME PLATEAUED AFTER GENERATION " + str(g) + ", STOPPING")
+			break
 
 
+	PARETO_ARCHIVE.save(PARETO_FILE)
 
 	# return the population after it has been evolved
 	return pop
@@ -0,0 +1,77 @@
+"""Smoke test for the novelty search driver - runs FULL_CPPN_noveltyea.py for
+one generation exactly as it is run from terminal, in a temporary directory so
+the inputs, caches and archives it writes do not end up in the repository. Can
+be run with pytest or directly from terminal
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# image from the fitting_images set the run is fitted to
+TARGET_IMAGE = "heart_ex.png"
+
+# runs the driver as __main__ with the given arguments from the current directory
+RUN_SCRIPT = """
+import sys
+import runpy
+sys.path.insert(0, {repo!r})
+sys.argv = ["FULL_CPPN_noveltyea.py"] + {args!r}
+runpy.run_path({script!r}, run_name="__main__")
+"""
+
+
+def run_noveltyea(args, run_dir):
+	"""runs the novelty driver in run_dir and returns the completed process"""
+
+	script = RUN_SCRIPT.format(repo=REPO_DIR, args=args, script=os.path.join(REPO_DIR, "FULL_CPPN_noveltyea.py"))
+	return subprocess.run([sys.executable, "-c", script], cwd=run_dir, stdout=subprocess.PIPE,
+			stderr=subprocess.STDOUT, universal_newlines=True)
+
+
+def check_one_generation(extraArgs):
+	"""runs the driver for one generation, checks that it finished and returns its output"""
+
+	run_dir = tempfile.mkdtemp()
+	try:
+		# the driver reads its target from ./fitting_images
+		os.symlink(os.path.join(REPO_DIR, "fitting_images"), os.path.join(run_dir, "fitting_images"))
+		result = run_noveltyea([TARGET_IMAGE, "1", "1", "--pareto_file", "pareto.npz"] + extraArgs, run_dir)
+		assert result.returncode == 0, result.stdout
+		assert "RUNNING GENERATION 0" in result.stdout, result.stdout
+		assert "HYPERVOLUME" in result.stdout, result.stdout
+		assert os.path.isfile(os.path.join(run_dir, "pareto.npz"))
+		return result.stdout
+	finally:
+		shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def test_one_generation():
+	output = check_one_generation([])
+	assert "RAW EDGES" not in output, output
+
+
+def test_one_generation_workers():
+	# outside of scoop futures.map runs the worker tasks in this process
+	check_one_generation(["--workers"])
+
+
+def test_one_generation_verbose():
+	output = check_one_generation(["--verbose"])
+	assert "RAW EDGES" in output, output
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_one_generation, test_one_generation_workers, test_one_generation_verbose):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
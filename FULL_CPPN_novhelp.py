@@ -29,10 +29,13 @@ def get_kNN_measure(curr_vec, pop_vecs, archive_vecs, k):
 	pop_vec_dist = get_euclid_dist(curr_vec, pop_vecs)
 	if not archive_vecs.size == 0:	
 		archive_vec_dist = get_euclid_dist(curr_vec, archive_vecs)
-		# sort the distances and take the top k for average
-		all_dist = sorted(np.concatenate((pop_vec_dist, archive_vec_dist)))
+		all_dist = np.concatenate((pop_vec_dist, archive_vec_dist))
 	else:
-		all_dist = sorted(pop_vec_dist)
+		all_dist = pop_vec_dist
+
+	# partition the distances so the k smallest come first instead of sorting all of them
+	if(len(all_dist) > k):
+		all_dist = np.partition(all_dist, k - 1)[:k]
 
 	# return average of the k smallest distances
 	return (np.mean(all_dist[:k]),)
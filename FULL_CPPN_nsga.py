@@ -0,0 +1,174 @@
+"""This file contains the non-dominated sorting and crowding distance used for
+NSGA-II selection, computed with numpy on a (P x M) matrix holding the M
+objective values of each of the P individuals. Every function returns indices
+into the matrix, so the same code sorts DEAP populations and plain arrays.
+
+Domination between all pairs is found with one comparison per objective, the
+fronts are then peeled off by subtracting the rows of each front from the
+domination counts - O(M*P^2) simple array operations instead of python
+comparisons of Fitness objects
+"""
+
+import numpy as np
+
+
+def fitness_matrix(individuals, weighted=True):
+	"""Collects the fitness of every individual into a matrix
+
+	Parameters:
+	individuals -- individuals with a DEAP fitness
+	weighted -- True for the weighted values (larger is always better), False for the raw values
+
+	Returns:
+	(P x M) numpy array of fitness values
+	"""
+
+	if(len(individuals) == 0):
+		return np.zeros((0, 0))
+
+	if(weighted):
+		return np.array([ind.fitness.wvalues for ind in individuals], dtype=float)
+	return np.array([ind.fitness.values for ind in individuals], dtype=float)
+
+
+def dominance_matrix(wvalues):
+	"""returns the (P x P) boolean matrix that is True where individual i dominates
+	individual j - it is at least as good in every objective and better in one
+	"""
+
+	wvalues = np.asarray(wvalues, dtype=float)
+	no_worse = np.ones((len(wvalues), len(wvalues)), dtype=bool)
+	better = np.zeros((len(wvalues), len(wvalues)), dtype=bool)
+	for obj in range(wvalues.shape[1]):
+		col = wvalues[:, obj]
+		no_worse &= col[:, None] >= col[None, :]
+		better |= col[:, None] > col[None, :]
+
+	return no_worse & better
+
+
+def non_dominated_sort(wvalues, k=None, first_front_only=False):
+	"""Sorts individuals into pareto fronts, the first front holds every individual
+	that no other individual dominates, the second front every individual only
+	dominated by the first and so on
+
+	Parameters:
+	wvalues -- (P x M) matrix of weighted fitness values, larger is better
+	k -- sorting stops once the fronts hold at least k individuals, all are sorted if None
+	first_front_only -- True to only find the first front
+
+	Returns:
+	list of numpy arrays holding the indices of each front in increasing order
+	"""
+
+	wvalues = np.asarray(wvalues, dtype=float)
+	if(len(wvalues) == 0):
+		return []
+	if(k is None):
+		k = len(wvalues)
+
+	dominates = dominance_matrix(wvalues)
+	# number of individuals dominating each individual that are not in a front yet
+	counts = np.sum(dominates, axis=0)
+
+	fronts = []
+	num_sorted = 0
+	current = np.flatnonzero(counts == 0)
+	while(len(current) > 0):
+		fronts.append(current)
+		num_sorted += len(current)
+		if(first_front_only or num_sorted >= k):
+			break
+
+		# individuals in a front are marked below 0 so they are never found again
+		counts[current] = -1
+		counts -= np.sum(dominates[current], axis=0)
+		current = np.flatnonzero(counts == 0)
+
+	return fronts
+
+
+def crowding_distance(values):
+	"""Finds the crowding distance of every individual of a front - the sum over
+	all objectives of the distance between its two neighbours in that objective,
+	normalized by the range of the objective. The individuals at the ends of an
+	objective get an infinite distance (the same as deap.tools.emo.assignCrowdingDist)
+
+	Parameters:
+	values -- (n x M) matrix of the fitness values of the individuals in the front
+
+	Returns:
+	numpy array with the crowding distance of every individual
+	"""
+
+	values = np.asarray(values, dtype=float)
+	distances = np.zeros(len(values))
+	if(len(values) == 0):
+		return distances
+
+	num_obj = values.shape[1]
+	for obj in range(num_obj):
+		order = np.argsort(values[:, obj], kind="stable")
+		ordered = values[order, obj]
+		distances[order[0]] = np.inf
+		distances[order[-1]] = np.inf
+		if(ordered[-1] == ordered[0]):
+			continue
+		norm = num_obj*(ordered[-1] - ordered[0])
+		distances[order[1:-1]] += (ordered[2:] - ordered[:-2])/norm
+
+	return distances
+
+
+def nsga2_indices(wvalues, k, values=None):
+	"""Chooses k individuals by NSGA-II - whole fronts are taken in order and the
+	last front that does not fit is cut by decreasing crowding distance
+
+	Parameters:
+	wvalues -- (P x M) matrix of weighted fitness values, larger is better
+	k -- number of individuals to choose
+	values -- (P x M) matrix the crowding distance is found with, wvalues if None
+
+	Returns:
+	(indices of the chosen individuals, list of fronts, crowding distances of the sorted individuals)
+	"""
+
+	wvalues = np.asarray(wvalues, dtype=float)
+	if(values is None):
+		values = wvalues
+	values = np.asarray(values, dtype=float)
+
+	fronts = non_dominated_sort(wvalues, k)
+	crowding = np.zeros(len(wvalues))
+	for front in fronts:
+		crowding[front] = crowding_distance(values[front])
+	if(len(fronts) == 0):
+		return (np.zeros(0, dtype=np.int64), fronts, crowding)
+
+	chosen = np.concatenate(fronts[:-1] + [np.zeros(0, dtype=np.int64)])
+	last = fronts[-1]
+	order = np.argsort(-crowding[last], kind="stable")
+	chosen = np.concatenate((chosen, last[order[:k - len(chosen)]]))
+
+	return (chosen, fronts, crowding)
+
+
+def sel_nsga2(individuals, k):
+	"""Drop-in replacement of deap.tools.selNSGA2 for the toolbox - chooses the
+	same individuals (individuals tied in crowding distance at the cut may be
+	taken in another order) and also sets fitness.crowding_dist of every sorted individual
+
+	Parameters:
+	individuals -- individuals with a DEAP fitness
+	k -- number of individuals to choose
+
+	Returns:
+	list of the chosen individuals
+	"""
+
+	(chosen, fronts, crowding) = nsga2_indices(fitness_matrix(individuals), k, fitness_matrix(individuals, False))
+	for front in fronts:
+		for ind in front:
+			individuals[ind].fitness.crowding_dist = crowding[ind]
+
+	return [individuals[ind] for ind in chosen]
@@ -0,0 +1,76 @@
+"""Equivalence tests for the numpy NSGA-II selection - sel_nsga2 must choose the
+same individuals with the same crowding distances as deap.tools.selNSGA2 when
+no two individuals tie in an objective. Can be run with pytest or directly
+from terminal
+"""
+
+import numpy as np
+from deap import base, creator, tools
+
+from FULL_CPPN_nsga import sel_nsga2, non_dominated_sort
+
+# fitness and individual classes used to compare against deap's selection
+creator.create("FitnessNsgaTest", base.Fitness, weights=(-1.0, -1.0))
+creator.create("NsgaTestInd", list, fitness=creator.FitnessNsgaTest)
+
+
+def make_individuals(values):
+	"""returns individuals with a DEAP fitness holding each row of values, each
+	individual holds its own index so the chosen ones can be compared
+	"""
+
+	individuals = []
+	for row in values:
+		ind = creator.NsgaTestInd([len(individuals)])
+		ind.fitness.values = tuple(row)
+		individuals.append(ind)
+
+	return individuals
+
+
+def trade_off_values(size):
+	"""random objective values that trade off, so the fronts are large and the
+	last front is cut by crowding distance - continuous values have no ties
+	"""
+
+	values = np.random.uniform(size=(size, 2))
+	values[:, 1] = 1.0 - values[:, 0] + .3*values[:, 1]
+	return values
+
+
+def test_sel_nsga2_matches_deap():
+	np.random.seed(2)
+	for (size, k) in [(10, 5), (50, 20), (100, 50), (100, 99)]:
+		values = trade_off_values(size)
+		expected = tools.selNSGA2(make_individuals(values), k)
+		chosen = sel_nsga2(make_individuals(values), k)
+
+		assert sorted(ind[0] for ind in chosen) == sorted(ind[0] for ind in expected), (size, k)
+		expectedDist = dict((ind[0], ind.fitness.crowding_dist) for ind in expected)
+		for ind in chosen:
+			assert np.isclose(ind.fitness.crowding_dist, expectedDist[ind[0]]), (size, k)
+
+
+def test_fronts_match_deap():
+	np.random.seed(6)
+	values = trade_off_values(80)
+	individuals = make_individuals(values)
+	expected = tools.sortNondominated(individuals, len(individuals))
+	# the fitness matrix is weighted so larger is better, both objectives are minimized
+	fronts = non_dominated_sort(-values)
+
+	assert len(fronts) == len(expected)
+	for (front, expectedFront) in zip(fronts, expected):
+		assert sorted(front) == sorted(ind[0] for ind in expectedFront)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_sel_nsga2_matches_deap, test_fronts_match_deap):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
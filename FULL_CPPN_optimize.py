@@ -0,0 +1,187 @@
+"""This file contains the optimizer for CPPN activation plans. Genomes keep
+every disabled connection and every node that was ever added, so the
+networks that are actually run are often much larger than the function
+they compute. The optimizer rewrites a plan into a smaller plan with the
+same outputs by:
+
+	- folding connections whose value never changes (fed only by the bias)
+	  into constant starting values of the nodes they lead to
+	- merging parallel connections between the same pair of nodes
+	- removing nodes and connections that cannot reach an output
+
+disabled connections are never added to a plan, so they are stripped when
+the plan is first built
+"""
+
+import numpy as np
+
+from FULL_CPPN_act import activate_array, is_random_activation
+from FULL_CPPN_plan import ActivationPlan, build_stages
+
+# connection index given to edges that were created by merging
+NO_CONNECTION = -1
+
+
+class PlanReport():
+	"""Summary of how much smaller a plan became when it was optimized"""
+
+	def __init__(self, rawEdges, enabledEdges, rawNodes):
+		"""Constructor for the plan report
+
+		Parameters:
+		rawEdges -- number of connections in the genotype, including disabled ones
+		enabledEdges -- number of enabled connections in the unoptimized plan
+		rawNodes -- number of nodes in the genotype
+		"""
+
+		self.rawEdges = rawEdges
+		self.enabledEdges = enabledEdges
+		self.rawNodes = rawNodes
+		self.effectiveEdges = enabledEdges
+		self.effectiveNodes = rawNodes
+		self.foldedEdges = 0
+		self.mergedEdges = 0
+		self.deadEdges = 0
+
+	def __str__(self):
+		result = ""
+		result += ("RAW EDGES: " + str(self.rawEdges) + " EFFECTIVE EDGES: " + str(self.effectiveEdges) + "\n")
+		result += ("RAW NODES: " + str(self.rawNodes) + " EFFECTIVE NODES: " + str(self.effectiveNodes) + "\n")
+		result += ("DISABLED: " + str(self.rawEdges - self.enabledEdges) + " FOLDED: " + str(self.foldedEdges) +
+				" MERGED: " + str(self.mergedEdges) + " DEAD: " + str(self.deadEdges) + "\n")
+		return result
+
+
+def _fold_constants(plan, nodeKeys, nodeBias, edges, report):
+	"""removes every edge whose in node has the same value for all inputs and
+	adds its contribution to the starting value of its out node - edges must
+	be in topological order, so the value of an in node is final when reached
+	"""
+
+	biasRow = plan.numIn - 1
+	varies = np.zeros(plan.numNodes, dtype=bool)
+	varies[:biasRow] = True
+
+	kept = []
+	for (src, dst, w, c) in edges:
+		# random activations give a different value every time they are run
+		if(varies[src] or (src >= plan.numIn and is_random_activation(nodeKeys[src]))):
+			varies[dst] = True
+			kept.append((src, dst, w, c))
+		else:
+			# do not activate the inputs, only hidden/output nodes
+			if(src == biasRow):
+				signal = 1.0
+			else:
+				signal = activate_array(nodeKeys[src], np.array([nodeBias[src]]))[0]
+			nodeBias[dst] += signal*w
+			report.foldedEdges += 1
+
+	return kept
+
+
+def _merge_parallel(edges, report):
+	"""combines edges between the same pair of nodes into one edge whose
+	weight is the sum of their weights
+	"""
+
+	merged = {}
+	order = []
+	for (src, dst, w, c) in edges:
+		if((src, dst) in merged):
+			merged[(src, dst)] = (merged[(src, dst)][0] + w, NO_CONNECTION)
+			report.mergedEdges += 1
+		else:
+			merged[(src, dst)] = (w, c)
+			order.append((src, dst))
+
+	return [(src, dst, merged[(src, dst)][0], merged[(src, dst)][1]) for (src, dst) in order]
+
+
+def _remove_dead(plan, edges, report):
+	"""removes every edge that does not lead to an output node"""
+
+	live = set(plan.outRows)
+	found = True
+	while(found):
+		found = False
+		for (src, dst, w, c) in edges:
+			if(dst in live and src not in live):
+				live.add(src)
+				found = True
+
+	kept = [e for e in edges if e[1] in live]
+	report.deadEdges += len(edges) - len(kept)
+	return kept
+
+
+def _node_stages(numNodes, numIn, srcRows, dstRows):
+	"""finds the longest path from the inputs to every node, inputs are stage 0
+	and every other node is one stage past its deepest in node
+	"""
+
+	nodeStages = np.ones(numNodes, dtype=int)
+	nodeStages[:numIn] = 0
+	inCounts = np.bincount(dstRows, minlength=numNodes)
+	ready = [row for row in range(numNodes) if inCounts[row] == 0]
+	while(len(ready) > 0):
+		row = ready.pop()
+		for e in np.flatnonzero(srcRows == row):
+			dst = dstRows[e]
+			nodeStages[dst] = max(nodeStages[dst], nodeStages[row] + 1)
+			inCounts[dst] -= 1
+			if(inCounts[dst] == 0):
+				ready.append(dst)
+
+	return nodeStages
+
+
+def optimize_plan(plan):
+	"""Creates an optimized copy of an activation plan that gives the same
+	outputs with fewer nodes and edges - the optimized plan cannot be patched
+	with withWeights/withNodeKeys, it must be rebuilt from the original plan
+
+	Parameters:
+	plan -- the ActivationPlan being optimized
+
+	Returns:
+	(optimized plan, PlanReport) tuple
+	"""
+
+	report = PlanReport(plan.numCons, plan.numEdges(), plan.numNodes)
+	# plans whose level order was broken by crossover read some nodes before their
+	# final value, the passes below assume they do not so such plans are run as they are
+	if(not plan.inOrder()):
+		return (plan, report)
+	nodeKeys = np.array(plan.nodeKeys)
+	nodeBias = np.array(plan.nodeBias, dtype=float)
+	edges = list(zip(plan.srcRows, plan.dstRows, plan.weights, plan.conIndices))
+
+	edges = _fold_constants(plan, nodeKeys, nodeBias, edges, report)
+	edges = _merge_parallel(edges, report)
+	edges = _remove_dead(plan, edges, report)
+
+	# inputs and outputs keep their rows, hidden nodes still in use are packed after them
+	numFixed = plan.numIn + plan.numOut
+	rows = list(range(numFixed))
+	for (src, dst, w, c) in edges:
+		for row in (src, dst):
+			if(row >= numFixed and row not in rows):
+				rows.append(row)
+	rows[numFixed:] = sorted(rows[numFixed:])
+	newRows = dict((row, i) for i, row in enumerate(rows))
+
+	srcRows = np.array([newRows[e[0]] for e in edges], dtype=int)
+	dstRows = np.array([newRows[e[1]] for e in edges], dtype=int)
+	weights = np.array([e[2] for e in edges], dtype=float)
+	conIndices = np.array([e[3] for e in edges], dtype=int)
+	nodeStages = _node_stages(len(rows), plan.numIn, srcRows, dstRows)
+
+	order, stages = build_stages(srcRows, dstRows, nodeStages[srcRows])
+	report.effectiveEdges = len(edges)
+	report.effectiveNodes = len(rows)
+
+	optimized = ActivationPlan(plan.numIn, plan.numOut, nodeKeys[rows], nodeStages, srcRows[order],
+							dstRows[order], weights[order], conIndices[order], plan.numCons, stages,
+							nodeBias[rows])
+	return (optimized, report)
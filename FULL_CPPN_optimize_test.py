@@ -0,0 +1,62 @@
+"""Regression tests for the activation plan optimizer - the optimized plan of a
+genotype must give the same outputs as running the genotype node by node with
+getOutput, including children of crossover whose connections break the level
+order of their nodes. Can be run with pytest or directly from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_getpixels import getNormalizedInputArray
+from FULL_CPPN_testhelp import make_deterministic, make_population
+
+# the networks are compared on a small grid, getOutput runs one input row at a time
+NUM_X = 6
+NUM_Y = 6
+
+
+def same_as_get_output(genotype, inputs):
+	"""returns True if the plan and the optimized plan give the outputs of getOutput"""
+
+	expected = np.array([genotype.getOutput(list(row)) for row in inputs])
+	raw = genotype.getActivationPlan().activate(inputs)
+	optimized = genotype.getOptimizedPlan().activate(inputs)
+
+	return np.allclose(raw, expected) and np.allclose(optimized, expected)
+
+
+def test_crossover_out_of_order():
+	np.random.seed(11)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	pop = make_population(20, 10)
+
+	numOutOfOrder = 0
+	for i in range(400):
+		parent1 = pop[np.random.randint(len(pop))]
+		parent2 = pop[np.random.randint(len(pop))]
+		child = parent1.clone().crossover(parent2)
+		make_deterministic(child)
+		if(not child.getActivationPlan().inOrder()):
+			numOutOfOrder += 1
+		assert same_as_get_output(child, inputs), i
+
+	# the test is only useful if crossover actually broke the level order
+	assert numOutOfOrder > 0
+
+
+def test_mutated_networks():
+	np.random.seed(3)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	for genotype in make_population(20, 10):
+		assert same_as_get_output(genotype, inputs)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_crossover_out_of_order, test_mutated_networks):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
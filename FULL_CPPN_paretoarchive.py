@@ -0,0 +1,310 @@
+"""This file contains the external pareto archive kept during a run. Every
+generation's fitness matrix is offered to the archive, which keeps the best
+trade-offs between the two (minimized) objectives found so far, even after
+selection removed them from the population.
+
+The archive uses epsilon-box dominance (Laumanns et al.) - objective space is
+cut into boxes of size epsilon, only one entry is kept per box and an entry is
+only kept if no other box dominates its box, so the archive never holds more
+than one entry per epsilon step of an objective. The non-dominated boxes are
+kept sorted by the first objective (the second objective then decreases), so
+an insertion is a binary search plus the removal of a contiguous run of newly
+dominated boxes. If the archive still grows past its capacity epsilon is
+doubled and the entries are boxed again.
+
+Genomes are stored as the flat arrays of ArrayGenotype and the whole archive
+is saved as a single .npz file, so it can be queried after the run without
+unpickling whole populations
+"""
+
+import os
+import sys
+import bisect
+
+import numpy as np
+
+from FULL_CPPN_arraygenome import ArrayGenotype, from_genotype
+from FULL_CPPN_plan import PLAN_ALL
+
+# default size of the boxes in each objective (target distance, number of connections)
+DEFAULT_EPSILON = (1.0, 1.0)
+
+# default maximum number of entries before epsilon is doubled
+DEFAULT_CAPACITY = 1000
+
+# node and connection arrays of a stored genome
+NODE_ARRAYS = ("actKeys", "levels")
+CON_ARRAYS = ("innovations", "srcs", "dsts", "weights", "enabled")
+
+
+def genome_arrays(genotype):
+	"""returns the flat arrays of a genotype as a dictionary, Genotypes made of
+	Node and Connection objects are converted to an ArrayGenotype first
+	"""
+
+	if(not isinstance(genotype, ArrayGenotype)):
+		genotype = from_genotype(genotype)
+
+	arrays = dict((name, np.array(getattr(genotype, name))) for name in NODE_ARRAYS + CON_ARRAYS)
+	arrays["numIn"] = genotype.numIn
+	arrays["numOut"] = genotype.numOut
+
+	return arrays
+
+
+def build_genotype(arrays, cls=ArrayGenotype):
+	"""Creates a genotype from the arrays stored in the archive
+
+	Parameters:
+	arrays -- dictionary of genome arrays as returned by genome_arrays
+	cls -- class of the result, can be a deap creator class derived from ArrayGenotype
+
+	Returns:
+	the genotype, it can be evaluated and graphed like any ArrayGenotype
+	"""
+
+	genotype = cls.__new__(cls)
+	genotype.numIn = int(arrays["numIn"])
+	genotype.numOut = int(arrays["numOut"])
+	genotype.gSize = len(arrays["actKeys"])
+	genotype.fit_obj = 0
+	genotype.species = sys.maxsize
+	genotype.activation_plan = None
+	genotype.plan_dirty = set(PLAN_ALL)
+	genotype.changed_nodes = None
+	genotype.fingerprint = None
+
+	genotype.actKeys = np.array(arrays["actKeys"], dtype=int)
+	genotype.levels = np.array(arrays["levels"], dtype=np.int64)
+	genotype.innovations = np.array(arrays["innovations"], dtype=int)
+	genotype.srcs = np.array(arrays["srcs"], dtype=int)
+	genotype.dsts = np.array(arrays["dsts"], dtype=int)
+	genotype.weights = np.array(arrays["weights"], dtype=float)
+	genotype.enabled = np.array(arrays["enabled"], dtype=bool)
+
+	return genotype
+
+
+class ParetoArchive():
+	"""Bounded epsilon-box dominance archive over two minimized objectives"""
+
+	def __init__(self, epsilon=DEFAULT_EPSILON, capacity=DEFAULT_CAPACITY):
+		"""Constructor for the pareto archive
+
+		Parameters:
+		epsilon -- size of the boxes in each of the two objectives
+		capacity -- maximum number of entries, epsilon is doubled when it is exceeded
+		"""
+
+		self.epsilon = np.array(epsilon, dtype=float)
+		self.capacity = capacity
+
+		# boxes of the entries sorted by the first objective, the second one decreases
+		self.box1 = []
+		self.box2 = []
+		# (objective values, generation, genome arrays) of the entry in every box
+		self.entries = []
+
+		self.numInserted = 0
+		self.numRejected = 0
+		self.numCoarsened = 0
+
+	def _boxes(self, values):
+		"""returns the boxes (integer coordinates) of a matrix of objective values"""
+
+		return np.floor(values/self.epsilon).astype(np.int64)
+
+	def _corner_dist(self, values, box):
+		"""distance of values to the lower corner of their box, in box units"""
+
+		return np.sqrt(np.sum((values/self.epsilon - box)**2))
+
+	def _insert(self, values, box, make_entry):
+		"""Inserts one point if no other box dominates its box, removing every box it dominates
+
+		Parameters:
+		values -- objective values of the point
+		box -- box of the point
+		make_entry -- function returning the (values, generation, genome) entry, only called if the point is kept
+
+		Returns:
+		True if the point was stored
+		"""
+
+		(b1, b2) = (int(box[0]), int(box[1]))
+		pos = bisect.bisect_right(self.box1, b1)
+
+		# the box with the largest first coordinate at or below b1 has the smallest
+		# second coordinate of all of them, so it is the only one that can dominate
+		if(pos > 0 and self.box2[pos - 1] <= b2):
+			if(self.box1[pos - 1] != b1 or self.box2[pos - 1] != b2):
+				return False
+
+			# within a box the dominating point is kept, otherwise the one closer to the corner
+			old = self.entries[pos - 1][0]
+			if(np.all(old <= values) or (not np.all(values <= old) and self._corner_dist(old, box) <= self._corner_dist(values, box))):
+				return False
+			self.entries[pos - 1] = make_entry()
+			return True
+
+		# dominated boxes follow the insertion point (and may share its first coordinate)
+		start = pos - 1 if(pos > 0 and self.box1[pos - 1] == b1) else pos
+		end = start
+		while(end < len(self.box1) and self.box2[end] >= b2):
+			end += 1
+		self.box1[start:end] = [b1]
+		self.box2[start:end] = [b2]
+		self.entries[start:end] = [make_entry()]
+
+		return True
+
+	def update(self, values, individuals=None, generation=0):
+		"""Offers every point of a fitness matrix to the archive
+
+		Parameters:
+		values -- (P x 2) matrix of minimized objective values
+		individuals -- genotypes of the points, their genomes are stored with the entries that are kept
+		generation -- generation the points were found in
+
+		Returns:
+		number of points that were stored
+		"""
+
+		values = np.asarray(values, dtype=float)
+		if(len(values) == 0):
+			return 0
+		boxes = self._boxes(values)
+
+		# points whose box is dominated by a box already in the archive are dropped together
+		candidates = np.arange(len(values))
+		if(len(self.box1) > 0):
+			pos = np.searchsorted(np.array(self.box1), boxes[:, 0], side="right") - 1
+			predBox2 = np.where(pos >= 0, np.array(self.box2)[np.maximum(pos, 0)], sys.maxsize)
+			predBox1 = np.where(pos >= 0, np.array(self.box1)[np.maximum(pos, 0)], -sys.maxsize)
+			sameBox = (predBox1 == boxes[:, 0]) & (predBox2 == boxes[:, 1])
+			candidates = np.flatnonzero((predBox2 > boxes[:, 1]) | sameBox)
+
+		inserted = 0
+		for ind in candidates:
+			def make_entry():
+				genome = None if individuals is None else genome_arrays(individuals[ind])
+				return (values[ind].copy(), generation, genome)
+			inserted += self._insert(values[ind], boxes[ind], make_entry)
+
+		self.numInserted += inserted
+		self.numRejected += len(values) - inserted
+		while(len(self.entries) > self.capacity):
+			self._coarsen()
+
+		return inserted
+
+	def _coarsen(self):
+		"""doubles epsilon and boxes all entries again"""
+
+		self.epsilon = 2.0*self.epsilon
+		self.numCoarsened += 1
+		entries = self.entries
+		(self.box1, self.box2, self.entries) = ([], [], [])
+		for entry in entries:
+			self._insert(entry[0], self._boxes(entry[0]), lambda: entry)
+
+	def front(self):
+		"""returns the (n x 2) objective values of the entries, sorted by the first objective"""
+
+		if(len(self.entries) == 0):
+			return np.zeros((0, 2))
+
+		return np.array([entry[0] for entry in self.entries])
+
+	def generations(self):
+		"""returns the generation every entry was found in"""
+
+		return np.array([entry[1] for entry in self.entries], dtype=np.int64)
+
+	def genotype(self, index, cls=ArrayGenotype):
+		"""returns the genotype of an entry, or None if no genome was stored"""
+
+		genome = self.entries[index][2]
+		if(genome is None):
+			return None
+
+		return build_genotype(genome, cls)
+
+	def save(self, filepath):
+		"""Saves the archive as a single .npz file - genome arrays of all entries are
+		concatenated with offsets marking where each entry starts, so loading it
+		never needs pickle
+
+		Parameters:
+		filepath -- path of the file being written
+		"""
+
+		genomes = [entry[2] for entry in self.entries if entry[2] is not None]
+		if(len(genomes) < len(self.entries)):
+			genomes = []
+
+		arrays = {"values": self.front(), "generations": self.generations(), "epsilon": self.epsilon,
+			"capacity": np.array(self.capacity),
+			"counters": np.array([self.numInserted, self.numRejected, self.numCoarsened])}
+		if(len(genomes) > 0):
+			arrays["numIn"] = np.array([g["numIn"] for g in genomes])
+			arrays["numOut"] = np.array([g["numOut"] for g in genomes])
+			arrays["nodeOffsets"] = np.cumsum([0] + [len(g["actKeys"]) for g in genomes])
+			arrays["conOffsets"] = np.cumsum([0] + [len(g["weights"]) for g in genomes])
+			for name in NODE_ARRAYS + CON_ARRAYS:
+				arrays[name] = np.concatenate([g[name] for g in genomes])
+
+		# written to a temporary file first so a run never leaves a partial archive
+		tmp_path = "{0}.{1}.tmp.npz".format(filepath, os.getpid())
+		np.savez(tmp_path, **arrays)
+		os.replace(tmp_path, filepath)
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __str__(self):
+		result = ""
+		result += ("PARETO ARCHIVE SIZE: " + str(len(self.entries)) + " EPSILON: " + str(self.epsilon.tolist()) + "\n")
+		result += ("INSERTED: " + str(self.numInserted) + " REJECTED: " + str(self.numRejected) + " COARSENED: " + str(self.numCoarsened) + "\n")
+		return result
+
+
+def load_pareto_archive(filepath):
+	"""Loads a pareto archive saved with ParetoArchive.save
+
+	Parameters:
+	filepath -- path of the saved .npz file
+
+	Returns:
+	the ParetoArchive, genomes are views into the loaded arrays until a genotype is built
+	"""
+
+	data = np.load(filepath, allow_pickle=False)
+	archive = ParetoArchive(data["epsilon"], int(data["capacity"]))
+	(archive.numInserted, archive.numRejected, archive.numCoarsened) = [int(c) for c in data["counters"]]
+
+	values = data["values"]
+	generations = data["generations"]
+	genomes = [None]*len(values)
+	if("nodeOffsets" in data.files):
+		nodeOffsets = data["nodeOffsets"]
+		conOffsets = data["conOffsets"]
+		nodeArrays = dict((name, data[name]) for name in NODE_ARRAYS)
+		conArrays = dict((name, data[name]) for name in CON_ARRAYS)
+		numIn = data["numIn"]
+		numOut = data["numOut"]
+		for i in range(len(values)):
+			genome = {"numIn": numIn[i], "numOut": numOut[i]}
+			for name in NODE_ARRAYS:
+				genome[name] = nodeArrays[name][nodeOffsets[i]:nodeOffsets[i + 1]]
+			for name in CON_ARRAYS:
+				genome[name] = conArrays[name][conOffsets[i]:conOffsets[i + 1]]
+			genomes[i] = genome
+
+	# entries were saved in box order, so boxing them again restores the sorted boxes
+	boxes = archive._boxes(values)
+	archive.box1 = boxes[:, 0].tolist()
+	archive.box2 = boxes[:, 1].tolist()
+	archive.entries = [(values[i], int(generations[i]), genomes[i]) for i in range(len(values))]
+
+	return archive
@@ -0,0 +1,76 @@
+"""Tests for the pareto archive - genomes kept by the archive must render the
+same images as the individuals they were stored from, before and after the
+archive is saved and loaded again. Can be run with pytest or directly from
+terminal
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from FULL_CPPN_getpixels import getNormalizedInputArray
+from FULL_CPPN_paretoarchive import ParetoArchive, load_pareto_archive
+from FULL_CPPN_testhelp import make_population
+
+# the networks are compared on a small grid
+NUM_X = 6
+NUM_Y = 6
+
+
+def test_round_trip_renders_same_images():
+	np.random.seed(4)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	pop = make_population(40, 6)
+	archive = ParetoArchive(epsilon=(.05, .05), capacity=1000)
+	allValues = []
+	for generation in range(3):
+		values = np.random.uniform(size=(len(pop), 2))
+		archive.update(values, pop, generation)
+		allValues.append(values)
+
+	tmp_dir = tempfile.mkdtemp()
+	try:
+		filepath = os.path.join(tmp_dir, "pareto.npz")
+		archive.save(filepath)
+		loaded = load_pareto_archive(filepath)
+
+		assert len(loaded) == len(archive) and len(archive) > 0
+		assert np.array_equal(loaded.front(), archive.front())
+		assert np.array_equal(loaded.generations(), archive.generations())
+		for i in range(len(archive)):
+			# the stored genome renders the same image as the individual it came from
+			(generation, row) = (archive.generations()[i], archive.front()[i])
+			ind = pop[np.flatnonzero(np.all(allValues[generation] == row, axis=1))[0]]
+			expected = ind.getActivationPlan().activate(inputs)
+			assert np.allclose(archive.genotype(i).getActivationPlan().activate(inputs), expected), i
+			assert np.allclose(loaded.genotype(i).getActivationPlan().activate(inputs), expected), i
+	finally:
+		shutil.rmtree(tmp_dir)
+
+
+def test_front_is_non_dominated():
+	np.random.seed(9)
+	archive = ParetoArchive(epsilon=(.01, .01), capacity=1000)
+	allValues = np.random.uniform(size=(500, 2))
+	for values in np.split(allValues, 5):
+		archive.update(values)
+
+	# no archived point is dominated by an offered point from another box
+	for row in archive.front():
+		dominating = np.all(allValues <= row, axis=1) & np.any(allValues < row, axis=1)
+		otherBox = np.any(np.floor(allValues/.01) != np.floor(row/.01), axis=1)
+		assert not np.any(dominating & otherBox), row
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_round_trip_renders_same_images, test_front_is_non_dominated):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
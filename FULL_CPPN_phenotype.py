@@ -0,0 +1,142 @@
+"""This file contains the bit-packed representation of binary phenotypes. The
+output node of a CPPN uses the step activation, so every output image only
+holds 0s and 1s - packed with np.packbits an image takes one bit per pixel
+(704 bytes at 75x75 instead of 45 KB of float64). Packed images are used for
+sending outputs between processes, for storing them in saved populations and
+archives and for Hamming distances computed with popcounts
+"""
+
+import numpy as np
+
+from FULL_CPPN_disthelp import BLACK_THRESHOLD
+
+# number of set bits in every possible byte
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# bits of every possible byte in the order np.packbits uses (most significant first)
+BYTE_BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1)
+
+# number of rows of the first set of images compared at once in hamming_matrix
+DEFAULT_CHUNK_ROWS = 64
+
+
+def popcount(bits, axis=-1):
+	"""returns the number of set bits along an axis of a uint8 array"""
+
+	if(hasattr(np, "bitwise_count")):
+		counts = np.bitwise_count(bits)
+	else:
+		counts = POPCOUNT_TABLE[bits]
+
+	return np.sum(counts, axis=axis, dtype=np.int64)
+
+
+class PackedImages():
+	"""A set of binary images with the pixels of each image packed into the bits
+	of one row of a uint8 matrix, the padding bits at the end of a row are 0
+	"""
+
+	def __init__(self, bits, numPix):
+		"""Constructor for a set of packed images
+
+		Parameters:
+		bits -- uint8 numpy array of shape (P, ceil(numPix/8)), a single row may be given as a 1D array
+		numPix -- number of pixels in each image
+		"""
+
+		bits = np.asarray(bits, dtype=np.uint8)
+		if(bits.ndim == 1):
+			bits = bits[None, :]
+		self.bits = bits
+		self.numPix = numPix
+
+	def unpack(self):
+		"""returns the images as a (P x numPix) uint8 matrix of 0s and 1s"""
+
+		return np.unpackbits(self.bits, axis=1, count=self.numPix)
+
+	def counts(self):
+		"""returns the number of black pixels in every image"""
+
+		return popcount(self.bits)
+
+	def weighted_sum(self, weights):
+		"""Sums the weights of the black pixels of every image without unpacking -
+		a table holds the sum of the weights for every value of every byte, so each
+		image only needs one table lookup per byte
+
+		Parameters:
+		weights -- numpy array with one weight for every pixel
+
+		Returns:
+		numpy array with the sum for every image
+		"""
+
+		numBytes = self.bits.shape[1]
+		byteWeights = np.zeros(numBytes*8)
+		byteWeights[:self.numPix] = np.ravel(weights)
+		table = byteWeights.reshape(numBytes, 8).dot(BYTE_BITS.T)
+
+		return np.sum(table[np.arange(numBytes)[None, :], self.bits], axis=1)
+
+	def __getitem__(self, index):
+		return PackedImages(self.bits[index], self.numPix)
+
+	def __len__(self):
+		return len(self.bits)
+
+
+def pack_images(outputs, threshold=BLACK_THRESHOLD):
+	"""packs output images into bits, pixels at or above the threshold are set
+
+	Parameters:
+	outputs -- a single output image or (P x N) matrix of output images
+
+	Returns:
+	PackedImages holding every image
+	"""
+
+	outputs = np.asarray(outputs)
+	if(outputs.ndim == 1):
+		outputs = outputs[None, :]
+
+	return PackedImages(np.packbits(outputs >= threshold, axis=1), outputs.shape[1])
+
+
+def pack_target(pixels):
+	"""packs binary target pixels, pixels with the value 1 are set"""
+
+	return PackedImages(np.packbits(np.ravel(pixels) == 1), np.size(pixels))
+
+
+def stack_images(rows, numPix):
+	"""stacks packed rows (such as the compact phenotypes of single individuals) into PackedImages"""
+
+	if(len(rows) == 0):
+		return PackedImages(np.zeros((0, (numPix + 7)//8), dtype=np.uint8), numPix)
+
+	return PackedImages(np.vstack(rows), numPix)
+
+
+def hamming_matrix(images1, images2=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+	"""Finds the number of differing pixels between every pair of images with the
+	popcount of their xor, a block of rows is compared at once to bound memory
+
+	Parameters:
+	images1 -- PackedImages of the first set
+	images2 -- PackedImages of the second set, images1 is compared with itself if None
+	chunk_rows -- number of rows of images1 compared at once
+
+	Returns:
+	(len(images1) x len(images2)) numpy array of Hamming distances
+	"""
+
+	if(images2 is None):
+		images2 = images1
+
+	result = np.empty((len(images1), len(images2)), dtype=np.int64)
+	for start in range(0, len(images1), chunk_rows):
+		block = images1.bits[start:start + chunk_rows]
+		result[start:start + len(block)] = popcount(block[:, None, :] ^ images2.bits[None, :, :])
+
+	return result
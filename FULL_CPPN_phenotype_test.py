@@ -0,0 +1,72 @@
+"""Tests for the bit-packed phenotypes - every metric computed from packed
+images must give the value the dense version of the same metric gives for
+the thresholded outputs, and hamming_matrix must count the differing pixels
+of the unpacked images. Can be run with pytest or directly from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_phenotype import pack_images, hamming_matrix
+from FULL_CPPN_metrics import thresholded_distance, material_l1, cross_entropy, iou, chamfer
+from FULL_CPPN_disthelp import get_dist_mat, BLACK_THRESHOLD
+
+# not a multiple of 8, so the padding bits of the packed rows are used
+NUM_X = 9
+NUM_Y = 7
+POP_SIZE = 30
+
+
+def make_outputs(rng):
+	"""returns outputs between 0 and 1 with a few images that are all white or all
+	black, the thresholded binary outputs and a random binary target
+	"""
+
+	outputs = rng.uniform(size=(POP_SIZE, NUM_X*NUM_Y))
+	outputs[0] = 0.0
+	outputs[1] = 1.0
+	binary = (outputs >= BLACK_THRESHOLD).astype(float)
+	pixels = (rng.uniform(size=NUM_X*NUM_Y) < .4).astype(int)
+	return (outputs, binary, pixels)
+
+
+def test_metrics_match_dense():
+	rng = np.random.RandomState(2)
+	(outputs, binary, pixels) = make_outputs(rng)
+	packed = pack_images(outputs)
+	px = np.reshape(pixels, (NUM_X, NUM_Y))
+	(dist_black, dist_white) = (get_dist_mat(px, 1), get_dist_mat(px, 0))
+	spec_len = rng.randint(1, 5, size=POP_SIZE)
+
+	# metrics that threshold their outputs give the same values for the raw outputs
+	assert np.allclose(thresholded_distance(packed, dist_black, dist_white), thresholded_distance(outputs, dist_black, dist_white))
+	assert np.allclose(iou(packed, pixels), iou(outputs, pixels))
+	assert np.allclose(chamfer(packed, pixels, dist_black, (NUM_X, NUM_Y)), chamfer(outputs, pixels, dist_black, (NUM_X, NUM_Y)))
+
+	# the others use output values, so packing is the same as thresholding the outputs
+	assert np.allclose(material_l1(packed, pixels, spec_len, .1, 2.0), material_l1(binary, pixels, spec_len, .1, 2.0))
+	assert np.allclose(cross_entropy(packed, pixels), cross_entropy(binary, pixels))
+	assert np.all(np.isfinite(cross_entropy(packed, pixels)))
+
+
+def test_hamming_matrix_matches_dense():
+	rng = np.random.RandomState(3)
+	(outputs, binary, pixels) = make_outputs(rng)
+	others = (rng.uniform(size=(7, NUM_X*NUM_Y)) < .5).astype(float)
+	expected = np.sum(binary[:, None, :] != others[None, :, :], axis=2)
+
+	for chunk_rows in (1, 4, POP_SIZE):
+		assert np.array_equal(hamming_matrix(pack_images(outputs), pack_images(others), chunk_rows), expected)
+	selfDist = hamming_matrix(pack_images(outputs))
+	assert np.array_equal(selfDist, np.sum(binary[:, None, :] != binary[None, :, :], axis=2))
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_metrics_match_dense, test_hamming_matrix_matches_dense):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -0,0 +1,335 @@
+"""This file contains the activation plan for the CPPN genotype. The plan
+is a flattened, read-only version of the network that stores the enabled
+connections in topological order as flat numpy arrays of node indices and
+weights, so the network can be run without sorting or traversing the
+Node and Connection objects every time it is activated
+"""
+
+import numpy as np
+
+from FULL_CPPN_act import activate_group
+
+# names of the parts of a plan that can become out of date when a genotype is mutated
+PLAN_TOPOLOGY = "topology"
+PLAN_WEIGHTS = "weights"
+PLAN_ACTIVATIONS = "activations"
+PLAN_ALL = frozenset([PLAN_TOPOLOGY, PLAN_WEIGHTS, PLAN_ACTIVATIONS])
+
+
+def _read_only(arr):
+	"""makes a numpy array read only so the plan it belongs to
+	cannot be changed after it is built
+	"""
+
+	arr.flags.writeable = False
+	return arr
+
+
+class ActivationPlan():
+	"""Immutable activation order for a single genotype - rows of every
+	array refer to positions in the genotype's node list and each edge
+	refers to an enabled connection in the genotype's connection list.
+	Edges are grouped into stages by the depth of their in node, every
+	node in a stage is final once the stage is reached so all of them
+	are activated together
+	"""
+
+	def __init__(self, numIn, numOut, nodeKeys, nodeStages, srcRows, dstRows, weights, conIndices, numCons, stages, nodeBias=None, levelOrder=None):
+		"""Constructor for the activation plan
+
+		Parameters:
+		numIn -- number of input nodes, including the bias
+		numOut -- number of output nodes, stored directly after the inputs
+		nodeKeys -- activation key of every node
+		nodeStages -- depth of every node, inputs have depth 0
+		srcRows/dstRows -- node rows of the in and out node of every enabled connection
+		weights -- weight of every enabled connection
+		conIndices -- index of every edge's connection within the genotype
+		numCons -- total number of connections the plan was built from
+		stages -- stage information created by build_stages
+		nodeBias -- constant starting value of every node, all 0 if not given
+		levelOrder -- positions of the edges in the level order getOutput runs them in,
+				the edges are already in that order if not given
+		"""
+
+		self.numIn = numIn
+		self.numOut = numOut
+		self.numNodes = len(nodeKeys)
+		self.numCons = numCons
+		self.nodeKeys = _read_only(np.array(nodeKeys, dtype=int))
+		self.nodeStages = _read_only(np.array(nodeStages, dtype=int))
+		self.srcRows = _read_only(np.array(srcRows, dtype=int))
+		self.dstRows = _read_only(np.array(dstRows, dtype=int))
+		self.weights = _read_only(np.array(weights, dtype=float))
+		self.conIndices = _read_only(np.array(conIndices, dtype=int))
+		self.stages = stages
+		self.outRows = _read_only(np.arange(numIn, numIn + numOut))
+		if(nodeBias is None):
+			nodeBias = np.zeros(self.numNodes)
+		self.nodeBias = _read_only(np.array(nodeBias, dtype=float))
+		if(levelOrder is None):
+			levelOrder = np.arange(len(self.srcRows))
+		self.levelOrder = _read_only(np.array(levelOrder, dtype=int))
+		# (connection, in row, out row) of the edges in level order, made the first time it is needed
+		self.level_edges = None
+
+	def numEdges(self):
+		return len(self.srcRows)
+
+	def edgeStages(self):
+		"""returns the stage of every edge, 0 for the stage leaving the inputs and
+		increasing with every later stage
+		"""
+
+		result = np.zeros(self.numEdges(), dtype=int)
+		for i, (start, end, stageRows, srcPos, rounds, activate) in enumerate(self.stages):
+			result[start:end] = i + 1 if activate else 0
+		return result
+
+	def levelEdges(self):
+		"""returns a list of (connection index, in node row, out node row) of every
+		edge in level order - the order getOutput runs the connections in one at a time
+		"""
+
+		if(self.level_edges is None):
+			order = self.levelOrder
+			self.level_edges = list(zip(self.conIndices[order].tolist(), self.srcRows[order].tolist(), self.dstRows[order].tolist()))
+		return self.level_edges
+
+	def inOrder(self):
+		"""checks that every node receives all of its edges in an earlier stage than
+		the one its own edges are run in, so every node is only read at its final
+		value - crossover can bring in connections that break the level order and
+		in such plans a node can be read before all of its edges are added
+		"""
+
+		edgeStages = self.edgeStages()
+		lastIn = np.full(self.numNodes, -1)
+		np.maximum.at(lastIn, self.dstRows, edgeStages)
+		firstOut = np.full(self.numNodes, len(self.stages) + 1)
+		np.minimum.at(firstOut, self.srcRows, edgeStages)
+		return bool(np.all(lastIn < firstOut))
+
+	def matches(self, nodes, connections):
+		"""checks that the plan was built from node and connection lists of
+		the same size as the ones given - catches lists that were replaced
+		or appended to without going through the genotype's mutation methods
+		"""
+
+		return self.numNodes == len(nodes) and self.numCons == len(connections)
+
+	def withWeights(self, connections):
+		"""creates a new plan with the same topology but with the weights
+		re-read from the given connection list
+		"""
+
+		return self.withWeightValues([connections[c].getWeight() for c in self.conIndices])
+
+	def withWeightValues(self, weights):
+		"""creates a new plan with the same topology and the given edge weights"""
+
+		return ActivationPlan(self.numIn, self.numOut, self.nodeKeys, self.nodeStages, self.srcRows,
+						self.dstRows, weights, self.conIndices, self.numCons, self.stages, self.nodeBias, self.levelOrder)
+
+	def withNodeKeys(self, nodes):
+		"""creates a new plan with the same topology but with the activation
+		keys re-read from the given node list
+		"""
+
+		return self.withNodeKeyValues([n.getActKey() for n in nodes])
+
+	def withNodeKeyValues(self, nodeKeys):
+		"""creates a new plan with the same topology and the given activation keys"""
+
+		return ActivationPlan(self.numIn, self.numOut, nodeKeys, self.nodeStages, self.srcRows,
+						self.dstRows, self.weights, self.conIndices, self.numCons, self.stages, self.nodeBias, self.levelOrder)
+
+	def activate(self, inputs):
+		"""runs the plan over a matrix of inputs with one row per activation
+
+		Parameters:
+		inputs -- numpy array of shape (N, numIn - 1), bias excluded
+
+		Returns:
+		numpy array of shape (N, numOut) of network outputs
+		"""
+
+		return self.outputsFrom(self.nodeValues(inputs))
+
+	def nodeValues(self, inputs):
+		"""runs the plan and returns the value of every node before activation,
+		shape (numNodes, N) - used to keep the values of a network for later
+		"""
+
+		values = np.repeat(self.nodeBias[:, None], inputs.shape[0], axis=1)
+		# set values of input nodes and bias node
+		values[:self.numIn - 1] = inputs.T
+		values[self.numIn - 1] = 1
+
+		run_stages(self.stages, values, self.nodeKeys, self.srcRows, self.dstRows, self.weights)
+
+		return values
+
+	def outputsFrom(self, values):
+		"""activates the output rows of a matrix of node values, returns (N, numOut)"""
+
+		return activate_group(self.nodeKeys[self.outRows], values[self.outRows]).T
+
+
+def build_stages(srcRows, dstRows, srcStages):
+	"""groups edges into stages by the stage of their in node, then splits each
+	stage into rounds in which no two edges share an out node so that every
+	round can be added into the node values with a single numpy operation
+
+	Parameters:
+	srcRows/dstRows -- numpy arrays with node rows of the in and out node of every edge
+	srcStages -- numpy array with the stage of the in node of every edge
+
+	Returns:
+	(order, stages) where order is the permutation that sorts the edges by stage
+	and round, and stages is a tuple of (start, end, stageRows, srcPos, rounds, activate)
+	for every stage - edges start:end leave the nodes in stageRows, srcPos gives
+	each edge's position within stageRows and rounds holds the (start, end) of each round
+	"""
+
+	# round of an edge is the number of earlier edges in its stage with the same out node
+	rounds = np.zeros(len(srcRows), dtype=int)
+	counts = {}
+	for e in range(len(srcRows)):
+		key = (srcStages[e], dstRows[e])
+		rounds[e] = counts.get(key, 0)
+		counts[key] = rounds[e] + 1
+	order = np.lexsort((rounds, srcStages))
+	srcRows = srcRows[order]
+	srcStages = srcStages[order]
+	rounds = rounds[order]
+
+	stages = []
+	start = 0
+	while(start < len(srcRows)):
+		end = start
+		while(end < len(srcRows) and srcStages[end] == srcStages[start]):
+			end += 1
+		stageRows, srcPos = np.unique(srcRows[start:end], return_inverse=True)
+		roundBounds = []
+		roundStart = start
+		while(roundStart < end):
+			roundEnd = roundStart
+			while(roundEnd < end and rounds[roundEnd] == rounds[roundStart]):
+				roundEnd += 1
+			roundBounds.append((roundStart, roundEnd))
+			roundStart = roundEnd
+		stages.append((start, end, _read_only(stageRows), _read_only(srcPos.reshape(-1)),
+					tuple(roundBounds), srcStages[start] > 0))
+		start = end
+
+	return (order, tuple(stages))
+
+
+def run_stages(stages, values, nodeKeys, srcRows, dstRows, weights):
+	"""propagates node values through every stage of a plan, values is
+	updated in place and must already hold the values of the input nodes
+
+	Parameters:
+	stages -- stage information created by build_stages
+	values -- 2D numpy array with one row of values per node
+	nodeKeys -- activation key of every node row
+	srcRows/dstRows/weights -- edge arrays ordered the same way as the stages
+	"""
+
+	for (start, end, stageRows, srcPos, rounds, activate) in stages:
+		# do not activate the inputs, only hidden/output nodes
+		if(activate):
+			signals = activate_group(nodeKeys[stageRows], values[stageRows])[srcPos]
+		else:
+			signals = values[srcRows[start:end]]
+		# FORMULA: nodeOut.val += activation(nodeIn.val)*weight
+		contributions = signals*weights[start:end, None]
+		for (roundStart, roundEnd) in rounds:
+			values[dstRows[roundStart:roundEnd]] += contributions[roundStart - start:roundEnd - start]
+
+
+def build_plan(genotype):
+	"""builds a new activation plan from the nodes and connections of a genotype,
+	connections are ordered by the level of their in node so every node receives
+	all of its inputs before its value is passed on, then grouped into stages by
+	the longest path from the inputs to their in node
+
+	Parameters:
+	genotype -- the CPPN genotype the plan is being built for
+	"""
+
+	nodes = genotype.nodes
+	connections = genotype.connections
+
+	# every node gets a row in the plan, found by its node number
+	nodeRows = {}
+	for row in range(len(nodes)):
+		nodeRows[nodes[row].getNodeNum()] = row
+
+	srcRows = [nodeRows[c.getNodeIn().getNodeNum()] for c in connections]
+	dstRows = [nodeRows[c.getNodeOut().getNodeNum()] for c in connections]
+	return build_plan_arrays(genotype.numIn, genotype.numOut, [n.getActKey() for n in nodes],
+					[n.getNodeLayer() for n in nodes], srcRows, dstRows,
+					[c.getWeight() for c in connections], [c.getStatus() for c in connections])
+
+
+def _edge_stages(numIn, numNodes, srcRows, dstRows):
+	"""Finds the stage of every edge so running the stages gives the same values as
+	running the edges one at a time in level order (as getOutput does). An edge
+	reads its in node after every earlier edge into that node was added, and adds
+	into its out node no earlier than the stage of any earlier edge that read it.
+	With edges in level order this is the longest path from the inputs to the in
+	node, edges from crossover that break the level order are delayed instead
+
+	Returns:
+	numpy array with the stage of every edge, edges leaving the inputs are stage 0
+	"""
+
+	edgeStages = np.zeros(len(srcRows), dtype=int)
+	lastWrite = np.full(numNodes, -1)
+	lastRead = np.zeros(numNodes, dtype=int)
+	for (e, (src, dst)) in enumerate(zip(srcRows.tolist(), dstRows.tolist())):
+		# inputs are never activated so only their edges are in stage 0
+		stage = max(lastWrite[src] + 1, lastRead[dst], 0 if src < numIn else 1)
+		edgeStages[e] = stage
+		lastRead[src] = max(lastRead[src], stage)
+		lastWrite[dst] = max(lastWrite[dst], stage)
+
+	return edgeStages
+
+
+def build_plan_arrays(numIn, numOut, nodeKeys, nodeLevels, srcRows, dstRows, weights, enabled):
+	"""builds an activation plan from a genome stored as flat arrays, every
+	connection is given by the rows of its in/out node within the node arrays
+
+	Parameters:
+	numIn/numOut -- number of input (including bias) and output nodes
+	nodeKeys/nodeLevels -- activation key and level of every node
+	srcRows/dstRows/weights/enabled -- in node row, out node row, weight and status of every connection
+	"""
+
+	nodeLevels = np.asarray(nodeLevels)
+	srcRows = np.asarray(srcRows, dtype=int)
+	dstRows = np.asarray(dstRows, dtype=int)
+
+	# integer levels of the nodes give a topological order of the connections
+	order = np.argsort(nodeLevels[srcRows], kind="stable")
+	conIndices = order[np.asarray(enabled, dtype=bool)[order]]
+	srcRows = srcRows[conIndices]
+	dstRows = dstRows[conIndices]
+
+	edgeStages = _edge_stages(numIn, len(nodeKeys), srcRows, dstRows)
+	# inputs are stage 0, every other node is one stage past the last edge into it
+	nodeStages = np.ones(len(nodeKeys), dtype=int)
+	nodeStages[:numIn] = 0
+	np.maximum.at(nodeStages, dstRows, edgeStages + 1)
+
+	order, stages = build_stages(srcRows, dstRows, edgeStages)
+	conIndices = conIndices[order]
+	# edges are stored in stage order, levelOrder finds each edge's position from its level order
+	levelOrder = np.empty(len(order), dtype=int)
+	levelOrder[order] = np.arange(len(order))
+	return ActivationPlan(numIn, numOut, nodeKeys, nodeStages, srcRows[order], dstRows[order],
+					np.asarray(weights, dtype=float)[conIndices], conIndices, len(weights), stages,
+					levelOrder=levelOrder)
@@ -19,6 +19,7 @@ import time
 
 from FULL_CPPN_getpixels import getNormalizedInputs
 from FULL_CPPN_struct import Genotype
+from FULL_CPPN_plan import PLAN_WEIGHTS
 from FULL_CPPN_constants import NODE_TO_COLOR, CLOSENESS_THRESHOLD, PATCH_LIST
 
 # sets the time between updates when sweeping through weights in seconds
@@ -105,10 +106,7 @@ class MainPage(tk.Frame):
 		graph_genotype_GUI(genotype, subp_2)
 		# get outputs for current genotype
 		norm_in = getNormalizedInputs(num_x, num_y)
-		outputs = []
-		for ins in norm_in:
-			outputs.append(genotype.getOutput(ins)[0])
-		outputs_np = np.array(outputs, copy=True)
+		outputs_np = genotype.getOutputBatch(np.array(norm_in))[:, 0]
 		subp_1.imshow(np.reshape(outputs_np, (num_x, num_y)), cmap='Greys')
 
 		# create canvas for GUI
@@ -150,10 +148,7 @@ class SliderPage(tk.Frame):
 		graph_genotype_GUI(genotype, self.subp_2)
 		# get outputs for current genotype
 		norm_in = getNormalizedInputs(num_x, num_y)
-		outputs = []
-		for ins in norm_in:
-			outputs.append(genotype.getOutput(ins)[0])
-		outputs_np = np.array(outputs, copy=True)
+		outputs_np = genotype.getOutputBatch(np.array(norm_in))[:, 0]
 		self.subp_1.imshow(np.reshape(outputs_np, (num_x, num_y)), cmap='Greys')
 
 		# create canvas for GUI
@@ -202,16 +197,14 @@ class SliderPage(tk.Frame):
 			for con in genotype.connections:
 				if(con.getInnovationNumber() == innov_num_int):
 					con.setWeight(self.scale_dict[innov_num].get())
+		genotype.invalidatePlan(PLAN_WEIGHTS)
 
 		# replot the CPPN with new weights
 		# both subplots must be cleared to replace them with new ones
 		self.subp_1.clear()
 		self.subp_2.clear()
 
-		outputs = []
-		for ins in norm_in:
-			outputs.append(genotype.getOutput(ins)[0])
-		outputs_np = np.array(outputs, copy=True)
+		outputs_np = genotype.getOutputBatch(np.array(norm_in))[:, 0]
 		self.subp_1.imshow(np.reshape(outputs_np, (num_x, num_y)), cmap='Greys')
 
 		graph_genotype_GUI(genotype, self.subp_2)
@@ -250,15 +243,13 @@ def sweep_CPPN(genotype, E1, subp_1, subp_2, norm_in, canvas):
 	sweep_weight = 10
 	while(sweep_weight > -10):
 		genotype.connections[con_ind].setWeight(sweep_weight)
+		genotype.invalidatePlan(PLAN_WEIGHTS)
 		# clear both subplots so new graphs can be placed into the GUI
 		subp_1.clear()
 		subp_2.clear()
 
 		# create graphs again and put graphs onto them
-		outputs = []
-		for ins in norm_in:
-			outputs.append(genotype.getOutput(ins)[0])
-		outputs_np = np.array(outputs, copy=True)
+		outputs_np = genotype.getOutputBatch(np.array(norm_in))[:, 0]
 		subp_1.imshow(np.reshape(outputs_np, (num_x, num_y)), cmap='Greys')
 
 		graph_genotype_GUI(genotype, subp_2)
@@ -270,15 +261,13 @@ def sweep_CPPN(genotype, E1, subp_1, subp_2, norm_in, canvas):
 
 	# reset the graphs to their old state with the original weight
 	genotype.connections[con_ind].setWeight(old_weight)
+	genotype.invalidatePlan(PLAN_WEIGHTS)
 	# clear both subplots so new graphs can be placed into the GUI
 	subp_1.clear()
 	subp_2.clear()
 
 	# create graphs again and put graphs onto them
-	outputs = []
-	for ins in norm_in:
-		outputs.append(genotype.getOutput(ins)[0])
-	outputs_np = np.array(outputs, copy=True)
+	outputs_np = genotype.getOutputBatch(np.array(norm_in))[:, 0]
 	subp_1.imshow(np.reshape(outputs_np, (num_x, num_y)), cmap='Greys')
 
 	graph_genotype_GUI(genotype, subp_2)
@@ -306,16 +295,14 @@ def update_CPPN(genotype, E1, E2, subp_1, subp_2, norm_in, num_x, num_y, canvas)
 		for con in genotype.connections:
 			if(con.getInnovationNumber() == int(innov_num)):
 				con.setWeight(float(new_weight))
+	genotype.invalidatePlan(PLAN_WEIGHTS)
 
 	# clear both subplots so new graphs can be placed into the GUI
 	subp_1.clear()
 	subp_2.clear()
 
 	# create graphs again and put graphs onto them
-	outputs = []
-	for ins in norm_in:
-		outputs.append(genotype.getOutput(ins)[0])
-	outputs_np = np.array(outputs, copy=True)
+	outputs_np = genotype.getOutputBatch(np.array(norm_in))[:, 0]
 	subp_1.imshow(np.reshape(outputs_np, (num_x, num_y)), cmap='Greys')
 
 	graph_genotype_GUI(genotype, subp_2)
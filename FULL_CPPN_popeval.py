@@ -0,0 +1,100 @@
+"""This file contains the population level evaluation engine for CPPN.
+Instead of running every genotype separately, the activation plans of a
+whole block of genotypes are packed into one large block-diagonal network
+with all node rows and edges stored in shared numpy arrays. The packed
+network is then run stage by stage, so each stage of every individual is
+done in a few large numpy operations within a single process
+"""
+
+import numpy as np
+
+from FULL_CPPN_act import activate_group
+from FULL_CPPN_plan import build_stages, run_stages
+
+# number of genotypes packed together at once, bounds the memory used
+# for node values to block size * nodes per genotype * number of inputs
+DEFAULT_BLOCK_SIZE = 50
+
+
+class BlockPlan():
+	"""Activation plan for several genotypes packed together - every genotype's
+	nodes are shifted by an offset so no two genotypes share a node row and edges
+	from all genotypes are grouped together by the stage of their in node
+	"""
+
+	def __init__(self, plans):
+		"""Constructor for the packed plan
+
+		Parameters:
+		plans -- list of ActivationPlan objects, all with the same number of inputs/outputs
+		"""
+
+		self.numPlans = len(plans)
+		self.numIn = plans[0].numIn
+		self.numOut = plans[0].numOut
+
+		offsets = np.cumsum([0] + [p.numNodes for p in plans])
+		self.numNodes = offsets[-1]
+		self.nodeKeys = np.concatenate([p.nodeKeys for p in plans])
+		self.nodeBias = np.concatenate([p.nodeBias for p in plans])
+
+		# rows of the inputs, bias and outputs for every genotype, shape (numPlans, count)
+		self.inRows = offsets[:-1, None] + np.arange(self.numIn - 1)[None, :]
+		self.biasRows = offsets[:-1] + self.numIn - 1
+		self.outRows = offsets[:-1, None] + np.arange(self.numIn, self.numIn + self.numOut)[None, :]
+
+		srcRows = np.concatenate([p.srcRows + off for p, off in zip(plans, offsets)])
+		dstRows = np.concatenate([p.dstRows + off for p, off in zip(plans, offsets)])
+		weights = np.concatenate([p.weights for p in plans])
+		srcStages = np.concatenate([p.edgeStages() for p in plans])
+
+		# edges of all genotypes are regrouped into shared stages
+		order, self.stages = build_stages(srcRows, dstRows, srcStages)
+		self.srcRows = srcRows[order]
+		self.dstRows = dstRows[order]
+		self.weights = weights[order]
+
+	def activate(self, inputs):
+		"""runs every packed genotype over the same matrix of inputs
+
+		Parameters:
+		inputs -- numpy array of shape (N, numIn - 1), bias excluded
+
+		Returns:
+		numpy array of shape (numPlans, N, numOut) of network outputs
+		"""
+
+		values = np.repeat(self.nodeBias[:, None], inputs.shape[0], axis=1)
+		# every genotype receives the same inputs
+		for i in range(self.numIn - 1):
+			values[self.inRows[:, i]] = inputs[:, i]
+		values[self.biasRows] = 1
+
+		run_stages(self.stages, values, self.nodeKeys, self.srcRows, self.dstRows, self.weights)
+
+		outRows = self.outRows.reshape(-1)
+		outputs = activate_group(self.nodeKeys[outRows], values[outRows])
+		return np.transpose(outputs.reshape(self.numPlans, self.numOut, -1), (0, 2, 1))
+
+
+def evaluate_population(pop, inputs, block_size=DEFAULT_BLOCK_SIZE):
+	"""Evaluates a whole list of genotypes over a shared matrix of inputs,
+	genotypes are packed into blocks of at most block_size so that memory
+	stays bounded for large populations
+
+	Parameters:
+	pop -- list of Genotype objects with the same number of inputs and outputs
+	inputs -- numpy array of shape (N, numIn - 1) such as the normalized inputs
+	block_size -- the maximum number of genotypes packed together at once
+
+	Returns:
+	numpy array of shape (len(pop), N, numOut) with the outputs of every genotype
+	"""
+
+	inputs = np.asarray(inputs, dtype=float)
+	results = []
+	for start in range(0, len(pop), block_size):
+		plans = [ind.getOptimizedPlan() for ind in pop[start:start + block_size]]
+		results.append(BlockPlan(plans).activate(inputs))
+
+	return np.concatenate(results)
@@ -0,0 +1,57 @@
+"""Tests for the population evaluation engine - packing genotypes into one
+block plan must give every genotype the outputs it gets on its own with
+getOutput, whatever block it is packed into, including children of
+crossover whose connections break the level order of their nodes. Can be
+run with pytest or directly from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_popeval import BlockPlan, evaluate_population
+from FULL_CPPN_getpixels import getNormalizedInputArray
+from FULL_CPPN_testhelp import make_deterministic, make_population
+
+NUM_X = 5
+NUM_Y = 5
+
+
+def make_mixed_population():
+	"""returns mutated genotypes followed by crossover children, some of them out of order"""
+
+	pop = make_population(20, 10)
+	children = []
+	for i in range(40):
+		parent1 = pop[np.random.randint(len(pop))]
+		parent2 = pop[np.random.randint(len(pop))]
+		child = parent1.clone().crossover(parent2)
+		make_deterministic(child)
+		children.append(child)
+	# the test is only useful if crossover actually broke the level order
+	assert any(not child.getActivationPlan().inOrder() for child in children)
+
+	return pop + children
+
+
+def test_population_matches_get_output():
+	np.random.seed(11)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	pop = make_mixed_population()
+	expected = np.array([[genotype.getOutput(list(row)) for row in inputs] for genotype in pop])
+
+	for block_size in (1, 7, len(pop)):
+		assert np.allclose(evaluate_population(pop, inputs, block_size), expected), block_size
+	# unoptimized plans are packed the same way
+	plans = [genotype.getActivationPlan() for genotype in pop]
+	assert np.allclose(BlockPlan(plans).activate(inputs), expected)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_population_matches_get_output,):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
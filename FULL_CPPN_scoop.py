@@ -6,7 +6,7 @@ from scoop import futures
 import numpy as np
 import sys
 
-from FULL_CPPN_act import stepAct, sigAct, reluAct, sinAct, gaussAct, logAct, tanhAct, squareAct, absAct
+from FULL_CPPN_act import activate_scalar
 from FULL_CPPN_struct import Genotype
 
 
@@ -24,9 +24,8 @@ def activate_CPPN_scoop(input_tup):
 	if(not(len(inputs) == (genotype.numIn - 1))):
 			print("The length of the list of inputs does not match the number of desired inputs.")
 	else:
-		#if(not genotype.cons_sorted):
-		genotype.connections = sorted(genotype.connections, key=lambda x: x.nIn.layer)
-		#	genotype.cons_sorted = True
+		# cached plan stores the topological order of the enabled connections
+		plan = genotype.getActivationPlan()
 		# must clear all node values before running the network
 		for node in genotype.nodes:
 			node.value = 0
@@ -38,15 +37,17 @@ def activate_CPPN_scoop(input_tup):
 		# set value of bias node
 		genotype.nodes[genotype.numIn - 1].value = 1
 			
-		# activate network by going through sorted connection list and querying all connections
-		for c in range(len(genotype.connections)):
-			if(genotype.connections[c].status):
-				# do not activate the inputs, only hidden/output nodes
-				if genotype.connections[c].nIn.layer > 0:		
-					# FORMULA: nodeOut.val += activation(nodeIn.val)*weight
-					genotype.connections[c].nOut.value = (genotype.connections[c].nOut.value + (activate_scoop(genotype.connections[c].nIn)*genotype.connections[c].weight))
-				else:
-					genotype.connections[c].nOut.value = (genotype.connections[c].nOut.value + (genotype.connections[c].nIn.value*genotype.connections[c].weight))
+		# activate network by going through enabled connections in the same level order as
+		# getOutput, nodes are found by their row in the plan, connections may refer to shared copies
+		for (c, src, dst) in plan.levelEdges():
+			nIn = genotype.nodes[src]
+			nOut = genotype.nodes[dst]
+			# do not activate the inputs, only hidden/output nodes
+			if nIn.layer > 0:		
+				# FORMULA: nodeOut.val += activation(nodeIn.val)*weight
+				nOut.value = (nOut.value + (activate_scoop(nIn)*genotype.connections[c].weight))
+			else:
+				nOut.value = (nOut.value + (nIn.value*genotype.connections[c].weight))
 			
 		# put all output values in a single list and return
 		# put all output values in a single list and return
@@ -72,26 +73,8 @@ def activate_scoop(node):
 	activated
 	"""
 
-	val = node.value
-	if(node.actKey == 0):
-		val = stepAct(val)
-	elif(node.actKey == 1):
-		val = sigAct(val)
-	elif(node.actKey == 2):
-		val = reluAct(val)
-	elif(node.actKey == 3):
-		val = sinAct(val)
-	elif(node.actKey == 4):
-		val = gaussAct(val)
-	elif(node.actKey == 5):
-		val = logAct(val)
-	elif(node.actKey == 6):
-		val = tanhAct(val)
-	elif(node.actKey == 7):
-		val = squareAct(val)
-	elif(node.actKey == 8):
-		val = absAct(val)
-	return val
+	# activation function is looked up in the registry by its key
+	return activate_scalar(node.actKey, node.value)
 
 if __name__ == "__main__":
 	x = Genotype(2,1)
@@ -0,0 +1,216 @@
+"""This file contains the speciation engine for NEAT style evolution of CPPNs.
+Species keep the same ID for as long as they survive, so stagnation can be
+tracked per species instead of per position in a list of species that
+changes every generation. Each species caches the gene arrays of its
+representative and all unassigned individuals are compared against all
+representatives with one vectorized distance call
+"""
+
+import sys
+
+import numpy as np
+
+from FULL_CPPN_genedist import gene_distance_matrix
+
+# number of individuals compared against the representatives in one parallel task
+DEFAULT_CHUNK_SIZE = 64
+
+
+def _distance_chunk(args):
+	"""computes one block of distances, module level so it can be sent to other processes"""
+
+	(genes, repGenes, theta1, theta2, theta3) = args
+	return gene_distance_matrix(genes, repGenes, theta1, theta2, theta3)
+
+
+def assign_species(genes, repGenes, thresh, theta1, theta2, theta3, map_func=None, chunk_size=DEFAULT_CHUNK_SIZE):
+	"""Assigns individuals to the first representative they are within the
+	threshold of - individuals that match no representative found new species
+	in order, exactly as if every individual was compared one at a time
+
+	Parameters:
+	genes -- list of (sorted innovations, weights) gene arrays of the individuals being assigned
+	repGenes -- list of gene arrays of the current representatives
+	thresh -- maximum distance between an individual and the representative of its species
+	theta1,2,3 -- weights used for calculating distance
+	map_func -- optional map function (such as futures.map) used to compute distances in parallel
+	chunk_size -- number of individuals in each parallel task
+
+	Returns:
+	(assignments, newReps) - assignments[i] is the index of the species of individual i,
+	species past the given representatives are new and newReps holds the index of
+	the individual that represents each of them
+	"""
+
+	assignments = np.full(len(genes), -1, dtype=int)
+	if(len(genes) == 0):
+		return (assignments, [])
+
+	# every individual is compared against every representative at once
+	if(len(repGenes) > 0):
+		if(map_func is None):
+			distances = gene_distance_matrix(genes, repGenes, theta1, theta2, theta3)
+		else:
+			chunks = [(genes[i:i + chunk_size], repGenes, theta1, theta2, theta3) for i in range(0, len(genes), chunk_size)]
+			distances = np.vstack(list(map_func(_distance_chunk, chunks)))
+		close = distances <= thresh
+		found = np.any(close, axis=1)
+		assignments[found] = np.argmax(close[found], axis=1)
+
+	# individuals matching no representative found new species, the first one left
+	# becomes a representative and takes every later individual within the threshold
+	newReps = []
+	remaining = np.flatnonzero(assignments < 0)
+	while(len(remaining) > 0):
+		rep = remaining[0]
+		assignments[rep] = len(repGenes) + len(newReps)
+		newReps.append(rep)
+		others = remaining[1:]
+		if(len(others) > 0):
+			distances = gene_distance_matrix([genes[i] for i in others], [genes[rep]], theta1, theta2, theta3)[:, 0]
+			assignments[others[distances <= thresh]] = assignments[rep]
+		remaining = np.flatnonzero(assignments < 0)
+
+	return (assignments, newReps)
+
+
+class Species():
+	"""A species of the population with a persistent ID"""
+
+	def __init__(self, speciesId, representative):
+		"""Constructor for a species
+
+		Parameters:
+		speciesId -- ID of the species, never reused by another species
+		representative -- genotype new individuals are compared against
+		"""
+
+		self.id = speciesId
+		self.members = []
+		self.setRepresentative(representative)
+
+		# fitness tracking used to find species that stopped improving
+		self.lastFitness = None
+		self.stagnantGens = 0
+
+	def setRepresentative(self, representative):
+		# gene arrays are kept so the representative is never converted again
+		self.representative = representative
+		self.repGenes = representative.getGeneArrays()
+
+	def recordFitness(self, avgFitness, stagnationThreshold):
+		"""Updates the stagnation counter with the average fitness of the species
+		in the current generation - the counter grows while the fitness stays
+		within stagnationThreshold of the fitness of the first generation the
+		species was recorded in
+
+		Returns:
+		the number of generations the species has been stagnant
+		"""
+
+		if(self.lastFitness is None):
+			self.lastFitness = avgFitness
+		elif(avgFitness/self.lastFitness <= stagnationThreshold):
+			self.stagnantGens += 1
+		else:
+			# reset stagnation counter is a species improves enough to be above the threshold
+			self.stagnantGens = 0
+
+		return self.stagnantGens
+
+	def __len__(self):
+		return len(self.members)
+
+
+class SpeciesSet():
+	"""Keeps the species of a population from one generation to the next -
+	individuals whose species attribute holds the ID of a living species
+	(the elites chosen by getFittest) become its new representative, all
+	others are assigned with assign_species
+	"""
+
+	def __init__(self, thresh, theta1, theta2, theta3, map_func=None):
+		"""Constructor for the species set
+
+		Parameters:
+		thresh -- speciation threshold, may be changed between generations
+		theta1,2,3 -- weights used for calculating distance
+		map_func -- optional map function used to assign individuals in parallel
+		"""
+
+		self.thresh = thresh
+		self.thetas = (theta1, theta2, theta3)
+		self.map_func = map_func
+		self.species = {}
+		self.nextId = 0
+
+	def speciate(self, pop):
+		"""Separates a population into species
+
+		Returns:
+		list of living Species in order of their IDs
+		"""
+
+		for spec in self.species.values():
+			spec.members = []
+
+		# elites carried over from the last generation keep their species
+		unassigned = []
+		for ind in pop:
+			spec = self.species.get(ind.species)
+			if(spec is not None and len(spec.members) == 0):
+				spec.setRepresentative(ind)
+				spec.members.append(ind)
+			else:
+				unassigned.append(ind)
+
+		ordered = [self.species[key] for key in sorted(self.species.keys())]
+		(assignments, newReps) = assign_species([ind.getGeneArrays() for ind in unassigned],
+								[spec.repGenes for spec in ordered], self.thresh, *self.thetas,
+								map_func=self.map_func)
+
+		for rep in newReps:
+			spec = Species(self.nextId, unassigned[rep])
+			self.species[spec.id] = spec
+			ordered.append(spec)
+			self.nextId += 1
+		for (ind, specInd) in zip(unassigned, assignments):
+			ordered[specInd].members.append(ind)
+
+		# species left without members die out, their IDs are never reused
+		for spec in ordered:
+			if(len(spec.members) == 0):
+				del self.species[spec.id]
+			else:
+				for ind in spec.members:
+					ind.species = spec.id
+
+		return [spec for spec in ordered if len(spec.members) > 0]
+
+	def getFittest(self):
+		"""finds the fittest organism in each species, same as getFittestFromSpecies
+		but the elites are marked with the ID of their species
+
+		Returns:
+		(partialPop, newPop) tuple of the elites and the whole population with species reset
+		"""
+
+		partialPop = []
+		newPop = []
+		for key in sorted(self.species.keys()):
+			spec = self.species[key]
+			fittest = None
+			for org in spec.members:
+				org.species = sys.maxsize
+				newPop.append(org)
+				if(fittest is None or fittest.getFitness() < org.getFitness()):
+					fittest = org
+			# the elite goes directly into the next population and keeps its species
+			fittest = fittest.clone()
+			fittest.species = spec.id
+			partialPop.append(fittest)
+
+		return (partialPop, newPop)
+
+	def __len__(self):
+		return len(self.species)
@@ -0,0 +1,84 @@
+"""Equivalence tests for the speciation engine - assigning a whole population
+to species at once must give the same species as comparing every individual
+with the representatives one at a time, and species must count stagnant
+generations the same way the drivers' LAST_FITNESS lists did. Can be run with pytest or directly
+from terminal
+"""
+
+import numpy as np
+
+from FULL_CPPN_species import Species, assign_species
+from FULL_CPPN_genedist import gene_distance
+from FULL_CPPN_testhelp import make_population
+
+
+def assign_one_at_a_time(genes, repGenes, thresh, theta1, theta2, theta3):
+	"""reference speciation - every individual joins the first species whose
+	representative is within the threshold, or founds a new species
+	"""
+
+	reps = list(repGenes)
+	assignments = []
+	newReps = []
+	for i, (innovs, weights) in enumerate(genes):
+		species = -1
+		for s, (repInnovs, repWeights) in enumerate(reps):
+			if(gene_distance(innovs, weights, repInnovs, repWeights, theta1, theta2, theta3) <= thresh):
+				species = s
+				break
+		if(species < 0):
+			species = len(reps)
+			reps.append((innovs, weights))
+			newReps.append(i)
+		assignments.append(species)
+
+	return (assignments, newReps)
+
+
+def test_assign_species_batched():
+	np.random.seed(8)
+	pop = make_population(60, 6)
+	genes = [ind.getGeneArrays() for ind in pop]
+	(theta1, theta2, theta3) = (1.0, 1.0, .4)
+	# thresholds range from almost one species per individual to a single species
+	for thresh in (.5, 1.0, 1.5, 3.0):
+		for numReps in (0, 3):
+			repGenes = genes[:numReps]
+			(expected, expectedReps) = assign_one_at_a_time(genes[numReps:], repGenes, thresh, theta1, theta2, theta3)
+			for map_func in (None, map):
+				(assignments, newReps) = assign_species(genes[numReps:], repGenes, thresh, theta1, theta2, theta3, map_func, 7)
+				assert list(assignments) == expected, (thresh, numReps)
+				assert list(newReps) == expectedReps, (thresh, numReps)
+
+
+def test_record_fitness_matches_last_fitness_lists():
+	np.random.seed(9)
+	pop = make_population(1, 0)
+	threshold = 1.05
+	fitnesses = np.random.uniform(1, 2, 40)
+	spec = Species(0, pop[0])
+	(lastFitness, stagnantGens) = ([], [])
+	for fit in fitnesses:
+		# baseline bookkeeping from the drivers, for a single species
+		if(len(lastFitness) > 0):
+			if(fit/lastFitness[0] <= threshold):
+				stagnantGens[0] += 1
+			else:
+				stagnantGens[0] = 0
+		else:
+			lastFitness.append(fit)
+			stagnantGens.append(0)
+		assert spec.recordFitness(fit, threshold) == stagnantGens[0], fit
+	assert spec.lastFitness == fitnesses[0]
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_assign_species_batched, test_record_fitness_matches_last_fitness_lists):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -13,6 +13,10 @@ import matplotlib.pyplot as plt
 
 from FULL_CPPN_node import Node
 from FULL_CPPN_con import Connection
+from FULL_CPPN_act import num_activations
+from FULL_CPPN_plan import build_plan, PLAN_TOPOLOGY, PLAN_WEIGHTS, PLAN_ACTIVATIONS, PLAN_ALL
+from FULL_CPPN_optimize import optimize_plan
+from FULL_CPPN_genedist import align_genes, gene_distance, gene_fingerprint
 from FULL_CPPN_constants import NODE_TO_COLOR, CLOSENESS_THRESHOLD, PATCH_LIST
 
 
@@ -25,6 +29,10 @@ class Genotype():
 	DEF_NUMIN = 2
 	DEF_NUMOUT = 1
 
+	# attributes that only cache values derived from the genes, they are not
+	# pickled with the genotype and are rebuilt the first time they are needed
+	CACHE_ATTRIBUTES = ("activation_plan", "optimized_plan", "innovation_arrays", "fingerprint", "connection_pairs", "value_key")
+
 	'''
 	Constructor for the genotype class, initializes genotype object and builds initial, simple network
 	@param numIn the number of inputs into the network (excluding bias)
@@ -40,8 +48,17 @@ class Genotype():
 		self.connections = []
 		self.fit_obj = 0
 
-		# use to track if connections list is sorted
-		self.cons_sorted = False
+		# activation plan is built lazily the first time the network is run
+		# plan_dirty tracks which parts of the plan mutations have made out of date
+		self.activation_plan = None
+		self.plan_dirty = set(PLAN_ALL)
+
+		# node numbers whose value changed since the genotype was last evaluated,
+		# None if the change is unknown and the network must be fully re-evaluated
+		self.changed_nodes = None
+
+		# fingerprint of the connection genes, computed when first needed
+		self.fingerprint = None
 
 		# sepcies instance variable used to track species in a population
 		# assigned in the speciation method based on distance to other members of a species 
@@ -49,7 +66,7 @@ class Genotype():
 
 		# create input nodes
 		for i in range(self.numIn):
-			self.nodes.append(Node(i,0,0,np.random.choice([0,1,2,3,4,5,6,7,8])))
+			self.nodes.append(Node(i,0,0,np.random.choice(num_activations())))
 
 		# create output nodes, output nodes always have step function
 		for i in range(self.numOut):
@@ -75,6 +92,9 @@ class Genotype():
 	def getNodes(self):
 		return self.nodes
 
+	def getNodeNumbers(self):
+		return np.array([n.getNodeNum() for n in self.nodes])
+
 	def getConnections(self):
 		return self.connections
 
@@ -85,21 +105,83 @@ class Genotype():
 	def setFitness(self, newFit):
 		self.fitness = newFit
 
+	def invalidatePlan(self, part=PLAN_TOPOLOGY, changedNodes=None):
+		"""marks part of the activation plan as out of date so it is
+		updated the next time the network is run - must be called if
+		nodes or connections are changed directly instead of through
+		the mutation methods of this class
+
+		Parameters:
+		part -- PLAN_TOPOLOGY, PLAN_WEIGHTS or PLAN_ACTIVATIONS
+		changedNodes -- numbers of the nodes whose values are affected by the change,
+		None if unknown or if nodes were added/removed
+		"""
+
+		if(not hasattr(self, "plan_dirty")):
+			self.plan_dirty = set(PLAN_ALL)
+		self.plan_dirty.add(part)
+
+		# the fingerprint only covers connection genes, activations do not change it
+		if(part != PLAN_ACTIVATIONS):
+			self.fingerprint = None
+
+		# track changed nodes so only the part of the network below them is re-evaluated
+		if(changedNodes is None):
+			self.changed_nodes = None
+		elif(getattr(self, "changed_nodes", None) is not None):
+			self.changed_nodes.update(changedNodes)
+
+	def getActivationPlan(self):
+		"""returns the activation plan for the current state of the genotype,
+		only the parts of the plan that were invalidated are rebuilt - weight
+		and activation changes patch the existing plan without re-sorting
+		"""
+
+		plan = getattr(self, "activation_plan", None)
+		dirty = getattr(self, "plan_dirty", PLAN_ALL)
+		if(plan is None or PLAN_TOPOLOGY in dirty or not plan.matches(self.nodes, self.connections)):
+			plan = build_plan(self)
+		else:
+			if(PLAN_WEIGHTS in dirty):
+				plan = plan.withWeights(self.connections)
+			if(PLAN_ACTIVATIONS in dirty):
+				plan = plan.withNodeKeys(self.nodes)
+		self.activation_plan = plan
+		self.plan_dirty = set()
+		return plan
+
+	def getOptimizedPlan(self):
+		"""returns an optimized version of the activation plan with constant,
+		dead and parallel parts of the network removed - it is only
+		rebuilt when the activation plan itself changes
+		"""
+
+		plan = self.getActivationPlan()
+		optimized = getattr(self, "optimized_plan", None)
+		if(optimized is None or optimized[0] is not plan):
+			optimized = (plan,) + optimize_plan(plan)
+			self.optimized_plan = optimized
+		return optimized[1]
+
+	def getPlanReport(self):
+		"""returns the PlanReport comparing raw and effective network size"""
+
+		self.getOptimizedPlan()
+		return self.optimized_plan[2]
+
 
 	'''
 	method to run the CPPN and get output of the network
 	@param inputs inputs into the network
 	@return output of the network with given inputs
 	pre: len(inputs) == self.numIn - 1
-	pre: connections must be sorted in topological order!!!
 	'''
 	def getOutput(self, inputs):
 		if(not(len(inputs) == (self.numIn - 1))):
 			print("The length of the list of inputs does not match the number of desired inputs.")
 		else:
-			if(not self.cons_sorted):
-				self.sort_cons()
-				self.cons_sorted = True
+			# the activation plan stores the topological order of all enabled connections
+			plan = self.getActivationPlan()
 			# must clear all node values before running the network
 			self.clearAllValues()
 
@@ -110,15 +192,17 @@ class Genotype():
 			# set value of bias node
 			self.nodes[self.numIn - 1].setNodeValue(1)
 			
-			# activate network by going through sorted connection list and querying all connections
-			for c in range(len(self.connections)):
-				if(self.connections[c].getStatus()):
-					# do not activate the inputs, only hidden/output nodes
-					if self.connections[c].getNodeIn().getNodeLayer() > 0:		
-						# FORMULA: nodeOut.val += activation(nodeIn.val)*weight
-						self.connections[c].getNodeOut().setNodeValue(self.connections[c].getNodeOut().getNodeValue() + (self.connections[c].getNodeIn().activate()*self.connections[c].getWeight()))
-					else:
-						self.connections[c].getNodeOut().setNodeValue(self.connections[c].getNodeOut().getNodeValue() + (self.connections[c].getNodeIn().getNodeValue()*self.connections[c].getWeight()))
+			# activate network by going through enabled connections in the level order stored by the
+			# plan, nodes are found by their row in the plan, connections may refer to shared copies
+			for (c, src, dst) in plan.levelEdges():
+				nodeIn = self.nodes[src]
+				nodeOut = self.nodes[dst]
+				# do not activate the inputs, only hidden/output nodes
+				if nodeIn.getNodeLayer() > 0:		
+					# FORMULA: nodeOut.val += activation(nodeIn.val)*weight
+					nodeOut.setNodeValue(nodeOut.getNodeValue() + (nodeIn.activate()*self.connections[c].getWeight()))
+				else:
+					nodeOut.setNodeValue(nodeOut.getNodeValue() + (nodeIn.getNodeValue()*self.connections[c].getWeight()))
 			
 			# put all output values in a single list and return
 			outputs = [] 
@@ -134,13 +218,27 @@ class Genotype():
 			
 			return outputs
 
-	def sort_cons(self):
-		"""method to sort all of the connections in the CPPNs list
-		of connections -- make sure cons are only sorted when this needs to be done
+	def getOutputBatch(self, inputs):
+		"""method to run the CPPN over an entire matrix of inputs at once
+		instead of activating the network separately for every input - each
+		connection carries a numpy array containing a value for every row
+		of inputs, so the network is only traversed a single time
+
+		Parameters:
+		inputs -- numpy array of shape (N, numIn) containing one set of inputs
+		per row (bias is excluded, same as getOutput)
+
+		Returns:
+		numpy array of shape (N, numOut) containing the outputs for each row
 		"""
 
-		sorted_cons = sorted(self.connections, key=lambda x: x.getNodeIn().getNodeLayer())
-		self.connections = sorted_cons
+		inputs = np.asarray(inputs, dtype=float)
+		if(inputs.ndim != 2 or not(inputs.shape[1] == (self.numIn - 1))):
+			print("The shape of the input matrix does not match the number of desired inputs.")
+			return None
+
+		# the optimized plan holds the useful connections in topological order as flat arrays
+		return self.getOptimizedPlan().activate(inputs)
 
 	'''
 	helper method for getOutput
@@ -170,15 +268,16 @@ class Genotype():
 			conInd += 1
 
 		# deactivate old connection and insert new node 
-		connect = self.connections[conInd % len(self.connections)]
+		connect = self.ownConnection(conInd % len(self.connections))
 		connect.setStatus(False)
 		oldInnov = connect.getInnovationNumber()
-		oldOut = connect.getNodeOut()
-		oldIn = connect.getNodeIn()
+		# nodes are looked up in the node list, the connection may still refer to shared copies
+		oldOut = self.nodes[connect.getNodeOut().getNodeNum()]
+		oldIn = self.nodes[connect.getNodeIn().getNodeNum()]
 
-		# layer of new node halfway between two parent nodes
-		newLayer = oldIn.getNodeLayer() + ((oldOut.getNodeLayer() - oldIn.getNodeLayer()) / 2)
-		self.nodes.append(Node(self.size(), 0, newLayer, np.random.choice([0,1,2,3,4,5,6,7,8])))
+		# layer of new node is one level below its in node, nodes below it are pushed down if needed
+		newLayer = oldIn.getNodeLayer() + 1
+		self.nodes.append(Node(self.size(), 0, newLayer, np.random.choice(num_activations())))
 		self.gSize += 1
 
 		# check current innovationMap to determine innovation numbers of two new connections
@@ -202,9 +301,12 @@ class Genotype():
 		# add connections for new node, first one has original weight and second has weight of 1
 		self.connections.append(Connection(oldIn, self.nodes[self.size() - 1], 1, innovation1))
 		self.connections.append(Connection(self.nodes[self.size() - 1], oldOut, connect.getWeight(), innovation2))
+		self.addConnectionPair(self.connections[-2])
+		self.addConnectionPair(self.connections[-1])
+		self.raiseLevels(self.nodes[self.size() - 1])
 
-		# cons must be sorted now because some new cons were added
-		self.cons_sorted = False
+		# a node and new cons were added, plan topology must be rebuilt
+		self.invalidatePlan(PLAN_TOPOLOGY)
 
 		#species number already set to default when fittest individuals retrieved from species
 		return (innovationMap, globalInnovation)
@@ -244,8 +346,11 @@ class Genotype():
 			# set weight equal to something completely new
 			c.setWeight(np.random.uniform(-1,1))
 		'''
-		for c in self.connections:
+		changed = []
+		for conInd in range(len(self.connections)):
 			if(np.random.uniform() <= mut_prob):
+				c = self.ownConnection(conInd)
+				changed.append(c.getNodeOut().getNodeNum())
 				if(rand <= normal_change):
 					# mutate weights based on a normal distribution around old weight
 					c.setWeight(np.random.normal(c.weight, variance))
@@ -255,6 +360,8 @@ class Genotype():
 				else:
 					# set weight equal to something completely new
 					c.setWeight(np.random.uniform(-1,1))
+		# only the weights of the plan are out of date, topology is unchanged
+		self.invalidatePlan(PLAN_WEIGHTS, changed)
 		
 
 	'''
@@ -272,7 +379,9 @@ class Genotype():
 				foundPossible = True
 			else:
 				index = np.random.randint(0,len(self.nodes) - 1)
-		self.nodes[index].setActKey(np.random.choice([0,1,2,3,4,5,6,7,8]))
+		self.ownNode(index).setActKey(np.random.choice(num_activations()))
+		# only the activation keys of the plan are out of date
+		self.invalidatePlan(PLAN_ACTIVATIONS, [self.nodes[index].getNodeNum()])
 
 	'''
 	connection mutate method for the CPPN structure
@@ -288,6 +397,7 @@ class Genotype():
 		maxTries = 20
 		newWeight = np.random.uniform(-0.5,0.5)
 		connect = None
+		changed = []
 		# only allow network to attempt to form connections a certain number of times - prevents infinite loop
 		while(not foundGoodConnection and tryCount < maxTries):
 			# choose two random indexes for in and out nodes of connection such that in < out
@@ -299,11 +409,13 @@ class Genotype():
 			if(self.validConnection(connect)):
 				foundGoodConnection = True
 				self.connections.append(connect)
+				self.addConnectionPair(connect)
 				globalInnovation += 1
+				changed.append(connect.getNodeOut().getNodeNum())
 			tryCount += 1
 
-		# cons must be sorted now because a new connection was added
-		self.cons_sorted = False
+		# a new connection was added, plan topology must be rebuilt
+		self.invalidatePlan(PLAN_TOPOLOGY, changed)
 
 		return globalInnovation
 
@@ -315,59 +427,117 @@ class Genotype():
 
 		# pick a random connection and switch its connection status to false
 		index = np.random.randint(0,len(self.connections))
-		self.connections[index].setStatus(not self.connections[index].getStatus())
+		self.ownConnection(index).setStatus(not self.connections[index].getStatus())
+		# set of enabled connections changed, plan topology must be rebuilt
+		self.invalidatePlan(PLAN_TOPOLOGY, [self.connections[index].getNodeOut().getNodeNum()])
 	
 
 	'''
 	method to check is a given connection is valid
 	connection considered valid if it nodeIn has a layer less than nodeOut
 	and if the connection is not already present in connection list
+	layers are integer levels with every connection going to a higher level,
+	so a connection going upwards in level can never create a cycle
 	@param otherCon the connection that is being checked for validity
 	@return true if connection is valid and false otherwise
 	'''
 	def validConnection(self, otherCon):
-		valid = True
-		for c in self.connections:
-			if c == otherCon:
-				valid = False
+		pair = (otherCon.getNodeIn().getNodeNum(), otherCon.getNodeOut().getNodeNum())
+		valid = pair not in self.getConnectionPairs()
 		# check that connection is going upwards in layer
 		if(otherCon.getNodeIn().getNodeLayer() >= otherCon.getNodeOut().getNodeLayer()):
 			valid = False
 		return valid
 
+	def getConnectionPairs(self):
+		"""returns the set of (in node number, out node number) pairs of all
+		connections, rebuilt only if the connection list was changed directly
+		"""
+
+		pairs = getattr(self, "connection_pairs", None)
+		if(pairs is None or pairs[0] != len(self.connections)):
+			pairs = (len(self.connections), set((c.getNodeIn().getNodeNum(), c.getNodeOut().getNodeNum()) for c in self.connections))
+			self.connection_pairs = pairs
+		return pairs[1]
+
+	def addConnectionPair(self, con):
+		"""adds the pair of a connection that was just appended to the connection list"""
+
+		pairs = self.getConnectionPairs()
+		if(self.connection_pairs[0] == len(self.connections) - 1):
+			pairs.add((con.getNodeIn().getNodeNum(), con.getNodeOut().getNodeNum()))
+			self.connection_pairs = (len(self.connections), pairs)
+
+	def raiseLevels(self, node):
+		"""pushes every hidden node below node down to a level past its in nodes,
+		only nodes whose level is too low are changed - all connections are used,
+		including disabled ones, so re-enabling a connection never creates a cycle
+
+		Parameters:
+		node -- the node whose level was just set
+		"""
+
+		nodeRows = dict((n.getNodeNum(), row) for row, n in enumerate(self.nodes))
+		changed = [node]
+		while(len(changed) > 0):
+			inNode = self.nodes[nodeRows[changed.pop().getNodeNum()]]
+			for c in self.connections:
+				if(c.getNodeIn().getNodeNum() == inNode.getNodeNum()):
+					outRow = nodeRows[c.getNodeOut().getNodeNum()]
+					outNode = self.nodes[outRow]
+					# output nodes are always on the last level, no level can be deeper
+					# than the number of nodes unless connections form a cycle
+					if(outNode.getNodeLayer() != sys.maxsize and outNode.getNodeLayer() <= inNode.getNodeLayer()
+							and inNode.getNodeLayer() < len(self.nodes)):
+						outNode = self.ownNode(outRow)
+						outNode.setNodeLayer(inNode.getNodeLayer() + 1)
+						changed.append(outNode)
+
+	def relevel(self):
+		"""recomputes the level of every hidden node from scratch as the longest
+		path from the inputs - used for genotypes saved with fractional layers
+		"""
+
+		for row in range(self.numIn + self.numOut, len(self.nodes)):
+			self.ownNode(row).setNodeLayer(1)
+		for n in self.nodes[:self.numIn]:
+			self.raiseLevels(n)
+		for n in self.nodes[self.numIn + self.numOut:]:
+			self.raiseLevels(n)
+		self.invalidatePlan(PLAN_TOPOLOGY)
+
+	def hasFloatLayers(self):
+		"""returns True if any hidden node still has a fractional layer from
+		before levels were integers, such genotypes must be releveled
+		"""
+
+		return any(isinstance(n.getNodeLayer(), float) for n in self.nodes[self.numIn + self.numOut:])
+
 	'''
 	crossover function for two Genotypes 
 	takes all genes from fitter parent and adds to new individual
 	then takes genes that are same between two parents and chooses randomly between them
 	@param other the Genotype that is being crossed over with the calling genotype
-	@param pointcxpb probability that genes with similar innov num will be swapped for each iteration
+	@param draws optional uniform random numbers, one per matching gene, used to decide swaps
 	@return a new individual that is the retult of crossover
 	MAKE 3 DIFFERENT CROSSOVERS - gaussian and average!!!!
 	'''
-	def crossover(self, other):
+	def crossover(self, other, draws=None):
 		# keep disjoint genes from more fit parent
-		child = None
-		parent = None
-		if(self.getFitness() > other.getFitness()):
-			child = self.getCopy()
-			parent = other.getCopy()
-		else:
-			child = other.getCopy()
-			parent = self.getCopy()
-		# traverse connection, crossover those with same innov number
-		for childInd in range(len(child.connections)):
-			for parInd in range(len(parent.connections)):
-				if(child.connections[childInd].getInnovationNumber() == parent.connections[parInd].getInnovationNumber()):
-					# swap genes if random number below pointcxpb
-					swap = np.random.uniform()
-					if(swap <= .5):
-						# TAKE WEIGHT HERE NOT THE CONNECTION
-						child.connections[childInd] = parent.connections[parInd].getCopy()
+		(child, parent) = self._sortedParents(other)
+		# matching genes are found by merging the innovation numbers of both parents
+		(childInds, parInds) = child._matchingGenes(parent)
+		# swap genes if random number below pointcxpb
+		if(draws is None):
+			draws = np.random.uniform(size=len(childInds))
+		swap = draws[:len(childInds)] <= .5
+		for (childInd, parInd) in zip(childInds[swap], parInds[swap]):
+			# TAKE WEIGHT HERE NOT THE CONNECTION
+			# the connection stays shared, it is copied if it is ever mutated
+			child.connections[childInd] = parent.connections[parInd]
 		
-		# a different connection was added, cons must be sorted again
-		child.cons_sorted = False
-		self.cons_sorted = False
-		parent.cons_sorted = False
+		# different connection objects were added, child topology must be rebuilt
+		child.invalidatePlan(PLAN_TOPOLOGY)
 
 		return child
 
@@ -377,38 +547,29 @@ class Genotype():
 	takes all genes from fitter parent and adds to new individual
 	then takes genes that are same between two parents and chooses randomly between them
 	@param other the Genotype that is being crossed over with the calling genotype
-	@param pointcxpb probability that genes with similar innov num will be swapped for each iteration
+	@param draws optional uniform random numbers, one per matching gene, used to decide swaps
 	@return a tuple containing the two newly crossed over individuals
 	MAKE 3 DIFFERENT CROSSOVERS - gaussian and average!!!!
 	'''
-	def crossoverReturnBoth(self, other):
+	def crossoverReturnBoth(self, other, draws=None):
 		# keep disjoint genes from more fit parent
 		SWAP_PB = .5
-		child = None
-		parent = None
-		if(self.getFitness() > other.getFitness()):
-			child = self.getCopy()
-			parent = other.getCopy()
-		else:
-			child = other.getCopy()
-			parent = self.getCopy()
-		betterInd = child.getCopy() # return crossover over individual and the original fitter individual
-		# traverse connection, crossover those with same innov number
-		for childInd in range(len(child.connections)):
-			for parInd in range(len(parent.connections)):
-				if(child.connections[childInd].getInnovationNumber() == parent.connections[parInd].getInnovationNumber()):
-					# swap genes if random number below pointcxpb
-					swap = np.random.uniform()
-					if(swap <= SWAP_PB):
-						# swap the connections between the two individuals
-						tmp = child.connections[childInd].getWeight()
-						child.connections[childInd].setWeight(parent.connections[parInd].getWeight())
-						parent.connections[parInd].setWeight(tmp)
-
-		# a different connection was added, cons must be sorted again
-		child.cons_sorted = False
-		self.cons_sorted = False
-		parent.cons_sorted = False
+		(child, parent) = self._sortedParents(other)
+		betterInd = child.clone() # return crossover over individual and the original fitter individual
+		(childInds, parInds) = child._matchingGenes(parent)
+		# swap genes if random number below pointcxpb
+		if(draws is None):
+			draws = np.random.uniform(size=len(childInds))
+		swap = draws[:len(childInds)] <= SWAP_PB
+		for (childInd, parInd) in zip(childInds[swap], parInds[swap]):
+			# swap the connections between the two individuals
+			tmp = child.connections[childInd].getWeight()
+			child.ownConnection(childInd).setWeight(parent.connections[parInd].getWeight())
+			parent.ownConnection(parInd).setWeight(tmp)
+
+		# only weights were swapped, topology of both individuals is unchanged
+		child.invalidatePlan(PLAN_WEIGHTS)
+		parent.invalidatePlan(PLAN_WEIGHTS)
 		
 		return (child, betterInd)
 
@@ -418,39 +579,62 @@ class Genotype():
 	same as the one above, exept instead of switching the weights,
 	the average of the weights is found and this is what's used for the child's weight
 	@param other the other individuals with which this genome is being crossed over
+	@param draws optional uniform random numbers, one per matching gene, used to decide swaps
 	@return individual that has been crossed over with other and the better individual of the two
 	(child, betterInd)
 	'''
-	def crossoverAvg(self, other):
+	def crossoverAvg(self, other, draws=None):
 		# find more fit parent and this will serve as beginning for new child
 		SWAP_PB = .5
-		child = None
-		parent = None
-		if(self.getFitness() > other.getFitness()):
-			child = self.getCopy()
-			parent = other.getCopy()
-		else:
-			child = other.getCopy()
-			parent = self.getCopy()
-		betterInd = child.getCopy() # return crossover over individual and the original fitter individual
-		# traverse connection, crossover those with same innov number
-		for childInd in range(len(child.connections)):
-			for parInd in range(len(parent.connections)):
-				if(child.connections[childInd].getInnovationNumber() == parent.connections[parInd].getInnovationNumber()):
-					# swap genes if random number below pointcxpb
-					swap = np.random.uniform()
-					if(swap <= SWAP_PB):
-						# find the average of two weights and set this equal to weight for the child
-						newWeight = (child.connections[childInd].getWeight() + parent.connections[parInd].getWeight())/2
-						child.connections[childInd].setWeight(newWeight)
+		(child, parent) = self._sortedParents(other)
+		betterInd = child.clone() # return crossover over individual and the original fitter individual
+		(childInds, parInds) = child._matchingGenes(parent)
+		# swap genes if random number below pointcxpb
+		if(draws is None):
+			draws = np.random.uniform(size=len(childInds))
+		swap = draws[:len(childInds)] <= SWAP_PB
+		for (childInd, parInd) in zip(childInds[swap], parInds[swap]):
+			# find the average of two weights and set this equal to weight for the child
+			newWeight = (child.connections[childInd].getWeight() + parent.connections[parInd].getWeight())/2
+			child.ownConnection(childInd).setWeight(newWeight)
 		
-		# a different connection was added, cons must be sorted again
-		child.cons_sorted = False
-		self.cons_sorted = False
-		parent.cons_sorted = False
+		# only weights were averaged, topology of the child is unchanged
+		child.invalidatePlan(PLAN_WEIGHTS)
 
 		return (child, betterInd)
 
+	def _sortedParents(self, other):
+		"""returns clones of (fitter, other) genotype"""
+
+		if(self.getFitness() > other.getFitness()):
+			return (self.clone(), other.clone())
+		return (other.clone(), self.clone())
+
+	def getInnovationArrays(self):
+		"""returns (sorted innovation numbers, connection indices in that order),
+		rebuilt only if the connection list has changed length - connections
+		that replace each other in crossover always share an innovation number
+		"""
+
+		arrays = getattr(self, "innovation_arrays", None)
+		if(arrays is None or arrays[0] != len(self.connections)):
+			innovs = np.array([c.getInnovationNumber() for c in self.connections], dtype=int)
+			order = np.argsort(innovs, kind="stable")
+			arrays = (len(self.connections), innovs[order], order)
+			self.innovation_arrays = arrays
+		return (arrays[1], arrays[2])
+
+	def _matchingGenes(self, other):
+		"""finds connections of both genotypes with the same innovation number
+
+		Returns:
+		(selfIndices, otherIndices) numpy arrays of matching connection positions
+		"""
+
+		(selfInnovs, selfOrder) = self.getInnovationArrays()
+		(otherInnovs, otherOrder) = other.getInnovationArrays()
+		(selfPos, otherPos, selfOnly, otherOnly) = align_genes(selfInnovs, otherInnovs)
+		return (selfOrder[selfPos], otherOrder[otherPos])
 
 	'''
 	method to find the distance between two networks' topologies
@@ -460,38 +644,27 @@ class Genotype():
 	@return integer value representing distance between two network structures
 	'''
 	def getDistance(self, other, theta1, theta2, theta3):
-		# find max and min innov number to determine if nodes excess or disjoint
-		innovRange = other.findRangeOfInnovationNumbers()
-		minInnov = innovRange[0]
-		maxInnov = innovRange[1]
-		numDisjoint = 0.0
-		numExcess = 0.0
-		for con in self.connections:
-			currInnov = con.getInnovationNumber()
-			if(currInnov < minInnov or currInnov > maxInnov):
-				numExcess += 1
-			oInd = 0
-			found = False
-			while(oInd < len(other.connections) and not found):
-				if(other.connections[oInd].getInnovationNumber() == currInnov):
-					found = True
-				oInd += 1
-			if(not found):
-				numDisjoint += 1
-		# must calculate average weight difference between matching genes
-		weightDifference = 0.0
-		numMatchingConnections = 0
-		for con1 in self.connections:
-			for con2 in other.connections:
-				if(con1.getInnovationNumber() == con2.getInnovationNumber()):
-					weightDifference += np.fabs(con1.getWeight() - con2.getWeight())
-					numMatchingConnections += 1
-		weightDifference /= numMatchingConnections
-		# N is the number of genes in the larger genome
-		N = len(self.connections) if (len(self.connections) > len(other.connections)) else len(other.connections)
-		
-		# distance formula: O1*disjoint + O2*excess + O3*averageWeightDiff
-		return ((theta1*numExcess)/N) + ((theta2*numDisjoint)/N) + ((theta3*weightDifference))
+		# genes of both genomes are aligned by merging their sorted innovation numbers
+		(selfInnovs, selfWeights) = self.getGeneArrays()
+		(otherInnovs, otherWeights) = other.getGeneArrays()
+		return gene_distance(selfInnovs, selfWeights, otherInnovs, otherWeights, theta1, theta2, theta3)
+
+	def getGeneArrays(self):
+		"""returns (sorted innovation numbers, weights in the same order) of all connections"""
+
+		(innovs, order) = self.getInnovationArrays()
+		weights = np.array([self.connections[c].getWeight() for c in order], dtype=float)
+		return (innovs, weights)
+
+	def getFingerprint(self):
+		"""returns a fingerprint of the connection genes (innovation numbers and
+		weights) that the distance between genomes depends on - it is cleared by
+		invalidatePlan so every mutator and crossover keeps it current
+		"""
+
+		if(getattr(self, "fingerprint", None) is None):
+			self.fingerprint = gene_fingerprint(*self.getGeneArrays())
+		return self.fingerprint
 
 
 	def get_con_cost(self):
@@ -552,16 +725,8 @@ class Genotype():
 	@return a tuple containing (min innov #, max innov #)
 	'''
 	def findRangeOfInnovationNumbers(self):
-		# set max in min initially to worst values possible
-		maxInnov = -1
-		minInnov = sys.maxsize
-		for c in self.connections:
-			if(c.getInnovationNumber() > maxInnov):
-				maxInnov = c.getInnovationNumber()
-			if(c.getInnovationNumber() < minInnov):
-				minInnov = c.getInnovationNumber()
-		
-		return (minInnov, maxInnov)
+		(innovs, order) = self.getInnovationArrays()
+		return (innovs[0], innovs[-1])
 
 	def gen_networkx_graph(self):
 		"""Takes current CPPN instance and uses all node/connection info
@@ -612,10 +777,11 @@ class Genotype():
 			pos[i] = np.array([self.numIn + 2, y])
 			y += 1
 
-		# ajust x position of hidden nodes
+		# ajust x position of hidden nodes, spread evenly by level
+		numLevels = max([n.getNodeLayer() for n in self.nodes[self.numIn + self.numOut:]] + [0]) + 1
 		for i in range(self.numIn + 1, len(self.nodes)):
 			diff_x = self.numIn + 2 # the distance between inputs and outputs on graph
-			x_loc = (self.nodes[i].getNodeLayer()/sys.maxsize)*diff_x
+			x_loc = (min(self.nodes[i].getNodeLayer(), numLevels)/numLevels)*diff_x
 			pos[i][0] = x_loc
 
 		# make sure two nodes are not too close to each other
@@ -718,6 +884,88 @@ class Genotype():
 	def getCopy(self):
 		return copy.deepcopy(self)
 
+	def clone(self):
+		"""Creates a copy-on-write copy of the genotype - the copy gets its own
+		node and connection lists but shares the Node and Connection objects
+		with this genotype, a private copy of a gene is only made by ownNode or
+		ownConnection when a mutation is about to change it
+
+		Returns:
+		the new genotype
+		"""
+
+		# after cloning every gene is shared by both genotypes
+		self.shared_nodes = [True]*len(self.nodes)
+		self.shared_cons = [True]*len(self.connections)
+
+		new = self.shallowCopy()
+		new.nodes = list(self.nodes)
+		new.connections = list(self.connections)
+		new.shared_nodes = list(self.shared_nodes)
+		new.shared_cons = list(self.shared_cons)
+		new.plan_dirty = set(getattr(self, "plan_dirty", PLAN_ALL))
+		if(getattr(self, "changed_nodes", None) is not None):
+			new.changed_nodes = set(self.changed_nodes)
+		if(getattr(self, "connection_pairs", None) is not None):
+			new.connection_pairs = (self.connection_pairs[0], set(self.connection_pairs[1]))
+		# fitness objects given by deap hold their own values
+		if("fitness" in self.__dict__):
+			new.fitness = copy.deepcopy(self.fitness)
+		return new
+
+	def shallowCopy(self):
+		"""returns a copy sharing every attribute with this genotype, caches
+		included - copy.copy would go through __getstate__ and drop them
+		"""
+
+		new = self.__class__.__new__(self.__class__)
+		new.__dict__.update(self.__dict__)
+		return new
+
+	def __getstate__(self):
+		"""leaves the caches out when the genotype is pickled or deep copied,
+		the node values of the delta evaluation cache are local to the process
+		so the unpickled genotype is fully evaluated the first time it is run
+		"""
+
+		state = self.__dict__.copy()
+		for name in self.CACHE_ATTRIBUTES:
+			state.pop(name, None)
+		state["plan_dirty"] = set(PLAN_ALL)
+		state["changed_nodes"] = None
+		return state
+
+	def __setstate__(self, state):
+		"""restores a pickled genotype, populations saved before node levels
+		were integers get their levels recomputed when they are loaded
+		"""
+
+		self.__dict__.update(state)
+		if(self.hasFloatLayers()):
+			self.relevel()
+
+	def ownNode(self, index):
+		"""makes sure the node at index is not shared with another genotype
+		before it is changed, returns the (possibly new) node
+		"""
+
+		shared = getattr(self, "shared_nodes", None)
+		if(shared is not None and index < len(shared) and shared[index]):
+			self.nodes[index] = copy.copy(self.nodes[index])
+			shared[index] = False
+		return self.nodes[index]
+
+	def ownConnection(self, index):
+		"""makes sure the connection at index is not shared with another genotype
+		before it is changed, returns the (possibly new) connection
+		"""
+
+		shared = getattr(self, "shared_cons", None)
+		if(shared is not None and index < len(shared) and shared[index]):
+			self.connections[index] = copy.copy(self.connections[index])
+			shared[index] = False
+		return self.connections[index]
+
 
 	def save(self, filename):
 		"""This method utilizes the pickle module to 
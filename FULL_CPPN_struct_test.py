@@ -0,0 +1,126 @@
+"""Tests for the genotype structure - getOutputBatch must give the outputs of
+getOutput run one input row at a time, mutating a copy-on-write clone must
+never change the genotype it was cloned from (or the other way around), and
+node levels of genotypes loaded from populations saved with fractional
+layers must be recomputed so their networks still give the same outputs.
+Can be run with pytest or directly from terminal
+"""
+
+import pickle
+import sys
+
+import numpy as np
+
+from FULL_CPPN_innovation import GlobalInnovation
+from FULL_CPPN_getpixels import getNormalizedInputArray
+from FULL_CPPN_testhelp import make_deterministic, make_population
+
+NUM_X = 6
+NUM_Y = 6
+
+
+def grid_outputs(genotype):
+	return np.array([genotype.getOutput([x, y])[0] for x in np.linspace(-1, 1, NUM_X) for y in np.linspace(-1, 1, NUM_Y)])
+
+
+def row_outputs(genotype, inputs):
+	"""runs getOutput separately for every row of inputs"""
+
+	return np.array([genotype.getOutput(list(row)) for row in inputs])
+
+
+def test_output_batch_matches_get_output():
+	np.random.seed(7)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	for genotype in make_population(20, 8):
+		assert np.allclose(genotype.getOutputBatch(inputs), row_outputs(genotype, inputs))
+		# weight and activation changes patch the plan of the last batch
+		genotype.weightMutate()
+		genotype.activationMutate()
+		make_deterministic(genotype)
+		assert np.allclose(genotype.getOutputBatch(inputs), row_outputs(genotype, inputs))
+		assert np.allclose(genotype.getOutputBatch(inputs[:1]), row_outputs(genotype, inputs[:1]))
+		# inputs with the wrong number of columns are rejected like getOutput does
+		assert genotype.getOutputBatch(np.zeros((4, 3))) is None
+
+
+def snapshot(genotype):
+	"""returns every gene of a genotype as plain values"""
+
+	nodes = [(n.getNodeNum(), n.getActKey(), n.getNodeLayer()) for n in genotype.nodes]
+	cons = [(c.getInnovationNumber(), c.getNodeIn().getNodeNum(), c.getNodeOut().getNodeNum(),
+			c.getWeight(), c.getStatus()) for c in genotype.connections]
+	return (nodes, cons)
+
+
+def mutate_all(genotype, gb):
+	"""applies every mutation operator a few times"""
+
+	for i in range(4):
+		(gb.innovDict, gb.current) = genotype.nodeMutate(gb.innovDict, gb.current)
+		gb.current = genotype.connectionMutate(gb.current)
+		genotype.weightMutate()
+		genotype.activationMutate()
+		genotype.connection_status_mutate()
+
+
+def test_clone_is_isolated():
+	np.random.seed(17)
+	inputs = getNormalizedInputArray(NUM_X, NUM_Y)
+	pop = make_population(10, 6)
+	gb = GlobalInnovation(2, 1)
+	gb.current = 1000
+	for (i, parent) in enumerate(pop):
+		before = snapshot(parent)
+		outputs = parent.getOutputBatch(inputs)
+		clone = parent.clone()
+		mutate_all(clone, gb)
+		clone = clone.crossover(pop[(i + 1) % len(pop)])
+		mutate_all(clone, gb)
+		assert snapshot(parent) == before, i
+		assert np.array_equal(parent.getOutputBatch(inputs), outputs), i
+
+		# genes still shared with the parent are copied before the parent changes them
+		before = snapshot(clone)
+		mutate_all(parent, gb)
+		assert snapshot(clone) == before, i
+
+
+def to_float_layers(genotype):
+	"""gives the hidden nodes the fractional layers old genotypes were saved
+	with, spread between the inputs at 0 and the outputs at sys.maxsize in
+	the same order as their levels
+	"""
+
+	step = float(sys.maxsize)/(len(genotype.nodes) + 1)
+	for i in range(genotype.numIn + genotype.numOut, len(genotype.nodes)):
+		node = genotype.ownNode(i)
+		node.setNodeLayer((node.getNodeLayer() - .5)*step)
+
+
+def test_load_float_layers():
+	np.random.seed(12)
+	for genotype in make_population(20, 6):
+		expected = grid_outputs(genotype)
+		to_float_layers(genotype)
+		assert genotype.hasFloatLayers()
+		loaded = pickle.loads(pickle.dumps(genotype))
+		assert not loaded.hasFloatLayers()
+		for c in loaded.connections:
+			src = loaded.nodes[c.getNodeIn().getNodeNum()].getNodeLayer()
+			dst = loaded.nodes[c.getNodeOut().getNodeNum()].getNodeLayer()
+			assert src < dst, (src, dst)
+		assert loaded.getActivationPlan().inOrder()
+		assert np.allclose(grid_outputs(loaded), expected)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_output_batch_matches_get_output, test_clone_is_isolated, test_load_float_layers):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -0,0 +1,119 @@
+"""This file contains the preprocessing cache for target images. Loading,
+resizing and thresholding a target and creating its distance maps is the
+same for every run (and every scoop worker) that uses the same image at the
+same resolution, so the results are stored once as .npy files and memory
+mapped by every later run.
+
+Entries are keyed by a hash of the image file's contents together with the
+resolution and binary threshold, so changing the image in place never gives
+stale arrays. An entry is built in a temporary directory and renamed into
+place, when several runs preprocess the same target at once the first
+rename wins and the others use its arrays
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+from FULL_CPPN_getpixels import getBinaryPixels, get_d_mat, BINARY_THRESHOLD
+from FULL_CPPN_disthelp import get_dist_mat
+
+# directory that preprocessed targets are stored in
+DEFAULT_TARGET_DIR = "target_cache"
+
+# arrays stored for every target, each in its own .npy file
+TARGET_ARRAYS = ("pixels", "dist_black", "dist_white", "d_mat")
+
+
+class Target():
+	"""The preprocessed arrays of one target image"""
+
+	def __init__(self, key, path, arrays, cached):
+		"""Constructor for a target
+
+		Parameters:
+		key -- key of the target in the cache
+		path -- directory holding the arrays of the target
+		arrays -- dictionary of the arrays of the target, keyed by name
+		cached -- True if the arrays were already in the cache
+		"""
+
+		self.key = key
+		self.path = path
+		self.cached = cached
+
+		# binary pixels, 1 for black (material) and 0 for white
+		self.pixels = arrays["pixels"]
+		# distance of every pixel to the closest black/white pixel of the target
+		self.dist_black = arrays["dist_black"]
+		self.dist_white = arrays["dist_white"]
+		# signed distance to the closest pixel of the other value, used as the d parameter
+		self.d_mat = arrays["d_mat"]
+
+
+def target_key(filepath, numX, numY, threshold=BINARY_THRESHOLD):
+	"""returns the cache key of a target image at the given resolution and threshold"""
+
+	with open(filepath, "rb") as f:
+		digest = hashlib.sha1(f.read()).hexdigest()
+
+	return "{0}_{1}x{2}_t{3}".format(digest, numX, numY, threshold)
+
+
+def preprocess_target(filepath, numX, numY, threshold=BINARY_THRESHOLD):
+	"""creates all arrays of a target image without the cache
+
+	Returns:
+	dictionary of the arrays of the target, keyed by name
+	"""
+
+	pixels = getBinaryPixels(filepath, numX, numY, threshold)
+	px = np.reshape(pixels, (numX, numY))
+
+	return {"pixels": pixels,
+		"dist_black": get_dist_mat(px, 1),
+		"dist_white": get_dist_mat(px, 0),
+		"d_mat": get_d_mat(pixels, numX, numY)}
+
+
+def load_target(filepath, numX, numY, threshold=BINARY_THRESHOLD, cache_dir=DEFAULT_TARGET_DIR, mmap_mode="r"):
+	"""Loads the preprocessed arrays of a target image, creating and storing
+	them first if the target is not in the cache yet
+
+	Parameters:
+	filepath -- path to the target image
+	numX -- width the image is resized to
+	numY -- height the image is resized to
+	threshold -- pixels with a first channel at or below this value are black
+	cache_dir -- directory holding the cache
+	mmap_mode -- mode the arrays are memory mapped with, None reads them into memory
+
+	Returns:
+	the Target with all arrays of the image
+	"""
+
+	key = target_key(filepath, numX, numY, threshold)
+	path = os.path.join(cache_dir, key)
+	cached = os.path.isdir(path)
+
+	if(not cached):
+		arrays = preprocess_target(filepath, numX, numY, threshold)
+
+		# arrays are written into a private directory that is renamed into place
+		# all at once, so other runs never see a partial entry
+		os.makedirs(cache_dir, exist_ok=True)
+		tmp_path = tempfile.mkdtemp(prefix=key + ".", suffix=".tmp", dir=cache_dir)
+		for name in TARGET_ARRAYS:
+			np.save(os.path.join(tmp_path, name + ".npy"), arrays[name])
+		try:
+			os.rename(tmp_path, path)
+		except OSError:
+			# another run stored the same target first, its arrays are identical
+			shutil.rmtree(tmp_path, ignore_errors=True)
+
+	arrays = dict((name, np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode)) for name in TARGET_ARRAYS)
+
+	return Target(key, path, arrays, cached)
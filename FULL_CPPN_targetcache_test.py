@@ -0,0 +1,82 @@
+"""Tests for the target preprocessing cache - a target loaded from the cache
+(when it is first stored and when it is reused) must hold the arrays the
+drivers used to compute for every run, and a changed image or resolution
+must never be given another entry's arrays. Can be run with pytest or
+directly from terminal
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from FULL_CPPN_targetcache import load_target, target_key
+from FULL_CPPN_getpixels import getBinaryPixels, get_d_mat_brute
+from FULL_CPPN_disthelp import get_dist_mat_brute
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+TARGET_IMAGE = os.path.join(REPO_DIR, "fitting_images", "heart_ex.png")
+NUM_X = 20
+NUM_Y = 20
+
+
+def same_as_drivers(target, filepath, numX, numY):
+	"""returns True if the target holds what the drivers computed for the image"""
+
+	pixels = getBinaryPixels(filepath, numX, numY)
+	px = np.reshape(pixels, (numX, numY))
+	return (np.array_equal(target.pixels, pixels)
+		and np.allclose(np.ravel(target.dist_black), np.ravel(get_dist_mat_brute(px, 1)))
+		and np.allclose(np.ravel(target.dist_white), np.ravel(get_dist_mat_brute(px, 0)))
+		and np.allclose(np.ravel(target.d_mat), np.ravel(get_d_mat_brute(pixels, numX, numY))))
+
+
+def test_cached_target_matches_drivers():
+	cache_dir = tempfile.mkdtemp()
+	try:
+		first = load_target(TARGET_IMAGE, NUM_X, NUM_Y, cache_dir=cache_dir)
+		assert not first.cached
+		assert same_as_drivers(first, TARGET_IMAGE, NUM_X, NUM_Y)
+		again = load_target(TARGET_IMAGE, NUM_X, NUM_Y, cache_dir=cache_dir)
+		assert again.cached and again.key == first.key
+		assert same_as_drivers(again, TARGET_IMAGE, NUM_X, NUM_Y)
+
+		# another resolution is another entry
+		other = load_target(TARGET_IMAGE, NUM_X + 5, NUM_Y, cache_dir=cache_dir)
+		assert not other.cached
+		assert same_as_drivers(other, TARGET_IMAGE, NUM_X + 5, NUM_Y)
+	finally:
+		shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def test_changed_image_is_not_stale():
+	cache_dir = tempfile.mkdtemp()
+	try:
+		image_path = os.path.join(cache_dir, "target.png")
+		shutil.copy(TARGET_IMAGE, image_path)
+		first = load_target(image_path, NUM_X, NUM_Y, cache_dir=cache_dir)
+
+		# the image is changed in place, under the same file name
+		image = Image.open(image_path).convert("RGB")
+		Image.fromarray(255 - np.asarray(image)).save(image_path)
+		assert target_key(image_path, NUM_X, NUM_Y) != first.key
+		changed = load_target(image_path, NUM_X, NUM_Y, cache_dir=cache_dir)
+		assert not changed.cached
+		assert same_as_drivers(changed, image_path, NUM_X, NUM_Y)
+		assert not np.array_equal(changed.pixels, first.pixels)
+	finally:
+		shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+	failed = 0
+	for test in (test_cached_target_matches_drivers, test_changed_image_is_not_stale):
+		try:
+			test()
+			print("Passed " + test.__name__ + ".")
+		except AssertionError as e:
+			print("***** FAILED " + test.__name__ + " " + str(e) + " *****")
+			failed += 1
+	print("TESTS FAILED: " + str(failed))
@@ -0,0 +1,38 @@
+"""This file contains the helpers shared by the FULL_CPPN_*_test.py files -
+populations of genotypes grown by mutation whose outputs are deterministic,
+so two evaluation paths can be compared value for value
+"""
+
+import numpy as np
+
+from FULL_CPPN_struct import Genotype
+from FULL_CPPN_innovation import GlobalInnovation
+
+# activation key of the gaussian activation, which draws random numbers
+GAUSS_KEY = 4
+# deterministic activation the gaussian nodes are replaced with (tanh)
+REPLACEMENT_KEY = 6
+
+
+def make_deterministic(genotype):
+	"""replaces gaussian activations so two runs of the network give the same outputs"""
+
+	for i, node in enumerate(genotype.nodes):
+		if(node.getActKey() == GAUSS_KEY):
+			genotype.ownNode(i).setActKey(REPLACEMENT_KEY)
+	genotype.invalidatePlan("activations")
+
+
+def make_population(size, numMutations):
+	"""creates genotypes grown by node and connection mutations"""
+
+	gb = GlobalInnovation(2, 1)
+	pop = [Genotype(2, 1) for i in range(size)]
+	for genotype in pop:
+		genotype.fitness = np.random.uniform()
+		for i in range(numMutations):
+			(gb.innovDict, gb.current) = genotype.nodeMutate(gb.innovDict, gb.current)
+			gb.current = genotype.connectionMutate(gb.current)
+		make_deterministic(genotype)
+
+	return pop
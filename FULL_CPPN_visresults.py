@@ -4,6 +4,7 @@ then contians functions to visualize results in certain ways'''
 
 import numpy as np
 import pickle
+from deap import creator
 
 # all deap configuration is created when you import the file
 from FULL_CPPN_deapconfig import get_tb
@@ -11,6 +12,8 @@ from FULL_CPPN_struct import Genotype
 from FULL_CPPN_vis import plot_pareto_front
 from FULL_CPPN_getpixels import graphImage
 from FULL_CPPN_deaphelp import get_pareto_front
+from FULL_CPPN_codegen import compile_genotype
+from FULL_CPPN_paretoarchive import load_pareto_archive
 
 # get toolbox from deap config in case it is needed
 toolbox = get_tb()
@@ -31,6 +34,21 @@ def load_pops(filepaths):
 
 	return pops	
 
+def load_archive_front(filepath):
+	"""loads the pareto archive saved during a run and returns its entries
+	as genotypes with their fitness set, so they can be plotted and viewed
+	like the pareto front of a population
+	"""
+
+	archive = load_pareto_archive(filepath)
+	front = []
+	for i, values in enumerate(archive.front()):
+		ind = archive.genotype(i).toGenotype()
+		ind.fitness = creator.FitnessMulti(tuple(values.tolist()))
+		front.append(ind)
+
+	return front
+
 def trim_par_front(par_frnt, func):
 	"""takes a pareto front as an input and selects all
 	individuals that cause func to return true and returns
@@ -59,11 +77,9 @@ def view_results(pop, num_x, num_y):
 		org.nodes = ind.nodes
 		org.gSize = ind.gSize
 		
-		# get CPPN output
-		output = []
-		for ins in NORM_IN:
-			output.append(org.getOutput(ins)[0])
-		graphImage(np.array(output), num_x, num_y, 200)
+		# get CPPN output from the compiled version of the genotype
+		output = compile_genotype(org)(np.array(NORM_IN))[:, 0]
+		graphImage(output, num_x, num_y, 200)
 		
 		# graph genotype of individual after graphing phenotype
 		org.graph_genotype()